@@ -0,0 +1,889 @@
+# analise.py
+#
+# Núcleo analítico do painel, sem dependência do Streamlit: leitura e limpeza das
+# planilhas, classificação de credores, vínculos por sobrenome e agregações.
+# O dashboard.py é apenas a camada de exibição sobre estas funções, que também
+# podem ser usadas em scripts de pré-processamento e no benchmark.
+
+import json
+import os
+import re
+import unicodedata
+from contextlib import closing
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+import ingestao
+import manifesto_dados
+
+# ==============================================================================
+# CONFIGURAÇÕES E CONSTANTES GLOBAIS
+# ==============================================================================
+COMMON_SURNAMES = ['SANTOS', 'SANTANA', 'OLIVEIRA', 'SILVA', 'DIAS', 'SOUZA','ALVES','JESUS','NASCIMENTO','COSTA', 'ANDRADE', 'NUNES']
+COMPANY_TERMS = ['LTDA', 'ME', 'SA', 'EIRELI', 'CIA', 'EPP', 'MEI', 'FILHO', 'JUNIOR', 'NETO', 'SOBRINHO', 'SERVICOS', 'COMERCIO', 'INDUSTRIA', 'SOLUCOES', 'TECNOLOGIA', 'ADVOGADOS', 'ASSOCIADOS', 'ENGENHARIA', 'CONSTRUCOES', 'CONSULTORIA']
+PREPOSITIONS = ['DE', 'DA', 'DO', 'DAS', 'DOS']
+MESES_PT = {1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"}
+
+# Caminhos dos Arquivos de Dados
+GASTOS_PESSOAL_FOLDER = 'dados_gastos'
+DADOS_ANUAIS_FOLDER = 'dados_anuais'
+VIAGENS_FILE = 'dados_viagens.xlsx'
+GASTOS_GERAIS_FILE = 'gastos_gerais.xlsx'
+FINANCEIRO_FILE = 'dados_financeiros.json'
+
+CARGO_SECRETARIO = 'SECRETÁRIO(A) MUNICIPAL'
+PISO_SALARIAL_INDICADORES = 1400 # Salários abaixo disso são ignorados no "Menor Salário Líquido"
+
+# Detecção de valores atípicos: escore robusto 0,6745 * (valor - mediana) / MAD dentro do
+# grupo (cargo, categoria...). Acima de LIMIAR_ANOMALIA o valor é sinalizado; grupos com
+# menos de MIN_GRUPO_ANOMALIA valores não têm estatística confiável e ficam de fora.
+# Em grupos quase constantes (ex: todos os secretários com o mesmo salário) o MAD é
+# mínimo e qualquer diferença explodiria o escore; por isso ele tem um piso de
+# MAD_MINIMO_RELATIVO da mediana, sempre em reais. Os pagamentos a fornecedores têm cauda
+# longa e são comparados em escala logarítmica, onde o escore é mais comprimido e o
+# limiar é menor; lá o piso é convertido para a mesma escala.
+LIMIAR_ANOMALIA = float(os.environ.get('PAINEL_LIMIAR_ANOMALIA', '3.5'))
+LIMIAR_ANOMALIA_PAGAMENTOS = float(os.environ.get('PAINEL_LIMIAR_ANOMALIA_PAGAMENTOS', '2.5'))
+MIN_GRUPO_ANOMALIA = 5
+MAD_MINIMO_RELATIVO = 0.05
+
+# Contrato somente-leitura: os DataFrames devolvidos pelos loaders são compartilhados
+# entre todas as sessões do painel (st.cache_resource) e NUNCA devem ser alterados
+# pelas funções de análise ou de exibição. Com PAINEL_DEBUG_READONLY=1 o painel confere, ao fim de cada
+# execução, se algum DataFrame em cache foi modificado.
+DEBUG_READONLY = os.environ.get('PAINEL_DEBUG_READONLY') == '1'
+
+# Os mesmos servidores e credores se repetem em todos os meses e anos: os auxiliares
+# de nomes guardam até NAME_CACHE_SIZE resultados cada (os menos usados são descartados).
+NAME_CACHE_SIZE = int(os.environ.get('PAINEL_CACHE_NOMES', '50000'))
+
+
+# ==============================================================================
+# Funções de Apoio e Formatação
+# ==============================================================================
+def format_brazilian_currency(value):
+    """Formata um número para o padrão de moeda brasileiro (R$ 1.234,56)."""
+    if pd.isna(value) or not isinstance(value, (int, float)):
+        return "N/A"
+    return f"R$ {value:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
+
+def clean_monetary_value(series):
+    """Limpa uma string ou série de strings monetárias para um formato numérico."""
+    series = series.astype(str)
+    series = series.str.replace(r'R\$', '', regex=True).str.strip()
+    series = series.str.replace(r'\.', '', regex=True)
+    series = series.str.replace(',', '.', regex=False)
+    return pd.to_numeric(series, errors='coerce')
+
+_NAME_CACHES = {}
+
+def memoize_names(func):
+    """Memoização LRU limitada para funções puras que recebem um nome."""
+    cached = lru_cache(maxsize=NAME_CACHE_SIZE)(func)
+    _NAME_CACHES[func.__name__] = cached
+    return cached
+
+def name_cache_stats():
+    """Acertos, falhas e ocupação (acumulados no processo) de cada auxiliar de nomes memoizado."""
+    return {name: cached.cache_info()._asdict() for name, cached in _NAME_CACHES.items()}
+
+@memoize_names
+def normalize_name(name):
+    """Nome em maiúsculas, sem acentos e com espaços simples (chave do índice de servidores)."""
+    if pd.isna(name): return ''
+    text = unicodedata.normalize('NFKD', str(name).upper())
+    return " ".join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+@memoize_names
+def _surnames(full_name):
+    parts = re.sub(r'[^\w\s]', '', full_name.upper()).split()
+    return tuple(s for s in parts[1:] if s not in COMPANY_TERMS and s not in PREPOSITIONS)
+
+def get_surnames_list(full_name):
+    if pd.isna(full_name): return []
+    # Cópia em lista: o resultado memoizado é compartilhado e não pode ser alterado por quem chama.
+    return list(_surnames(full_name))
+
+_PREPOSITIONS_LOWER = frozenset(p.lower() for p in PREPOSITIONS)
+
+@memoize_names
+def abreviar_nome_completo(nome_completo):
+    partes = str(nome_completo).split()
+    if len(partes) <= 2: return nome_completo
+    primeiro_nome = partes[0]
+    ultimo_nome = partes[-1]
+    iniciais_meio = []
+    for parte in partes[1:-1]:
+        if len(parte) <= 3 and parte.lower() in _PREPOSITIONS_LOWER:
+            iniciais_meio.append(parte)
+        else:
+            iniciais_meio.append(parte[0].upper() + '.')
+    return " ".join([primeiro_nome] + iniciais_meio + [ultimo_nome])
+
+def abbreviate_names(names):
+    """Abrevia uma série de nomes calculando cada nome distinto uma única vez."""
+    abbreviations = {name: abreviar_nome_completo(name) for name in names.dropna().unique()}
+    return names.map(abbreviations)
+
+def _frame_fingerprint(df):
+    """Resumo (colunas, linhas e hash do conteúdo) usado para detectar alterações em um DataFrame."""
+    content_hash = int(pd.util.hash_pandas_object(df, index=True).sum()) if not df.empty else 0
+    return tuple(df.columns), len(df), content_hash
+
+_FROZEN_FRAMES = {} # (município, nome) -> (DataFrame, resumo do conteúdo ao ser registrado)
+
+def freeze_frame(name, df, municipio=None):
+    """
+    Registra um DataFrame em cache como somente-leitura (verificado apenas no modo de depuração).
+    Cada município (municipios.py) tem os seus: o mesmo nome não substitui o DataFrame de outro.
+    """
+    if DEBUG_READONLY:
+        _FROZEN_FRAMES[(municipio, name)] = (df, _frame_fingerprint(df))
+    return df
+
+def release_frames(municipio):
+    """Esquece os DataFrames registrados de um município cujos caches foram descartados."""
+    for key in [key for key in _FROZEN_FRAMES if key[0] == municipio]:
+        del _FROZEN_FRAMES[key]
+
+def assert_frames_unmodified():
+    """No modo de depuração, falha se alguma função alterou um DataFrame em cache."""
+    if not DEBUG_READONLY:
+        return
+    for (municipio, name), (df, fingerprint) in list(_FROZEN_FRAMES.items()):
+        local = f" do município '{municipio}'" if municipio else ""
+        assert _frame_fingerprint(df) == fingerprint, f"O DataFrame em cache '{name}'{local} foi modificado durante a renderização."
+
+def uncommon_surnames(full_name):
+    """Sobrenomes usados na busca de vínculos (ignora os sobrenomes muito comuns)."""
+    return [s for s in get_surnames_list(full_name) if s not in COMMON_SURNAMES]
+
+def find_surname_links(target_person_info, source_df, source_name_column):
+    surnames_to_search = uncommon_surnames(target_person_info['Credor'])
+    if not surnames_to_search:
+        return pd.DataFrame(), []
+    search_pattern = r"\b(?:" + "|".join(surnames_to_search) + r")\b"
+    if 'Credor' in source_df.columns and source_name_column == 'Credor':
+        source_df_filtered = source_df[source_df['Credor'] != target_person_info['Credor']]
+    else:
+        source_df_filtered = source_df
+    linked_df = source_df_filtered[source_df_filtered[source_name_column].str.contains(search_pattern, case=False, na=False, regex=True)]
+    return linked_df, surnames_to_search
+
+def filter_by_name(df, column, query):
+    """Filtra as linhas cuja coluna de nome contém o texto buscado (sem diferenciar maiúsculas)."""
+    names = df[column]
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        # Índice de busca do snapshot: procura só entre os nomes distintos e mapeia pelos códigos.
+        matching = names.cat.categories.str.contains(query, case=False, na=False, regex=True)
+        return df[names.isin(names.cat.categories[matching])]
+    return df[names.str.contains(query, case=False, na=False)]
+
+def period_slice(df, inicio=None, fim=None):
+    """
+    Recorte por período (datas inclusivas) de um DataFrame já ordenado por `Data`, como os
+    gastos gerais do snapshot: localiza as bordas por busca binária e devolve uma fatia
+    contígua das mesmas linhas (ou o próprio DataFrame, se o período cobre tudo), sem cópia.
+    """
+    if df.empty:
+        return df
+    datas = df['Data']
+    start = 0 if inicio is None else int(datas.searchsorted(pd.Timestamp(inicio), side='left'))
+    stop = len(df) if fim is None else int(datas.searchsorted(pd.Timestamp(fim) + pd.Timedelta(days=1), side='left'))
+    return df if (start, stop) == (0, len(df)) else df.iloc[start:max(start, stop)]
+
+def filter_general_expenses(df, inicio=None, fim=None, fornecedor=None):
+    """Recorte dos gastos gerais por período (datas inclusivas) e, opcionalmente, por nome do fornecedor."""
+    if df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if inicio is not None:
+        mask &= df['Data'] >= pd.Timestamp(inicio)
+    if fim is not None:
+        mask &= df['Data'] < pd.Timestamp(fim) + pd.Timedelta(days=1)
+    result = df if mask.all() else df[mask]
+    return filter_by_name(result, 'Fornecedor', fornecedor) if fornecedor else result
+
+# ==============================================================================
+# Classificadores de Credores e Fornecedores
+# ==============================================================================
+KEYWORDS_FESTAS = [
+    'PRODUCOES', 'PRODUÇÕES', 'ARTISTICA', 'ARTISTICAS', 'ARTÍSTICA', 'ARTÍSTICAS',
+    'EVENTOS', 'SHOW', 'ENTRETENIMENTO', 'MUSIC', 'GRAVACAO', 'GRAVACOES', 'GRAVAÇÃO', 'GRAVAÇÕES',
+    'PALCO', 'BANDA', 'TRIO', 'ILUMINACAO', 'ILUMINAÇÃO', 'SONORIZACAO', 'SONORIZAÇÃO',
+    'PIROTECNIA'
+]
+FORNECEDORES_ESPECIFICOS_FESTAS = [
+    'AGROPLAY LTDA'
+]
+KEYWORDS_COMBUSTIVEL = ['POSTO', 'COMBUSTIVEIS', 'COMBUSTIVEL', 'AUTO POSTO']
+INTERNAL_KEYWORDS = ['INSTITUTO', 'PREFEITURA', 'MUNICIPAL', 'FUNDO', 'ENERGISA', 'TRIBUNAL', 'JUSTICA', 'ASSOCIACAO', 'ASSOSSIAÇÃO']
+
+CATEGORIAS_MAP = {
+    'Postos de Combustíveis': ['posto', 'combustiveis', 'combustivel', 'auto posto'],
+    'Advocacia': ['advocacia', 'advogado', 'advogados', 'juridico'],
+    'Construção': ['construção', 'construtora', 'engenharia', 'obras', 'cimento', 'material de construcao'],
+    'Limpeza Pública': ['limpeza', 'saneamento', 'residuos', 'coleta de lixo', 'varrição', 'ramac'],
+    'Locações de Veículos': ['locação', 'locacoes', 'locadora', 'aluguel', 'veículos', 'automóveis', 'rent a car', 'unir'],
+    'Consultorias': ['consultoria', 'consultorias', 'assessoria', 'projetos', 'auditoria']
+}
+
+SECRETARIAS_MAP = {
+    'Saúde (SMS/FMS)': ['saude', 'sms', 'fms'], 'Educação (SEMED)': ['educacao', 'semed'], 'Assist. Social (FMAS)': ['assistencia social', 'fmas'],
+    'Obras (SEMOB)': ['obras', 'semob'], 'Adm. (SEMAD)': ['administracao', 'semad'], 'Agricultura (SEMAGRI)': ['agricultura', 'semagri'],
+    'Gabinete (SEGAB)': ['gabinete', 'segab'], 'Fazenda (SEMFAZ)': ['fazenda', 'semfaz'], 'Meio Amb. (SEMAC/FMMA)': ['meio ambiente', 'semac', 'fmma'],
+    'Des. Social (SEDEST)': ['desenvolvimento social', 'sedest'], 'Ordem Púb. (SEMOP)': ['ordem publica', 'semop'], 'Cultura (SECULT)': ['cultura', 'secult'],
+    'Esporte (SEJEL)': ['juventude', 'esporte', 'sejel'], 'Comunicação (SECOM)': ['comunicacao', 'secom'], 'Des. Urbano (SEMDU)': ['desenvolvimento urbano', 'semdu'],
+    'Governo (SEGOV)': ['governo', 'segov'], 'Controladoria (CGM)': ['controladoria', 'cgm'], 'Procuradoria (PGM)': ['procuradoria', 'pgm'],
+    'Planejamento (SEPLAN)': ['planejamento', 'seplan'], 'Outros Órgãos': ['prefeitura municipal de lagarto', 'pml']
+}
+
+def is_party_expense(creditor):
+    creditor_upper = str(creditor).upper()
+    if any(keyword in creditor_upper for keyword in KEYWORDS_FESTAS):
+        return True
+    if creditor_upper in [name.upper() for name in FORNECEDORES_ESPECIFICOS_FESTAS]:
+        return True
+    return False
+
+def is_fuel_expense(creditor):
+    creditor_upper = str(creditor).upper()
+    return any(keyword in creditor_upper for keyword in KEYWORDS_COMBUSTIVEL)
+
+def is_internal_or_utility(creditor):
+    creditor_upper = str(creditor).upper()
+    if "SECRETARIA" in creditor_upper:
+        return True
+    return any(keyword in creditor_upper for keyword in INTERNAL_KEYWORDS)
+
+def categorizar_fornecedor(fornecedor):
+    fornecedor_lower = str(fornecedor).lower()
+    for categoria, keywords in CATEGORIAS_MAP.items():
+        if any(keyword in fornecedor_lower for keyword in keywords):
+            return categoria
+    return 'Outros'
+
+def categorizar_por_secretaria(fornecedor):
+    fornecedor_lower = str(fornecedor).lower()
+    for nome_curto, keywords in SECRETARIAS_MAP.items():
+        if any(keyword in fornecedor_lower for keyword in keywords):
+            return nome_curto
+    return 'Não Identificado'
+
+# ==============================================================================
+# Funções de Leitura de Dados
+# ==============================================================================
+class MissingColumnsError(ValueError):
+    """A planilha não tem no cabeçalho todas as colunas pedidas."""
+
+def iter_xlsx_columns(file_path, columns, chunk_rows=None):
+    """
+    Lê só as colunas pedidas da primeira aba de um .xlsx, em streaming (openpyxl read_only),
+    sem montar um DataFrame com a largura total da planilha. Gera DataFrames de até
+    `chunk_rows` linhas (padrão ingestao.BLOCO_LINHAS), com as colunas na ordem pedida e o
+    índice contínuo entre os blocos. Levanta MissingColumnsError se faltar alguma coluna.
+    """
+    # O openpyxl só é importado quando alguma planilha bruta é lida: com o snapshot em dia
+    # o painel não precisa dele.
+    import openpyxl
+    chunk_rows = chunk_rows or ingestao.BLOCO_LINHAS
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Planilhas exportadas pelo portal às vezes trazem a dimensão errada; lê até a última linha real.
+        sheet.reset_dimensions()
+        header_row = next(sheet.iter_rows(max_row=1, values_only=True), ())
+        header = [str(col).strip() if col is not None else '' for col in header_row]
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise MissingColumnsError(f"Colunas não encontradas em '{os.path.basename(file_path)}': {missing}")
+        indices = [header.index(col) for col in columns]
+        last_column = max(indices) + 1
+        # itemgetter com um único índice devolveria o valor solto, não uma tupla.
+        project = itemgetter(*indices) if len(indices) > 1 else (lambda row: (row[indices[0]],))
+        rows, offset = [], 0
+        for row in sheet.iter_rows(min_row=2, max_col=last_column, values_only=True):
+            if len(row) < last_column:
+                row = row + (None,) * (last_column - len(row))
+            values = project(row)
+            if any(value is not None for value in values):
+                rows.append(values)
+                if len(rows) >= chunk_rows:
+                    yield _rows_frame(columns, rows, offset)
+                    offset += len(rows)
+                    rows = []
+        if rows:
+            yield _rows_frame(columns, rows, offset)
+    finally:
+        workbook.close()
+
+def _rows_frame(columns, rows, offset):
+    return pd.DataFrame({col: list(values) for col, values in zip(columns, zip(*rows))},
+                        index=pd.RangeIndex(offset, offset + len(rows)))
+
+def read_xlsx_columns(file_path, columns):
+    """
+    A planilha inteira de uma vez (ver iter_xlsx_columns), ou None se alguma das colunas
+    pedidas não estiver no cabeçalho.
+    """
+    try:
+        chunks = list(iter_xlsx_columns(file_path, columns))
+    except MissingColumnsError:
+        return None
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=object) for col in columns})
+    return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+def _file_chunks(conjunto, file_path, columns):
+    """Blocos de `columns` de uma planilha, respeitando os orçamentos por arquivo (ver ingestao.py)."""
+    if not ingestao.within_file_budget(conjunto, file_path):
+        return
+    with closing(iter_xlsx_columns(file_path, columns)) as chunks:
+        yield from ingestao.limit_rows(conjunto, file_path, chunks)
+
+def load_financial_data(file_path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        revenue_str = data.get("previsao_arrecadacao")
+        expenses_str = data.get("previsao_gastos")
+        period_year = data.get("ano_periodo")
+        revenue = clean_monetary_value(pd.Series([revenue_str])).iloc[0] if revenue_str else None
+        expenses = clean_monetary_value(pd.Series([expenses_str])).iloc[0] if expenses_str else None
+        return revenue, expenses, period_year
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None, None, None
+
+def load_and_process_spending_data(folder_path):
+    ingestao.start(folder_path)
+    # Só as planilhas da versão publicada (ver manifesto_dados.py), nunca uma coleta pela metade.
+    all_files = manifesto_dados.complete_files(folder_path, "*.xlsx")
+    if not all_files: return pd.DataFrame()
+    monthly_data = ingestao.AcumuladorBlocos('pessoal')
+    month_map = {'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6, 'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12}
+    for filepath in all_files:
+        try:
+            filename = os.path.basename(filepath)
+            match = re.match(r'([a-z]+)_(\d{4})\.xlsx', filename.lower())
+            if not match: continue
+            month_name, year_str = match.groups()
+            month, year = month_map.get(month_name), int(year_str)
+            # Uma planilha com erro no meio da leitura é descartada inteira, sem os blocos já lidos.
+            with monthly_data.arquivo():
+                for df in _file_chunks('pessoal', filepath, ['Nome', 'Cargo', 'Líquido']):
+                    df_processed = pd.DataFrame({
+                        'Credor': df['Nome'],
+                        'Cargo': df['Cargo'],
+                        'Projetado': clean_monetary_value(df['Líquido']),
+                    }).dropna(subset=['Credor', 'Cargo', 'Projetado'])
+                    if df_processed.empty: continue
+                    df_processed['Data'] = datetime(year, month, 1)
+                    monthly_data.append(df_processed)
+        except MissingColumnsError:
+            continue
+        except Exception as e:
+            print(f"ALERTA: Falha ao processar o arquivo de pessoal '{filename}'. Erro: {e}")
+            continue
+    result = monthly_data.result()
+    if result.empty: return pd.DataFrame()
+    return result
+
+def load_annual_expenses_data(folder_path):
+    ingestao.start(folder_path)
+    if not os.path.exists(folder_path): return pd.DataFrame()
+    all_files = manifesto_dados.complete_files(folder_path, "*.xlsx")
+    if not all_files: return pd.DataFrame()
+    yearly_data = ingestao.AcumuladorBlocos('anuais')
+    for filepath in all_files:
+        filename = os.path.basename(filepath)
+        try:
+            match = re.search(r'(\d{4})\.xlsx', filename.lower())
+            if not match: continue
+            
+            year = int(match.group(1))
+            required_cols = ['Credor', 'Pago']
+            with yearly_data.arquivo():
+                for df in _file_chunks('anuais', filepath, required_cols):
+                    df_processed = pd.DataFrame({
+                        'Credor': df['Credor'],
+                        'Valor_Pago': clean_monetary_value(df['Pago']),
+                        'Ano': year,
+                    }).dropna(subset=['Credor', 'Valor_Pago'])
+                    yearly_data.append(df_processed)
+
+        except MissingColumnsError:
+            print(f"ALERTA: Arquivo '{filename}' ignorado. Colunas necessárias {required_cols} não encontradas.")
+            continue
+        except Exception as e:
+            print(f"ALERTA: Falha ao processar o arquivo anual '{filename}'. Erro: {e}")
+            continue
+            
+    result = yearly_data.result()
+    if result.empty: return pd.DataFrame()
+    return result
+
+def load_travel_data(file_path):
+    ingestao.start(file_path)
+    if not os.path.exists(file_path) or not ingestao.within_file_budget('viagens', file_path): return pd.DataFrame()
+    try:
+        df = read_xlsx_columns(file_path, ['Favorecido', 'Saída', 'Chegada', 'Destino', 'Valor'])
+        if df is None: return pd.DataFrame()
+        saida = pd.to_datetime(df['Saída'], errors='coerce', dayfirst=True)
+        chegada = pd.to_datetime(df['Chegada'], errors='coerce', dayfirst=True)
+        duracao = ((chegada - saida).dt.days + 1).fillna(0)
+        valor = clean_monetary_value(df['Valor'])
+        df = df.assign(**{
+            'Saída': saida,
+            'Chegada': chegada,
+            'Duração': duracao,
+            'Valor': valor,
+            'Custo_Diario': valor / duracao,
+            'Favorecido_Abreviado': abbreviate_names(df['Favorecido']),
+        })
+        df = df[(df['Duração'] > 0) & (df['Duração'] <= 30)]
+        return df.dropna(subset=['Custo_Diario', 'Favorecido_Abreviado', 'Valor']).reset_index(drop=True)
+    except Exception: return pd.DataFrame()
+
+def load_general_expenses(file_path):
+    ingestao.start(file_path)
+    if not os.path.exists(file_path): return pd.DataFrame()
+    # A planilha de gastos gerais é a maior de todas: é limpa bloco a bloco (ver ingestao.py).
+    gastos = ingestao.AcumuladorBlocos('gastos_gerais', ignore_index=False)
+    try:
+        with gastos.arquivo():
+            for df in _file_chunks('gastos_gerais', file_path, ['Data', 'Credor', 'Empenhado', 'Pago']):
+                df_processed = pd.DataFrame({
+                    'Data': pd.to_datetime(df['Data'], errors='coerce', dayfirst=True),
+                    'Fornecedor': df['Credor'],
+                    'Valor_Empenhado': clean_monetary_value(df['Empenhado']),
+                    'Valor_Pago': clean_monetary_value(df['Pago']),
+                })
+                gastos.append(df_processed.dropna(subset=['Fornecedor', 'Data', 'Valor_Pago']))
+        return gastos.result()
+    except Exception:
+        gastos.close()
+        return pd.DataFrame()
+
+# ==============================================================================
+# Agregações e Análises
+# ==============================================================================
+def teachers(personal_data):
+    return personal_data[personal_data['Cargo'].str.contains('PROF', case=False, na=False)]
+
+def secretaries(personal_data):
+    """Um registro por secretário municipal (o primeiro encontrado na base histórica)."""
+    return personal_data[personal_data['Cargo'] == CARGO_SECRETARIO].drop_duplicates(subset=['Credor'])
+
+def salary_extremes(df, floor=PISO_SALARIAL_INDICADORES):
+    """Maior salário e menor salário acima de `floor`, com os respectivos nomes."""
+    if df.empty:
+        return None
+    idx_max = df['Projetado'].idxmax()
+    extremes = {'max_valor': df.at[idx_max, 'Projetado'], 'max_nome': df.at[idx_max, 'Credor'], 'min_valor': None, 'min_nome': None}
+    above_floor = df[df['Projetado'] > floor]
+    if not above_floor.empty:
+        idx_min = above_floor['Projetado'].idxmin()
+        extremes['min_valor'] = above_floor.at[idx_min, 'Projetado']
+        extremes['min_nome'] = above_floor.at[idx_min, 'Credor']
+    return extremes
+
+LINK_GRAPH_COLUMNS = ['Secretario', 'Origem', 'Nome', 'Cargo', 'Valor_Pago']
+
+def surname_link_graph(personal_data, general_expenses):
+    """
+    Grafo de vínculos por sobrenome: uma aresta por secretário e servidor (Origem 'servidor')
+    ou fornecedor (Origem 'fornecedor', com o total pago) que compartilham um sobrenome incomum.
+    """
+    if personal_data.empty:
+        return pd.DataFrame(columns=LINK_GRAPH_COLUMNS)
+    servidores = personal_data[['Credor', 'Cargo']].drop_duplicates()
+    edges = []
+    for _, secretario in secretaries(personal_data).iterrows():
+        if not uncommon_surnames(secretario['Credor']):
+            continue
+        matches, _ = find_surname_links(secretario, servidores, 'Credor')
+        edges.append(pd.DataFrame({'Secretario': secretario['Credor'], 'Origem': 'servidor',
+                                   'Nome': matches['Credor'], 'Cargo': matches['Cargo'], 'Valor_Pago': float('nan')}))
+        if not general_expenses.empty:
+            supplier_matches, _ = find_surname_links(secretario, general_expenses, 'Fornecedor')
+            totals = totals_by_name(supplier_matches, name_column='Fornecedor') if not supplier_matches.empty else pd.DataFrame(columns=['Fornecedor', 'Valor_Pago'])
+            edges.append(pd.DataFrame({'Secretario': secretario['Credor'], 'Origem': 'fornecedor',
+                                       'Nome': totals['Fornecedor'], 'Cargo': None, 'Valor_Pago': totals['Valor_Pago']}))
+    edges = [e for e in edges if not e.empty]
+    if not edges:
+        return pd.DataFrame(columns=LINK_GRAPH_COLUMNS)
+    return pd.concat(edges, ignore_index=True)[LINK_GRAPH_COLUMNS]
+
+def links_for(graph, secretario, origem):
+    """Arestas do grafo de vínculos de um secretário para uma origem ('servidor' ou 'fornecedor')."""
+    return graph[(graph['Secretario'] == secretario) & (graph['Origem'] == origem)]
+
+def secretary_link_counts(graph, secretary_names):
+    """Quantos servidores (que não são secretários) compartilham um sobrenome incomum com cada secretário."""
+    secretary_names = pd.Index(secretary_names)
+    servidores = graph[(graph['Origem'] == 'servidor') & ~graph['Nome'].isin(secretary_names)]
+    counts = servidores.groupby('Secretario', observed=True).size()
+    return counts.reindex(secretary_names, fill_value=0).astype('int64').rename('Contagem_Vinculos')
+
+def party_expenses(annual_data):
+    if 'Gasto_Festa' in annual_data.columns:
+        return annual_data[annual_data['Gasto_Festa']]
+    return annual_data[annual_data['Credor'].apply(is_party_expense)]
+
+def fuel_expenses(annual_data):
+    if 'Gasto_Combustivel' in annual_data.columns:
+        return annual_data[annual_data['Gasto_Combustivel']]
+    return annual_data[annual_data['Credor'].apply(is_fuel_expense)]
+
+def external_suppliers(annual_data):
+    """Remove órgãos públicos, secretarias e concessionárias dos pagamentos anuais."""
+    if 'Fornecedor_Externo' in annual_data.columns:
+        return annual_data[annual_data['Fornecedor_Externo']]
+    return annual_data[~annual_data['Credor'].apply(is_internal_or_utility)]
+
+def yearly_totals(annual_data):
+    return annual_data.groupby('Ano', observed=True)['Valor_Pago'].sum().reset_index()
+
+def _sum_by_entity(df, name_column):
+    """
+    Soma de `Valor_Pago` por nome. Com as colunas de entidades.add_entity_columns, agrupa
+    pelo ID inteiro da entidade (unindo as grafias de um mesmo fornecedor) e rotula cada
+    grupo com o nome canônico.
+    """
+    if 'Entidade' not in df.columns:
+        return df.groupby(name_column, observed=True)['Valor_Pago'].sum()
+    totals = df.groupby('Entidade')['Valor_Pago'].sum()
+    names = df.drop_duplicates('Entidade').set_index('Entidade')['Entidade_Nome'].astype(str)
+    return totals.set_axis(pd.Index(names.reindex(totals.index).values, name=name_column))
+
+def totals_by_name(df, name_column='Credor', year=None):
+    """Soma de `Valor_Pago` por nome (opcionalmente de um único ano), em ordem decrescente."""
+    if year is not None:
+        df = df[df['Ano'] == year]
+    return _sum_by_entity(df, name_column).reset_index().sort_values(by='Valor_Pago', ascending=False)
+
+def top_suppliers(external_data, year, n):
+    year_data = external_data[external_data['Ano'] == year]
+    return _sum_by_entity(year_data, 'Credor').nlargest(n).reset_index()
+
+def classify_categories(general_expenses):
+    if 'Categoria' in general_expenses.columns:
+        return general_expenses['Categoria']
+    return general_expenses['Fornecedor'].apply(categorizar_fornecedor)
+
+def classify_secretariats(general_expenses):
+    if 'Secretaria' in general_expenses.columns:
+        return general_expenses['Secretaria']
+    return general_expenses['Fornecedor'].apply(categorizar_por_secretaria)
+
+def enrich_annual_expenses(annual_data):
+    """Acrescenta as colunas de classificação (festas, combustível, fornecedor externo) aos pagamentos anuais."""
+    if annual_data.empty:
+        return annual_data
+    return annual_data.assign(
+        Gasto_Festa=annual_data['Credor'].apply(is_party_expense).astype(bool),
+        Gasto_Combustivel=annual_data['Credor'].apply(is_fuel_expense).astype(bool),
+        Fornecedor_Externo=~annual_data['Credor'].apply(is_internal_or_utility).astype(bool),
+    )
+
+def enrich_general_expenses(general_expenses):
+    """Acrescenta as colunas de Categoria e Secretaria aos gastos gerais."""
+    if general_expenses.empty:
+        return general_expenses
+    return general_expenses.assign(
+        Categoria=general_expenses['Fornecedor'].apply(categorizar_fornecedor),
+        Secretaria=general_expenses['Fornecedor'].apply(categorizar_por_secretaria),
+    )
+
+def category_options(categorias):
+    """Categorias principais na ordem do mapa, seguidas das demais encontradas em ordem alfabética."""
+    categorias_principais = list(CATEGORIAS_MAP.keys())
+    return categorias_principais + sorted([cat for cat in categorias.unique() if cat not in categorias_principais])
+
+def expense_totals(df):
+    """Totais (pago, empenhado) de um recorte de gastos gerais."""
+    return df['Valor_Pago'].sum(), df['Valor_Empenhado'].sum()
+
+def group_totals(general_expenses, groups, name):
+    """Totais pago e empenhado dos gastos gerais por grupo (categoria ou secretaria), em ordem decrescente."""
+    return (general_expenses.groupby(pd.Series(groups, index=general_expenses.index, name=name).astype(str))
+            [['Valor_Pago', 'Valor_Empenhado']].sum()
+            .sort_values('Valor_Pago', ascending=False)
+            .reset_index())
+
+def available_months_text(personal_data):
+    """Texto com os meses presentes na base de pessoal (ex: 'JANEIRO DE 2025 E JUNHO DE 2025')."""
+    datas_disponiveis = sorted(personal_data['Data'].unique())
+    if not datas_disponiveis:
+        return None
+    meses_formatados = [f"{MESES_PT.get(pd.to_datetime(d).month, '').upper()} DE {pd.to_datetime(d).year}" for d in datas_disponiveis]
+    if len(meses_formatados) == 1:
+        return meses_formatados[0]
+    return ", ".join(meses_formatados[:-1]) + " E " + meses_formatados[-1]
+
+def build_servant_index(personal_data):
+    """
+    Índice do histórico de cada servidor: a folha ordenada por (nome normalizado, mês) e,
+    para cada nome normalizado, o intervalo [início, fim) das suas linhas nessa ordem.
+    """
+    if personal_data.empty:
+        return {'folha': personal_data, 'posicoes': {}}
+    keys = personal_data['Credor'].map(normalize_name)
+    order = pd.DataFrame({'Chave': keys.to_numpy(), 'Data': personal_data['Data'].to_numpy()}).sort_values(['Chave', 'Data'], kind='stable').index
+    folha = personal_data.iloc[order].reset_index(drop=True)
+    sorted_keys = keys.iloc[order].to_numpy()
+    boundaries = (sorted_keys[1:] != sorted_keys[:-1]).nonzero()[0] + 1
+    starts = [0, *boundaries.tolist()]
+    stops = [*boundaries.tolist(), len(sorted_keys)]
+    return {'folha': folha, 'posicoes': {sorted_keys[a]: (a, b) for a, b in zip(starts, stops)}}
+
+def servant_timeline(index, name):
+    """Histórico mês a mês (Data, Cargo, Projetado) de um servidor, pelo índice de build_servant_index."""
+    start, stop = index['posicoes'].get(normalize_name(name), (0, 0))
+    return index['folha'].iloc[start:stop]
+
+def monthly_cargo_aggregates(personal_data):
+    """Série mensal por cargo: número de servidores, total, média e mediana do salário líquido."""
+    if personal_data.empty:
+        return pd.DataFrame(columns=['Cargo', 'Data', 'Servidores', 'Total', 'Media', 'Mediana'])
+    return (personal_data.groupby(['Cargo', 'Data'], observed=True)['Projetado']
+            .agg(Servidores='count', Total='sum', Media='mean', Mediana='median')
+            .reset_index())
+
+def cargo_trend_index(aggregates):
+    """Agrupa a série mensal por cargo ({cargo: série do cargo}) para consultas diretas."""
+    if aggregates.empty:
+        return {}
+    return {str(cargo): group.reset_index(drop=True) for cargo, group in aggregates.groupby('Cargo', observed=True, sort=True)}
+
+def enrich_travel_data(travel_data):
+    """Acrescenta às viagens as colunas formatadas usadas no gráfico (datas e valores em texto)."""
+    if travel_data.empty or 'Valor_Formatado' in travel_data.columns:
+        return travel_data
+    return travel_data.assign(
+        Saída_Formatada=travel_data['Saída'].dt.strftime('%d/%m/%y'),
+        Chegada_Formatada=travel_data['Chegada'].dt.strftime('%d/%m/%y'),
+        Valor_Formatado=travel_data['Valor'].map(format_brazilian_currency),
+        Custo_Diario_Formatado=travel_data['Custo_Diario'].map(format_brazilian_currency),
+    )
+
+def travel_aggregates(travel_data, by):
+    """Totais por destino ou por servidor: valor total, mediana do custo diário, viagens e dias."""
+    if travel_data.empty:
+        return pd.DataFrame(columns=[by, 'Total', 'Mediana_Custo_Diario', 'Viagens', 'Dias'])
+    return (travel_data.groupby(by, observed=True)
+            .agg(Total=('Valor', 'sum'), Mediana_Custo_Diario=('Custo_Diario', 'median'),
+                 Viagens=('Valor', 'size'), Dias=('Duração', 'sum'))
+            .sort_values('Total', ascending=False)
+            .reset_index())
+
+def travel_summary(travel_data):
+    """Custo diário médio e as viagens de menor e maior custo diário."""
+    return {
+        'media_diaria': travel_data['Custo_Diario'].mean(),
+        'menor': travel_data.loc[travel_data['Custo_Diario'].idxmin()],
+        'maior': travel_data.loc[travel_data['Custo_Diario'].idxmax()],
+    }
+
+
+# ==============================================================================
+# Tabela de Fatos de Pagamentos (todas as fontes)
+# ==============================================================================
+PAYMENT_FACT_COLUMNS = ['Fonte', 'Ano', 'Mes', 'Entidade', 'Nome', 'Valor_Pago', 'Valor_Empenhado', 'Categoria', 'Secretaria']
+
+def _map_unique(series, func):
+    """Aplica `func` uma vez por valor distinto (as colunas de nome se repetem muito)."""
+    return series.map({value: func(value) for value in series.unique()})
+
+def payment_facts(personal_data, annual_data, general_expenses):
+    """
+    Uma linha por pagamento das três fontes (folha, pagamentos anuais e gastos gerais), com o
+    favorecido pelo ID de entidade (entidades.add_entity_columns). Mes é 0 nos pagamentos
+    anuais, que só têm o ano. Ordenada por (Entidade, Ano, Mes) para build_payment_index.
+    """
+    parts = []
+    if not personal_data.empty and 'Entidade' in personal_data.columns:
+        parts.append(pd.DataFrame({
+            'Fonte': 'pessoal',
+            'Ano': personal_data['Data'].dt.year,
+            'Mes': personal_data['Data'].dt.month,
+            'Entidade': personal_data['Entidade'],
+            'Nome': personal_data['Entidade_Nome'].astype(str),
+            'Valor_Pago': personal_data['Projetado'],
+            'Valor_Empenhado': float('nan'),
+            'Categoria': personal_data['Cargo'].astype(str),
+            'Secretaria': 'Não Identificado',
+        }))
+    if not annual_data.empty and 'Entidade' in annual_data.columns:
+        credores = annual_data['Credor'].astype(str)
+        parts.append(pd.DataFrame({
+            'Fonte': 'anuais',
+            'Ano': annual_data['Ano'],
+            'Mes': 0,
+            'Entidade': annual_data['Entidade'],
+            'Nome': annual_data['Entidade_Nome'].astype(str),
+            'Valor_Pago': annual_data['Valor_Pago'],
+            'Valor_Empenhado': float('nan'),
+            'Categoria': _map_unique(credores, categorizar_fornecedor),
+            'Secretaria': _map_unique(credores, categorizar_por_secretaria),
+        }))
+    if not general_expenses.empty and 'Entidade' in general_expenses.columns:
+        parts.append(pd.DataFrame({
+            'Fonte': 'gastos_gerais',
+            'Ano': general_expenses['Data'].dt.year,
+            'Mes': general_expenses['Data'].dt.month,
+            'Entidade': general_expenses['Entidade'],
+            'Nome': general_expenses['Entidade_Nome'].astype(str),
+            'Valor_Pago': general_expenses['Valor_Pago'],
+            'Valor_Empenhado': general_expenses['Valor_Empenhado'],
+            'Categoria': classify_categories(general_expenses).astype(str),
+            'Secretaria': classify_secretariats(general_expenses).astype(str),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=PAYMENT_FACT_COLUMNS)
+    facts = pd.concat(parts, ignore_index=True).astype({
+        'Fonte': 'category', 'Ano': 'int16', 'Mes': 'int8', 'Entidade': 'int32',
+        'Nome': 'category', 'Valor_Pago': 'float64', 'Valor_Empenhado': 'float64',
+        'Categoria': 'category', 'Secretaria': 'category',
+    })
+    return facts.sort_values(['Entidade', 'Ano', 'Mes'], kind='stable').reset_index(drop=True)
+
+def build_payment_index(facts):
+    """
+    Índices da tabela de fatos: intervalo [início, fim) das linhas de cada entidade, posições
+    das linhas de cada ano e o nome normalizado de cada entidade (para a busca por nome).
+    """
+    if facts.empty:
+        return {'fatos': facts, 'por_entidade': {}, 'por_ano': {}, 'nomes': pd.Series(dtype=str)}
+    if not facts['Entidade'].is_monotonic_increasing:
+        facts = facts.sort_values(['Entidade', 'Ano', 'Mes'], kind='stable').reset_index(drop=True)
+    keys = facts['Entidade'].to_numpy()
+    boundaries = (keys[1:] != keys[:-1]).nonzero()[0] + 1
+    starts = [0, *boundaries.tolist()]
+    stops = [*boundaries.tolist(), len(keys)]
+    nomes = facts['Nome'].iloc[starts].astype(str)
+    return {
+        'fatos': facts,
+        'por_entidade': {int(keys[a]): (a, b) for a, b in zip(starts, stops)},
+        'por_ano': facts.groupby('Ano').indices,
+        'nomes': pd.Series(_map_unique(nomes, normalize_name).to_numpy(), index=keys[starts]),
+    }
+
+def payments_for(index, entidades=None, ano=None):
+    """Pagamentos de algumas entidades e/ou de um ano, por consulta aos índices de build_payment_index."""
+    fatos = index['fatos']
+    if entidades is None:
+        if ano is None:
+            return fatos
+        return fatos.iloc[index['por_ano'].get(ano, [])]
+    positions = [p for e in entidades if e in index['por_entidade'] for p in range(*index['por_entidade'][e])]
+    result = fatos.iloc[positions]
+    return result if ano is None else result[result['Ano'] == ano]
+
+def payments_by_name(index, termo, ano=None):
+    """Pagamentos, em todas as fontes, das entidades cujo nome contém a palavra buscada (ex: um sobrenome)."""
+    termo = normalize_name(termo)
+    if not termo:
+        return index['fatos'].iloc[0:0]
+    nomes = index['nomes']
+    entidades = nomes.index[nomes.str.contains(r'\b' + re.escape(termo) + r'\b', regex=True)]
+    return payments_for(index, entidades.tolist(), ano)
+
+
+# ==============================================================================
+# Valores Atípicos (estatísticas robustas por grupo)
+# ==============================================================================
+ANOMALY_COLUMNS = ['Tipo', 'Grupo', 'Nome', 'Periodo', 'Valor', 'Mediana_Grupo', 'Percentil', 'Escore']
+ROBUST_STATS_COLUMNS = ['Tipo', 'Grupo', 'N', 'Mediana', 'MAD', 'P05', 'P25', 'P75', 'P95']
+
+def robust_outliers(tipo, frame, threshold=LIMIAR_ANOMALIA, min_group=MIN_GRUPO_ANOMALIA, log_scale=False):
+    """
+    Recebe um DataFrame com Grupo, Nome, Periodo e Valor. Devolve (estatísticas por grupo:
+    N, mediana, MAD e percentis; linhas com escore robusto acima de `threshold`). Só o lado
+    alto é sinalizado: salários, diárias e pagamentos acima do normal do grupo. Com
+    `log_scale` o escore é calculado sobre log(1 + valor), para valores de cauda longa
+    como pagamentos a fornecedores; as estatísticas continuam em reais.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=ROBUST_STATS_COLUMNS), pd.DataFrame(columns=ANOMALY_COLUMNS)
+    frame = frame.assign(Grupo=frame['Grupo'].astype(str)).reset_index(drop=True)
+    by_group = frame.groupby('Grupo')['Valor']
+    median = by_group.transform('median')
+    deviation = (frame['Valor'] - median).abs()
+    stats = by_group.agg(N='size', Mediana='median')
+    stats['MAD'] = deviation.groupby(frame['Grupo']).median()
+    percentiles = by_group.quantile([0.05, 0.25, 0.75, 0.95]).unstack()
+    stats[['P05', 'P25', 'P75', 'P95']] = percentiles.to_numpy()
+    stats = stats.reset_index().assign(Tipo=tipo)[ROBUST_STATS_COLUMNS]
+
+    if log_scale:
+        values = np.log1p(frame['Valor'].clip(lower=0))
+        by_values = values.groupby(frame['Grupo'])
+        center = by_values.transform('median')
+        mad = (values - center).abs().groupby(frame['Grupo']).transform('median')
+    else:
+        values, center = frame['Valor'], median
+        mad = frame['Grupo'].map(stats.set_index('Grupo')['MAD'])
+    # Piso do MAD: MAD_MINIMO_RELATIVO da mediana em reais. Na escala logarítmica ele vira
+    # a distância entre log(1 + mediana) e log(1 + mediana * (1 + MAD_MINIMO_RELATIVO)).
+    if log_scale:
+        floor = np.log1p(median.clip(lower=0) * (1 + MAD_MINIMO_RELATIVO)) - np.log1p(median.clip(lower=0))
+    else:
+        floor = MAD_MINIMO_RELATIVO * median.abs()
+    mad = mad.clip(lower=floor)
+    size = by_group.transform('size')
+    score = (0.6745 * (values - center) / mad).where((mad > 0) & (size >= min_group))
+    flagged = frame.assign(
+        Tipo=tipo,
+        Mediana_Grupo=median,
+        Percentil=by_group.rank(pct=True) * 100,
+        Escore=score,
+    )[score > threshold]
+    return stats, flagged[ANOMALY_COLUMNS]
+
+def anomaly_tables(personal_data, travel_data, general_expenses):
+    """
+    Valores atípicos das três análises, em uma única tabela ordenada pelo escore:
+    salários (por cargo), custo diário das viagens e picos mensais de pagamento a um
+    fornecedor (comparados aos demais fornecedores da mesma categoria).
+    Devolve (anomalias, estatísticas por grupo).
+    """
+    results = []
+    if not personal_data.empty:
+        results.append(robust_outliers('Salário', pd.DataFrame({
+            'Grupo': personal_data['Cargo'].astype(str),
+            'Nome': personal_data['Credor'].astype(str),
+            'Periodo': personal_data['Data'].dt.strftime('%m/%Y'),
+            'Valor': personal_data['Projetado'],
+        })))
+    if not travel_data.empty:
+        results.append(robust_outliers('Diária de Viagem', pd.DataFrame({
+            'Grupo': 'Viagens',
+            'Nome': travel_data['Favorecido'].astype(str),
+            'Periodo': travel_data['Saída'].dt.strftime('%d/%m/%Y'),
+            'Valor': travel_data['Custo_Diario'],
+        })))
+    if not general_expenses.empty:
+        name_column = 'Entidade_Nome' if 'Entidade_Nome' in general_expenses.columns else 'Fornecedor'
+        # Repasses internos (fundos, prefeitura, INSS...) não são fornecedores e distorceriam a comparação.
+        external = ~_map_unique(general_expenses['Fornecedor'].astype(str), is_internal_or_utility).astype(bool)
+        monthly = (general_expenses[external].assign(Categoria=classify_categories(general_expenses).astype(str),
+                                           Mes=general_expenses['Data'].dt.to_period('M'))
+                   .groupby(['Categoria', name_column, 'Mes'], observed=True)['Valor_Pago'].sum()
+                   .reset_index())
+        results.append(robust_outliers('Pagamento a Fornecedor', pd.DataFrame({
+            'Grupo': monthly['Categoria'],
+            'Nome': monthly[name_column].astype(str),
+            'Periodo': monthly['Mes'].dt.strftime('%m/%Y'),
+            'Valor': monthly['Valor_Pago'],
+        }), threshold=LIMIAR_ANOMALIA_PAGAMENTOS, log_scale=True))
+    if not results:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS), pd.DataFrame(columns=ROBUST_STATS_COLUMNS)
+    anomalies = (pd.concat([flagged for _, flagged in results], ignore_index=True)
+                 .sort_values('Escore', ascending=False, kind='stable').reset_index(drop=True))
+    stats = pd.concat([stats for stats, _ in results], ignore_index=True)
+    return anomalies, stats
@@ -0,0 +1,309 @@
+# api_dados.py
+#
+# API HTTP somente-leitura (JSON) com as mesmas agregações do painel, para outras
+# ferramentas não precisarem renderizar a página do Streamlit. Lê os mesmos dados
+# em cache de cache_painel.load_datasets() e guarda as respostas já serializadas
+# por versão dos dados; cada resposta leva um ETag derivado dessa versão e da
+# consulta, e um GET com If-None-Match igual recebe 304 sem recalcular nada.
+# O ETag também inclui as versões do formato do snapshot, das regras de entidades e
+# do código das agregações (API_VERSAO e o conteúdo de analise.py e api_dados.py):
+# um deploy que muda os cálculos invalida as respostas antigas dos clientes.
+#
+#   python api_dados.py --porta 8502      (processo separado)
+#   PAINEL_API_PORTA=8502 python servidor.py   (no mesmo processo do painel)
+#
+# Todas as rotas aceitam ?municipio=<id> (municipios.py; padrão: o município padrão).
+#
+# Rotas (GET):
+#   /api/municipios                        municípios cadastrados
+#   /api/versao                            versões dos conjuntos de dados
+#   /api/festas                            total anual pago em festas e eventos
+#   /api/combustivel                       total anual pago em combustível
+#   /api/fornecedores/top?ano=&n=          maiores fornecedores externos do ano
+#   /api/categorias?inicio=&fim=           gastos gerais por categoria (datas AAAA-MM-DD)
+#   /api/secretarias?inicio=&fim=          gastos gerais por secretaria
+#   /api/servidores?nome=                  busca na folha de pagamento
+#   /api/vinculos?secretario=&origem=      vínculos por sobrenome (sem secretário: contagem por secretário)
+#   /api/pagamentos?nome=&ano=             pagamentos de um favorecido em todas as fontes
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import analise
+import entidades
+import municipios
+import snapshot
+
+API_VERSAO = 1 # incrementar quando o formato ou o cálculo de alguma rota mudar
+API_CACHE_SIZE = int(os.environ.get('PAINEL_API_CACHE', '256'))
+MAX_LINHAS = 500 # Limite de linhas nas buscas por nome
+
+
+class ErroConsulta(ValueError):
+    """Parâmetro ausente ou inválido na consulta (resposta 400)."""
+
+
+# ==============================================================================
+# Funções de Apoio
+# ==============================================================================
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+def _param(params, name, default=None, required=False):
+    value = params.get(name, [default])[0]
+    if required and not value:
+        raise ErroConsulta(f"Parâmetro obrigatório: {name}")
+    return value
+
+def _int_param(params, name, default=None):
+    value = _param(params, name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ErroConsulta(f"'{name}' deve ser um número inteiro") from None
+
+def _date_param(params, name):
+    value = _param(params, name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ErroConsulta(f"'{name}' deve estar no formato AAAA-MM-DD") from None
+
+def _municipio(params):
+    municipio = _param(params, 'municipio', municipios.MUNICIPIO_PADRAO)
+    try:
+        return municipios.get(municipio).id
+    except municipios.MunicipioDesconhecido as e:
+        raise ErroConsulta(str(e)) from None
+
+def _datasets(params):
+    # Importado aqui para que o módulo possa ser carregado sem o Streamlit (ex: na ajuda da linha de comando).
+    import cache_painel
+    return cache_painel.load_datasets(municipio=_municipio(params))
+
+
+# ==============================================================================
+# Rotas
+# ==============================================================================
+def rota_municipios(params, dados):
+    return [{'id': m.id, 'nome': m.nome, 'uf': m.uf} for m in municipios.listar().values()]
+
+def rota_versao(params, dados):
+    import cache_painel
+    return cache_painel.get_watcher(_municipio(params)).versions()
+
+def rota_festas(params, dados):
+    return _records(analise.yearly_totals(analise.party_expenses(dados['anuais'])))
+
+def rota_combustivel(params, dados):
+    return _records(analise.yearly_totals(analise.fuel_expenses(dados['anuais'])))
+
+def rota_top_fornecedores(params, dados):
+    externos = analise.external_suppliers(dados['anuais'])
+    if externos.empty:
+        return []
+    ano = _int_param(params, 'ano', int(externos['Ano'].max()))
+    n = min(_int_param(params, 'n', 8), 100)
+    return _records(analise.top_suppliers(externos, ano, n))
+
+def _gastos_periodo(params):
+    import cache_painel
+    return cache_painel.query_general_expenses(_date_param(params, 'inicio'), _date_param(params, 'fim'), municipio=_municipio(params))
+
+def rota_categorias(params, dados):
+    gastos = _gastos_periodo(params)
+    if gastos.empty:
+        return []
+    return _records(analise.group_totals(gastos, analise.classify_categories(gastos), 'Categoria'))
+
+def rota_secretarias(params, dados):
+    gastos = _gastos_periodo(params)
+    if gastos.empty:
+        return []
+    return _records(analise.group_totals(gastos, analise.classify_secretariats(gastos), 'Secretaria'))
+
+def rota_servidores(params, dados):
+    nome = _param(params, 'nome', required=True)
+    encontrados = analise.filter_by_name(dados['pessoal'], 'Credor', re.escape(nome))
+    colunas = ['Credor', 'Cargo', 'Projetado', 'Data']
+    return _records(encontrados[colunas].sort_values('Projetado', ascending=False).head(MAX_LINHAS))
+
+def rota_vinculos(params, dados):
+    grafo = dados['vinculos']
+    secretario = _param(params, 'secretario')
+    if not secretario:
+        contagem = analise.secretary_link_counts(grafo, analise.secretaries(dados['pessoal'])['Credor'])
+        return _records(contagem.rename_axis('Secretario').reset_index())
+    origem = _param(params, 'origem', 'fornecedor')
+    if origem not in ('fornecedor', 'servidor'):
+        raise ErroConsulta("'origem' deve ser 'fornecedor' ou 'servidor'")
+    return _records(analise.links_for(grafo, secretario.upper(), origem)[['Nome', 'Cargo', 'Valor_Pago']])
+
+def rota_pagamentos(params, dados):
+    nome = _param(params, 'nome', required=True)
+    pagamentos = analise.payments_by_name(dados['pagamentos'], nome, _int_param(params, 'ano'))
+    return _records(pagamentos.groupby(['Nome', 'Fonte'], observed=True)['Valor_Pago'].sum().reset_index()
+                    .sort_values('Valor_Pago', ascending=False).head(MAX_LINHAS))
+
+ROTAS = {
+    '/api/municipios': rota_municipios,
+    '/api/versao': rota_versao,
+    '/api/festas': rota_festas,
+    '/api/combustivel': rota_combustivel,
+    '/api/fornecedores/top': rota_top_fornecedores,
+    '/api/categorias': rota_categorias,
+    '/api/secretarias': rota_secretarias,
+    '/api/servidores': rota_servidores,
+    '/api/vinculos': rota_vinculos,
+    '/api/pagamentos': rota_pagamentos,
+}
+
+
+# ==============================================================================
+# Cache de Respostas e Servidor HTTP
+# ==============================================================================
+class CacheRespostas:
+    """LRU de respostas serializadas, por ETag (que já inclui a versão dos dados)."""
+
+    def __init__(self, max_entries=API_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag, body):
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+_cache = CacheRespostas()
+
+def _source_digest(*modules):
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+# Tudo o que muda as respostas sem mudar os arquivos de dados.
+VERSAO_CODIGO = {
+    'api': API_VERSAO,
+    'snapshot': snapshot.FORMAT_VERSION,
+    'entidades': entidades.REGRAS_VERSAO,
+    'fontes': _source_digest(analise, sys.modules[__name__]),
+}
+
+def make_etag(fingerprints, path, params):
+    # As impressões digitais dos arquivos (e não os contadores de versão, que recomeçam a cada
+    # processo) mantêm o ETag válido entre reinícios enquanto os dados e o código não mudam.
+    chave = json.dumps([VERSAO_CODIGO, fingerprints, path, sorted(params.items())], sort_keys=True, default=str)
+    return '"' + hashlib.sha1(chave.encode('utf-8')).hexdigest()[:20] + '"'
+
+def responder(path, params, if_none_match=None):
+    """
+    Executa uma consulta: devolve (status, corpo em bytes, ETag). O ETag sai das impressões
+    digitais dos arquivos, de VERSAO_CODIGO e da consulta; se for igual a `if_none_match` a resposta é 304, sem
+    executar a rota (mesmo com o cache de respostas vazio, ex: depois de um reinício).
+    """
+    import cache_painel
+    rota = ROTAS.get(path.rstrip('/') or '/')
+    if rota is None:
+        return 404, json.dumps({'erro': f"Rota desconhecida: {path}", 'rotas': sorted(ROTAS)}, ensure_ascii=False).encode('utf-8'), None
+    try:
+        municipio = _municipio(params)
+    except ErroConsulta as e:
+        return 400, json.dumps({'erro': str(e)}, ensure_ascii=False).encode('utf-8'), None
+    cache_painel.activate(municipio)
+    watcher = cache_painel.get_watcher(municipio)
+    etag = make_etag({name: watcher.fingerprint(name) for name in watcher.versions()}, path, params)
+    if if_none_match == etag:
+        return 304, b'', etag
+    body = _cache.get(etag)
+    if body is None:
+        try:
+            # A lista de municípios não depende dos dados de nenhum deles.
+            resultado = rota(params, None if rota is rota_municipios else _datasets(params))
+        except ErroConsulta as e:
+            return 400, json.dumps({'erro': str(e)}, ensure_ascii=False).encode('utf-8'), None
+        body = json.dumps({'dados': resultado}, ensure_ascii=False).encode('utf-8')
+        _cache.put(etag, body)
+    return 200, body, etag
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'PainelAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, body, etag = responder(url.path, parse_qs(url.query), self.headers.get('If-None-Match'))
+        except Exception as e:
+            print(f"ALERTA: Erro na API ao responder '{self.path}': {e}")
+            status, body, etag = 500, json.dumps({'erro': 'Erro interno'}).encode('utf-8'), None
+        if status == 304:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if os.environ.get('PAINEL_API_LOG') == '1':
+            super().log_message(format, *args)
+
+
+def start_background(port, host='0.0.0.0'):
+    """Inicia a API numa thread do processo atual (ao lado do painel) e devolve o servidor."""
+    httpd = ThreadingHTTPServer((host, port), ApiHandler)
+    threading.Thread(target=httpd.serve_forever, name='api-dados', daemon=True).start()
+    print(f"API de dados em http://{host}:{port}/api/")
+    return httpd
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON somente-leitura com as agregações do painel.")
+    parser.add_argument('--porta', type=int, default=int(os.environ.get('PAINEL_API_PORTA', '8502')))
+    parser.add_argument('--host', default='0.0.0.0')
+    args = parser.parse_args()
+
+    import aquecimento
+    aquecimento.warm_up()
+    httpd = ThreadingHTTPServer((args.host, args.porta), ApiHandler)
+    print(f"API de dados em http://{args.host}:{args.porta}/api/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    main()
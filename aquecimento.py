@@ -0,0 +1,77 @@
+# aquecimento.py
+#
+# Aquecimento dos caches do painel na inicialização do processo. servidor.py
+# chama warm_up() antes de o Streamlit abrir a porta (ou em segundo plano, com
+# PAINEL_AQUECIMENTO=segundo_plano), de modo que o primeiro visitante já encontra
+# as planilhas lidas, classificadas e o grafo de vínculos montado.
+#
+# O tempo gasto em cada conjunto de dados é impresso no log e fica disponível em
+# status(); is_ready() indica se o aquecimento já terminou.
+
+import threading
+import time
+
+_ready = threading.Event()
+_lock = threading.Lock()
+_status = {
+    'pronto': False,
+    'em_andamento': False,
+    'erro': None,
+    'duracao_total_s': None,
+    'conjuntos': {},
+}
+
+
+def warm_up():
+    """Carrega todos os conjuntos de dados nos caches compartilhados e registra o tempo de cada um."""
+    # Importado aqui para que o módulo possa ser consultado (is_ready/status) sem carregar o Streamlit.
+    import cache_painel
+
+    with _lock:
+        if _status['em_andamento'] or _ready.is_set():
+            return status()
+        _status['em_andamento'] = True
+
+    print("--- Aquecendo os caches do painel ---")
+    start = time.perf_counter()
+    timings = {}
+    try:
+        cache_painel.load_datasets(timings=timings)
+    except Exception as e:
+        print(f"ALERTA: Falha no aquecimento dos caches; os dados serão carregados na primeira visita. Erro: {e}")
+        with _lock:
+            _status['erro'] = str(e)
+    total = time.perf_counter() - start
+
+    with _lock:
+        _status['conjuntos'] = {name: round(seconds, 3) for name, seconds in timings.items()}
+        _status['duracao_total_s'] = round(total, 3)
+        _status['em_andamento'] = False
+        _status['pronto'] = _status['erro'] is None
+    for name, seconds in timings.items():
+        print(f"   - {name}: {seconds:.2f} s")
+    print(f"Aquecimento concluído em {total:.2f} s.")
+    # Mesmo com erro o sinal é liberado: quem espera não deve ficar bloqueado para sempre.
+    _ready.set()
+    return status()
+
+def start_background():
+    """Executa warm_up() numa thread separada e devolve a thread."""
+    thread = threading.Thread(target=warm_up, name='aquecimento-painel', daemon=True)
+    thread.start()
+    return thread
+
+def is_ready():
+    """Indica se o aquecimento terminou com sucesso."""
+    with _lock:
+        return _status['pronto']
+
+def wait(timeout=None):
+    """Bloqueia até o aquecimento terminar (ou o tempo esgotar); devolve is_ready()."""
+    _ready.wait(timeout)
+    return is_ready()
+
+def status():
+    """Cópia do estado do aquecimento: pronto, em andamento, erro, tempo total e tempo por conjunto."""
+    with _lock:
+        return {**_status, 'conjuntos': dict(_status['conjuntos'])}
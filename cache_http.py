@@ -0,0 +1,136 @@
+# cache_http.py
+#
+# Cache HTTP local (SQLite) para os coletores. Cada resposta 200 é guardada com
+# seu ETag/Last-Modified; enquanto está dentro do prazo de validade é devolvida
+# sem tocar a rede e, depois disso, é revalidada com um GET condicional
+# (If-None-Match / If-Modified-Since): um 304 do servidor renova o prazo sem
+# baixar a página de novo. Meses já encerrados recebem um prazo longo, de modo
+# que reexecuções e cargas históricas quase não consultam o portal da prefeitura.
+# Um mês só é considerado encerrado MESES_ATE_FECHAR meses depois: a folha do mês
+# anterior ainda costuma ser publicada aos poucos. E o coletor não guarda páginas
+# vazias (o fim da paginação), que ganham registros quando o mês é completado.
+#
+# O arquivo fica em PAINEL_CACHE_HTTP (padrão .cache_http.sqlite).
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_FILE = os.environ.get('PAINEL_CACHE_HTTP', '.cache_http.sqlite')
+TTL_MES_FECHADO = 30 * 24 * 3600 # Meses encerrados raramente mudam no portal
+TTL_MES_ABERTO = 3600
+MESES_ATE_FECHAR = 2 # em outubro, setembro ainda está aberto e agosto já está encerrado
+
+
+def ttl_para_mes(mes, ano, hoje=None):
+    """Prazo de validade (s) das páginas de um mês: longo para meses encerrados, curto para os recentes."""
+    hoje = hoje or date.today()
+    meses_atras = (hoje.year * 12 + hoje.month) - (ano * 12 + mes)
+    return TTL_MES_FECHADO if meses_atras >= MESES_ATE_FECHAR else TTL_MES_ABERTO
+
+
+class CachedSession:
+    """Sessão HTTP com cache em SQLite e requisições condicionais. Segura para uso entre threads."""
+
+    def __init__(self, path=CACHE_FILE, session=None):
+        self.path = path
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self.stats = {'rede': 0, 'cache': 0, 'revalidado': 0}
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    url TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    cabecalhos TEXT NOT NULL,
+                    corpo BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    armazenado_em REAL NOT NULL,
+                    ttl REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _load(self, url):
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "SELECT status, cabecalhos, corpo, etag, last_modified, armazenado_em, ttl FROM respostas WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def _store(self, url, response, ttl):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(dict(response.headers)), response.content,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time(), ttl),
+            )
+
+    def _forget(self, url):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM respostas WHERE url = ?", (url,))
+
+    def _touch(self, url, ttl):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE respostas SET armazenado_em = ?, ttl = ? WHERE url = ?", (time.time(), ttl, url))
+
+    def _count(self, kind):
+        with self._lock:
+            self.stats[kind] += 1
+
+    @staticmethod
+    def _from_row(url, row, origem):
+        status, cabecalhos, corpo, *_ = row
+        response = requests.Response()
+        response.status_code = status
+        response._content = corpo
+        response.headers = CaseInsensitiveDict(json.loads(cabecalhos))
+        response.url = url
+        response.reason = 'OK'
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = origem
+        return response
+
+    def get(self, url, ttl=TTL_MES_ABERTO, headers=None, params=None, cacheavel=None, **kwargs):
+        """
+        GET com cache: devolve a cópia local se ainda válida; senão revalida ou baixa de novo.
+        A chave do cache é a URL final, já com os `params` na query string. `cacheavel`
+        (resposta -> bool) recusa respostas 200 que não devem ser guardadas, como a
+        página vazia do fim da paginação.
+        """
+        url = requests.Request('GET', url, params=params).prepare().url
+        row = self._load(url)
+        if row is not None and time.time() - row[5] < row[6]:
+            self._count('cache')
+            return self._from_row(url, row, 'cache')
+
+        request_headers = dict(headers or {})
+        if row is not None:
+            etag, last_modified = row[3], row[4]
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+
+        response = self.session.get(url, headers=request_headers, **kwargs)
+        if response.status_code == 304 and row is not None:
+            self._touch(url, ttl)
+            self._count('revalidado')
+            return self._from_row(url, row, 'revalidado')
+
+        self._count('rede')
+        if response.status_code == 200 and (cacheavel is None or cacheavel(response)):
+            self._store(url, response, ttl)
+        elif row is not None:
+            self._forget(url)
+        response.from_cache = None
+        return response
@@ -0,0 +1,352 @@
+# cache_painel.py
+#
+# Caches do Streamlit sobre o núcleo analítico (analise.py). Ficam num módulo
+# próprio, e não no dashboard.py, porque o Streamlit identifica cada cache pelo
+# módulo da função: assim o aquecimento feito por servidor.py antes de o servidor
+# aceitar conexões preenche exatamente os mesmos caches usados pelas sessões.
+#
+# Todos usam st.cache_resource (um único objeto compartilhado, sem cópias por
+# execução); os DataFrames devolvidos seguem o contrato somente-leitura de analise.py.
+#
+# Cada função em cache recebe o id do município (municipios.py) como primeiro
+# argumento, que separa os caches de cada um. Só os MAX_MUNICIPIOS_ATIVOS municípios
+# usados mais recentemente ficam em memória: ao passar do limite, todos os caches do
+# menos usado que não esteja aberto em nenhuma sessão são descartados (activate).
+
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import analise
+import entidades
+import ingestao
+import graficos
+import metricas
+import monitor_arquivos
+import municipios
+import snapshot
+
+# A versão atual e a anterior de cada conjunto de dados, para cada município ativo.
+MAX_ENTRADAS = 2 * municipios.MAX_MUNICIPIOS_ATIVOS
+
+
+# ==============================================================================
+# Funções de Leitura de Dados (cache sobre o núcleo analítico)
+# ==============================================================================
+# Cada loader recebe a versão do seu conjunto de dados (ver monitor_arquivos.py) como
+# parte da chave do cache: quando um arquivo muda, só os caches que dependem dele são
+# refeitos. MAX_ENTRADAS descarta a versão antiga assim que a nova é carregada.
+@st.cache_resource
+def get_watcher(municipio):
+    """Monitor dos arquivos do município, compartilhado por todas as sessões do processo."""
+    return monitor_arquivos.DatasetWatcher(municipios.get(municipio).base_dir).start()
+
+@st.cache_resource
+def get_entity_resolver(municipio):
+    """Tabela nome -> entidade do município (a mesma usada por snapshot.py, então os IDs coincidem)."""
+    return entidades.ResolvedorEntidades(municipios.get(municipio).path(entidades.ENTIDADES_FILE))
+
+@metricas.timed('load_financial_data')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_financial_data(municipio, file_path, versao):
+    return analise.load_financial_data(file_path)
+
+@metricas.timed('load_and_process_spending_data')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_and_process_spending_data(municipio, folder_path, versao):
+    data = analise.load_and_process_spending_data(folder_path)
+    return analise.freeze_frame('pessoal', entidades.add_entity_columns(data, 'Credor', get_entity_resolver(municipio), aproximado=False), municipio)
+
+@metricas.timed('load_annual_expenses_data')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_annual_expenses_data(municipio, folder_path, versao):
+    data = analise.enrich_annual_expenses(analise.load_annual_expenses_data(folder_path))
+    return analise.freeze_frame('anuais', entidades.add_entity_columns(data, 'Credor', get_entity_resolver(municipio)), municipio)
+
+@metricas.timed('load_travel_data')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_travel_data(municipio, file_path, versao):
+    return analise.freeze_frame('viagens', analise.enrich_travel_data(analise.load_travel_data(file_path)), municipio)
+
+@metricas.timed('load_general_expenses')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_general_expenses(municipio, file_path, versao):
+    data = analise.enrich_general_expenses(analise.load_general_expenses(file_path))
+    return analise.freeze_frame('gastos_gerais', entidades.add_entity_columns(data, 'Fornecedor', get_entity_resolver(municipio)), municipio)
+
+@metricas.timed('build_link_graph')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_link_graph(municipio, _personal_data, _general_expenses, versoes):
+    return analise.freeze_frame('vinculos', analise.surname_link_graph(_personal_data, _general_expenses), municipio)
+
+@metricas.timed('build_servant_index')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_servant_index(municipio, _personal_data, versao):
+    index = analise.build_servant_index(_personal_data)
+    analise.freeze_frame('indice_servidores', index['folha'], municipio)
+    return index
+
+@metricas.timed('build_cargo_trends')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_cargo_trends(municipio, _personal_data, _monthly_aggregates, versao):
+    """Série mensal por cargo; usa a tabela já agregada do snapshot quando ela é passada."""
+    if _monthly_aggregates is None:
+        _monthly_aggregates = analise.monthly_cargo_aggregates(_personal_data)
+    return analise.cargo_trend_index(_monthly_aggregates)
+
+@metricas.timed('build_travel_aggregates')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_travel_aggregates(municipio, _travel_data, _precomputed, versao):
+    """Totais de viagens por destino e por servidor; usa as tabelas do snapshot quando passadas."""
+    if _precomputed is not None:
+        return _precomputed
+    return {
+        'destino': analise.travel_aggregates(_travel_data, 'Destino'),
+        'servidor': analise.travel_aggregates(_travel_data, 'Favorecido'),
+    }
+
+@metricas.timed('build_salary_indicators')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_salary_indicators(municipio, _personal_data, versao):
+    """Maior e menor salário de professores e de secretários, calculados uma vez por versão da folha."""
+    return {
+        'professores': analise.salary_extremes(analise.teachers(_personal_data)),
+        'secretarios': analise.salary_extremes(_personal_data[_personal_data['Cargo'] == analise.CARGO_SECRETARIO]),
+    }
+
+@metricas.timed('build_anomalies')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_anomalies(municipio, _personal_data, _travel_data, _general_expenses, _precomputed, versoes):
+    """Valores atípicos e estatísticas robustas por grupo; usa as tabelas do snapshot quando passadas."""
+    if _precomputed is not None:
+        return _precomputed
+    anomalias, estatisticas = analise.anomaly_tables(_personal_data, _travel_data, _general_expenses)
+    return {'anomalias': analise.freeze_frame('anomalias', anomalias, municipio), 'estatisticas': estatisticas}
+
+@metricas.timed('build_payment_index')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def build_payment_index(municipio, _facts, _personal_data, _annual_data, _general_expenses, versoes):
+    """Tabela de fatos de pagamentos e seus índices; usa a tabela do snapshot quando ela é passada."""
+    if _facts is None:
+        _facts = analise.payment_facts(_personal_data, _annual_data, _general_expenses)
+    index = analise.build_payment_index(_facts)
+    analise.freeze_frame('pagamentos', index['fatos'], municipio)
+    return index
+
+@metricas.timed('load_snapshot')
+@st.cache_resource(max_entries=MAX_ENTRADAS)
+@metricas.mark_cache_miss
+def load_snapshot(municipio, snapshot_dir):
+    """Mapeia em memória as tabelas de uma versão do snapshot gerado por snapshot.py."""
+    tables = {name: analise.freeze_frame(f'snapshot/{name}', snapshot.read_table(snapshot_dir, name), municipio)
+              for name in ('pessoal', 'anuais', 'gastos_gerais', 'viagens', 'vinculos', 'pessoal_mensal_cargo',
+                           'viagens_por_destino', 'viagens_por_servidor', 'pagamentos',
+                           'anomalias', 'estatisticas_robustas')}
+    return tables, snapshot.read_manifest(snapshot_dir)
+
+def query_general_expenses(inicio=None, fim=None, fornecedor=None, municipio=municipios.MUNICIPIO_PADRAO):
+    """
+    Gastos gerais do período [inicio, fim] (e, opcionalmente, do fornecedor buscado).
+    Com o snapshot em dia, a tabela já mapeada (gravada em partições mensais, em ordem de
+    data) é recortada por busca binária numa fatia sem cópia; senão, recorta a planilha
+    bruta já carregada em cache. Sem filtros, devolve o próprio DataFrame em cache.
+    """
+    activate(municipio)
+    cidade = municipios.get(municipio)
+    watcher = get_watcher(municipio)
+    snapshot_dir = snapshot.current_snapshot_dir(cidade.path(snapshot.SNAPSHOT_ROOT))
+    if snapshot_dir:
+        tables, manifest = _em_cache(municipio, load_snapshot, municipio, snapshot_dir)
+        if 'gastos_gerais' in snapshot.fresh_datasets(manifest, {'gastos_gerais': watcher.fingerprint('gastos_gerais')}):
+            periodo = analise.period_slice(tables['gastos_gerais'], inicio, fim)
+            return analise.filter_general_expenses(periodo, fornecedor=fornecedor)
+    data = _em_cache(municipio, load_general_expenses, municipio, cidade.path(analise.GASTOS_GERAIS_FILE), watcher.version('gastos_gerais'))
+    return analise.filter_general_expenses(data, inicio, fim, fornecedor)
+
+# ==============================================================================
+# Figuras (cache por versão dos dados)
+# ==============================================================================
+@metricas.timed('build_chart')
+@st.cache_resource(max_entries=32 * municipios.MAX_MUNICIPIOS_ATIVOS)
+@metricas.mark_cache_miss
+def _cached_chart(municipio, builder, _data, versao, params):
+    return getattr(graficos, builder)(_data, *params)
+
+def chart(builder, dataset, data, *params, municipio=municipios.MUNICIPIO_PADRAO):
+    """
+    Figura de graficos.<builder>(data, *params) guardada em cache pela versão atual do
+    conjunto de dados de origem e pelos parâmetros, em vez de refeita a cada execução.
+    """
+    activate(municipio)
+    return _em_cache(municipio, _cached_chart, municipio, builder, data, get_watcher(municipio).version(dataset), params)
+
+# ==============================================================================
+# Municípios Ativos (descarte dos caches dos menos usados)
+# ==============================================================================
+_ativos_lock = threading.Lock()
+_ativos = OrderedDict() # município -> {(função em cache, argumentos da chave)} chamados para ele
+_sessoes = {} # id da sessão do Streamlit -> município exibido nela
+
+def _em_cache(municipio, func, *args):
+    """
+    Chama a função em cache `func` anotando os argumentos que formam a chave (os que não
+    começam com '_'), para que a entrada possa ser descartada se o município ficar inativo.
+    """
+    nomes = inspect.signature(func).parameters
+    chave = tuple(None if nome.startswith('_') else arg for nome, arg in zip(nomes, args))
+    with _ativos_lock:
+        _ativos.setdefault(municipio, set()).add((func, chave))
+    return func(*args)
+
+def _current_session():
+    """Id da sessão do Streamlit que está executando (None no aquecimento e na API)."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def _is_live_session(sessao):
+    return runtime.exists() and runtime.get_instance().is_active_session(sessao)
+
+def _municipios_em_uso():
+    """Municípios exibidos em alguma sessão ainda aberta (esquece as sessões encerradas)."""
+    for sessao in [s for s in _sessoes if not _is_live_session(s)]:
+        del _sessoes[sessao]
+    return set(_sessoes.values())
+
+def activate(municipio):
+    """
+    Marca o município como o usado mais recentemente (e como o exibido na sessão atual do
+    Streamlit, se houver uma). Se houver mais de MAX_MUNICIPIOS_ATIVOS, descarta os dados em
+    cache, o monitor de arquivos e a tabela de entidades dos menos usados que não estão
+    abertos em nenhuma sessão; eles voltam a ser carregados (do snapshot) na próxima visita.
+    Municípios em uso nunca são descartados, mesmo que isso deixe mais deles em memória.
+    """
+    sessao = _current_session()
+    with _ativos_lock:
+        if sessao is not None:
+            _sessoes[sessao] = municipio
+        _ativos.setdefault(municipio, set())
+        _ativos.move_to_end(municipio)
+        excedentes = len(_ativos) - municipios.MAX_MUNICIPIOS_ATIVOS
+        em_uso = _municipios_em_uso() if excedentes > 0 else set()
+        inativos = []
+        for nome in list(_ativos):
+            if len(inativos) >= excedentes:
+                break
+            if nome != municipio and nome not in em_uso:
+                inativos.append((nome, _ativos.pop(nome)))
+    for nome, chamadas in inativos:
+        _evict(nome, chamadas)
+
+def _evict(municipio, chamadas):
+    for func, chave in chamadas:
+        # Com PAINEL_METRICAS=1 a função em cache está dentro do decorador de medição.
+        cached = func if hasattr(func, 'clear') else func.__wrapped__
+        cached.clear(*chave)
+    get_watcher(municipio).stop()
+    get_watcher.clear(municipio)
+    get_entity_resolver.clear(municipio)
+    analise.release_frames(municipio)
+    print(f"INFO: Caches do município '{municipio}' descartados (inativo; limite de {municipios.MAX_MUNICIPIOS_ATIVOS} município(s) em memória).")
+
+def active_tenants():
+    """Municípios com dados em memória, do menos para o mais usado recentemente."""
+    with _ativos_lock:
+        return list(_ativos)
+
+def load_datasets(timings=None, municipio=municipios.MUNICIPIO_PADRAO):
+    """
+    Usa as tabelas do snapshot pré-processado do município para os conjuntos cujos
+    arquivos não mudaram desde que ele foi gerado; os demais são lidos das planilhas
+    brutas. Se `timings` for um dict, recebe o tempo (s) gasto em cada conjunto de dados.
+    """
+    timings = {} if timings is None else timings
+    activate(municipio)
+    cidade = municipios.get(municipio)
+    watcher = get_watcher(municipio)
+    versoes = watcher.versions()
+    snapshot_dir = snapshot.current_snapshot_dir(cidade.path(snapshot.SNAPSHOT_ROOT))
+    snapshot_tables, manifest, fresh = {}, {}, set()
+    if snapshot_dir:
+        start = time.perf_counter()
+        snapshot_tables, manifest = _em_cache(municipio, load_snapshot, municipio, snapshot_dir)
+        timings['snapshot'] = time.perf_counter() - start
+        fresh = snapshot.fresh_datasets(manifest, {name: watcher.fingerprint(name) for name in versoes})
+
+    def cached(func, *args):
+        return _em_cache(municipio, func, municipio, *args)
+
+    raw_loaders = {
+        'pessoal': (load_and_process_spending_data, cidade.path(analise.GASTOS_PESSOAL_FOLDER)),
+        'anuais': (load_annual_expenses_data, cidade.path(analise.DADOS_ANUAIS_FOLDER)),
+        'gastos_gerais': (load_general_expenses, cidade.path(analise.GASTOS_GERAIS_FILE)),
+        'viagens': (load_travel_data, cidade.path(analise.VIAGENS_FILE)),
+    }
+    tables = {}
+    for name, (loader, path) in raw_loaders.items():
+        start = time.perf_counter()
+        tables[name] = snapshot_tables[name] if name in fresh else cached(loader, path, versoes[name])
+        timings[name] = time.perf_counter() - start
+    # Planilhas ignoradas ou truncadas pelos orçamentos de memória (ver ingestao.py).
+    tables['avisos_ingestao'] = [aviso for aviso in manifest.get('avisos_ingestao', []) if aviso['conjunto'] in fresh]
+    tables['avisos_ingestao'] += ingestao.avisos([path for name, (_, path) in raw_loaders.items() if name not in fresh])
+
+    start = time.perf_counter()
+    if 'financeiro' in fresh:
+        financeiro = manifest.get('financeiro', {})
+        tables['financeiro'] = (financeiro.get('previsao_arrecadacao'), financeiro.get('previsao_gastos'), financeiro.get('ano_periodo'))
+    else:
+        tables['financeiro'] = cached(load_financial_data, cidade.path(analise.FINANCEIRO_FILE), versoes['financeiro'])
+    timings['financeiro'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if {'pessoal', 'gastos_gerais'} <= fresh:
+        tables['vinculos'] = snapshot_tables['vinculos']
+    else:
+        tables['vinculos'] = cached(build_link_graph, tables['pessoal'], tables['gastos_gerais'], (versoes['pessoal'], versoes['gastos_gerais']))
+    timings['vinculos'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    monthly_aggregates = snapshot_tables['pessoal_mensal_cargo'] if 'pessoal' in fresh else None
+    tables['indice_servidores'] = cached(build_servant_index, tables['pessoal'], versoes['pessoal'])
+    tables['tendencia_cargos'] = cached(build_cargo_trends, tables['pessoal'], monthly_aggregates, versoes['pessoal'])
+    tables['indicadores_pessoal'] = cached(build_salary_indicators, tables['pessoal'], versoes['pessoal'])
+    timings['historico_pessoal'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    travel_aggregates = None
+    if 'viagens' in fresh:
+        travel_aggregates = {'destino': snapshot_tables['viagens_por_destino'], 'servidor': snapshot_tables['viagens_por_servidor']}
+    tables['totais_viagens'] = cached(build_travel_aggregates, tables['viagens'], travel_aggregates, versoes['viagens'])
+    timings['totais_viagens'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fontes = ('pessoal', 'anuais', 'gastos_gerais')
+    facts = snapshot_tables['pagamentos'] if set(fontes) <= fresh else None
+    tables['pagamentos'] = cached(build_payment_index, facts, *(tables[name] for name in fontes), tuple(versoes[name] for name in fontes))
+    timings['pagamentos'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fontes = ('pessoal', 'viagens', 'gastos_gerais')
+    anomalies = None
+    if set(fontes) <= fresh:
+        anomalies = {'anomalias': snapshot_tables['anomalias'], 'estatisticas': snapshot_tables['estatisticas_robustas']}
+    tables['anomalias'] = cached(build_anomalies, *(tables[name] for name in fontes), anomalies, tuple(versoes[name] for name in fontes))
+    timings['anomalias'] = time.perf_counter() - start
+    return tables
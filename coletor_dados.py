@@ -1,85 +1,103 @@
 # coletor_dados.py (Versão Definitiva com a API Oficial de Dados Abertos)
 
+import os
+import threading
+
 import requests
 import pandas as pd
-import os
-from datetime import datetime
+
+import cache_http
+import manifesto_dados
+import municipios
 
 # --- CONFIGURAÇÕES FINAIS E CORRETAS ---
 # Usando a URL base da API oficial de Dados Abertos que você encontrou.
 # O [tipo-do-dado] para folha de pagamento é geralmente 'pessoal'.
-API_BASE_URL = "https://lagarto.se.gov.br/api/pessoal"
+# O município coletado vem de PAINEL_MUNICIPIO (ver municipios.py), que define a API e a pasta de destino.
+# PAINEL_API_URL permite apontar para outro endereço (ex: um servidor local de testes).
+MUNICIPIO = municipios.from_env()
+API_BASE_URL = os.environ.get('PAINEL_API_URL', MUNICIPIO.url_api)
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Python Automated Scraper) - Buscando dados públicos para análise."
 }
 
-DESTINATION_FOLDER = "dados_gastos"
+DESTINATION_FOLDER = MUNICIPIO.path("dados_gastos")
 
-def baixar_dados_pessoal():
-    """
-    Função principal que pede o mês/ano, baixa os dados completos usando a API
-    oficial de Dados Abertos e salva em um único arquivo Excel.
-    """
-    print("--- Coletor de Dados da Folha de Pagamento (API Oficial) ---")
-    
+# Páginas já baixadas ficam no cache HTTP local (cache_http.py) e são revalidadas com GET condicional.
+USAR_CACHE_HTTP = os.environ.get('PAINEL_CACHE_HTTP_DESATIVADO') != '1'
+_sessao = None
+_sessao_lock = threading.Lock()
+
+def sessao_http():
+    """Sessão com cache compartilhada por todas as coletas do processo (criada no primeiro uso)."""
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            _sessao = cache_http.CachedSession()
+        return _sessao
+
+MESES_PT = ["janeiro", "fevereiro", "marco", "abril", "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
+
+def _pagina_com_registros(response):
+    """Só páginas com registros vão para o cache: a página vazia do fim ainda pode ganhar registros."""
     try:
-        mes = int(input(f"Digite o MÊS (ex: 6 para Junho): "))
-        ano = int(input(f"Digite o ANO (ex: 2024): "))
-    except ValueError:
-        print("\nERRO: Por favor, digite valores numéricos válidos.")
-        return
+        return bool(response.json().get('data'))
+    except (ValueError, AttributeError):
+        return False
 
-    print(f"\nBuscando dados para {mes:02d}/{ano} usando a API oficial...")
+class ErroColeta(Exception):
+    """Falha ao obter os dados de um mês pela API (rede, HTTP ou resposta inválida)."""
 
+
+def buscar_mes_api(mes, ano, log=print):
+    """Baixa todas as páginas da folha de um mês pela API e devolve os registros em um DataFrame."""
     all_data = []
     page = 1
-    
+
     while True:
         # Monta a URL para cada página, incluindo os parâmetros de mês e ano
         request_url = f"{API_BASE_URL}?mes={mes}&ano={ano}&page={page}"
-        print(f"Buscando dados da página {page}...")
-        
+        log(f"Buscando dados da página {page}...")
+
         try:
-            response = requests.get(request_url, headers=HEADERS, timeout=30)
+            if USAR_CACHE_HTTP:
+                response = sessao_http().get(request_url, ttl=cache_http.ttl_para_mes(mes, ano), headers=HEADERS,
+                                             cacheavel=_pagina_com_registros, timeout=30)
+            else:
+                response = requests.get(request_url, headers=HEADERS, timeout=30)
             response.raise_for_status() # Lança um erro para status 4xx ou 5xx
             data = response.json()
-            
+
             # A maioria das APIs de dados abertos tem uma estrutura com uma chave principal
             # como 'data', 'results' ou 'registros'. Vamos procurar por 'data'.
             registros_da_pagina = data.get('data', [])
-            
+
             if not registros_da_pagina:
-                print("Chegou ao fim dos dados.")
+                log("Chegou ao fim dos dados.")
                 break
-            
+
             all_data.extend(registros_da_pagina)
             page += 1
-            
+
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404 and page > 1:
                 # É comum a API retornar 404 quando não há mais páginas.
-                print("Chegou ao fim dos dados (página não encontrada).")
+                log("Chegou ao fim dos dados (página não encontrada).")
                 break
-            else:
-                print(f"\nERRO DE CONEXÃO: {e}")
-                return
+            raise ErroColeta(f"ERRO DE CONEXÃO: {e}") from e
         except requests.exceptions.RequestException as e:
-            print(f"\nERRO DE REDE: {e}")
-            return
+            raise ErroColeta(f"ERRO DE REDE: {e}") from e
         except ValueError: # Erro se a resposta não for um JSON válido
-            print(f"\nERRO: A resposta da API na página {page} não era um JSON válido. Pode não haver dados para o período.")
+            log(f"ERRO: A resposta da API na página {page} não era um JSON válido. Pode não haver dados para o período.")
             break
 
     if not all_data:
-        print(f"Nenhum registro encontrado para {mes:02d}/{ano}.")
-        return
-
-    print(f"\nSucesso! Um total de {len(all_data)} registros foram coletados.")
-    df = pd.DataFrame(all_data)
+        raise ErroColeta(f"Nenhum registro encontrado para {mes:02d}/{ano}.")
+    return pd.DataFrame(all_data)
 
-    print("Formatando dados para o padrão do painel...")
-    
+def formatar_para_painel(df, log=print):
+    """Renomeia as colunas da API para o padrão do painel (Nome, Cargo, Líquido)."""
     # Mapeamento das colunas da API para as do nosso dashboard.
     # É um palpite com base nos padrões, pode precisar de ajuste.
     mapa_colunas = {
@@ -87,35 +105,69 @@ def baixar_dados_pessoal():
         'Cargo': 'cargo',
         'Líquido': 'salario_liquido' # Supondo nomes comuns
     }
-    
+
     # Verifica se as colunas esperadas existem
     colunas_reais = list(df.columns)
     colunas_api = [col for col in mapa_colunas.values() if col in colunas_reais]
 
     if len(colunas_api) != len(mapa_colunas):
-        print("\nAVISO: Nem todas as colunas padrão foram encontradas.")
-        print(f"As colunas disponíveis são: {colunas_reais}")
-        print("Usando as colunas encontradas para gerar o arquivo...")
+        log("AVISO: Nem todas as colunas padrão foram encontradas.")
+        log(f"As colunas disponíveis são: {colunas_reais}")
+        log("Usando as colunas encontradas para gerar o arquivo...")
         # Atualiza o mapa para usar apenas as colunas que realmente existem
         mapa_colunas_existentes = {k: v for k, v in mapa_colunas.items() if v in colunas_reais}
-        df_limpo = df[colunas_api].rename(columns={v: k for k, v in mapa_colunas_existentes.items()})
-    else:
-        df_limpo = df[list(mapa_colunas.values())].rename(columns={v: k for k, v in mapa_colunas.items()})
+        return df[colunas_api].rename(columns={v: k for k, v in mapa_colunas_existentes.items()})
+    return df[list(mapa_colunas.values())].rename(columns={v: k for k, v in mapa_colunas.items()})
 
+def salvar_planilha_mes(df, mes, ano, destination_folder=DESTINATION_FOLDER):
+    """
+    Salva a folha de um mês como <mes>_<ano>.xlsx na pasta lida pelo painel e devolve o caminho.
+    A gravação é atômica e o arquivo só entra no painel quando registrado no manifesto da pasta.
+    """
     # Garante que a pasta de destino exista
-    if not os.path.exists(DESTINATION_FOLDER):
-        os.makedirs(DESTINATION_FOLDER)
-    
-    meses_pt = ["janeiro", "fevereiro", "marco", "abril", "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
-    nome_mes = meses_pt[mes - 1]
+    os.makedirs(destination_folder, exist_ok=True)
+    output_filename = f"{MESES_PT[mes - 1]}_{ano}.xlsx"
+    output_path = os.path.join(destination_folder, output_filename)
+    manifesto_dados.write_atomic(output_path, lambda tmp_path: df.to_excel(tmp_path, index=False))
+    manifesto_dados.register(output_path, rows=len(df))
+    return output_path
+
+def coletar_mes(mes, ano, log=print):
+    """Coleta um mês pela API e salva a planilha no padrão do painel. Devolve o caminho salvo."""
+    df = buscar_mes_api(mes, ano, log=log)
+    log(f"Sucesso! Um total de {len(df)} registros foram coletados.")
+    return salvar_planilha_mes(formatar_para_painel(df, log=log), mes, ano)
+
+def baixar_dados_pessoal():
+    """
+    Função principal que pede o mês/ano, baixa os dados completos usando a API
+    oficial de Dados Abertos e salva em um único arquivo Excel.
+    """
+    print("--- Coletor de Dados da Folha de Pagamento (API Oficial) ---")
     
-    output_filename = f"{nome_mes}_{ano}.xlsx"
-    output_path = os.path.join(DESTINATION_FOLDER, output_filename)
-    df_limpo.to_excel(output_path, index=False)
+    try:
+        mes = int(input("Digite o MÊS (ex: 6 para Junho): "))
+        ano = int(input("Digite o ANO (ex: 2024): "))
+    except ValueError:
+        print("\nERRO: Por favor, digite valores numéricos válidos.")
+        return
+
+    print(f"\nBuscando dados para {mes:02d}/{ano} usando a API oficial...")
+    try:
+        df = buscar_mes_api(mes, ano)
+    except ErroColeta as e:
+        print(f"\n{e}")
+        return
+
+    print(f"\nSucesso! Um total de {len(df)} registros foram coletados.")
+    print("Formatando dados para o padrão do painel...")
+    output_path = salvar_planilha_mes(formatar_para_painel(df), mes, ano)
+    output_filename = os.path.basename(output_path)
     
     print("\n----------------------------------------------------")
     print(f"✅ SUCESSO! O arquivo '{output_filename}' foi salvo em '{DESTINATION_FOLDER}/'")
+    print("Para atualizar o painel, execute: python snapshot.py")
     print("----------------------------------------------------")
 
 if __name__ == "__main__":
-    baixar_dados_pessoal()
\ No newline at end of file
+    baixar_dados_pessoal()
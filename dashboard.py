@@ -1,36 +1,24 @@
 # dashboard.py (Versão Final Completa - 25/09/2025)
+#
+# Camada de exibição do painel. Toda a leitura, limpeza e análise dos dados fica
+# em analise.py (sem dependência do Streamlit) e os caches em cache_painel.py;
+# aqui ficam apenas os componentes visuais.
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime
-import os
-import glob
-import re
-import json
 
-# ==============================================================================
-# CONFIGURAÇÕES E CONSTANTES GLOBAIS
-# ==============================================================================
-st.set_page_config(layout="wide")
-
-COMMON_SURNAMES = ['SANTOS', 'SANTANA', 'OLIVEIRA', 'SILVA', 'DIAS', 'SOUZA','ALVES','JESUS','NASCIMENTO','COSTA', 'ANDRADE', 'NUNES']
-COMPANY_TERMS = ['LTDA', 'ME', 'SA', 'EIRELI', 'CIA', 'EPP', 'MEI', 'FILHO', 'JUNIOR', 'NETO', 'SOBRINHO', 'SERVICOS', 'COMERCIO', 'INDUSTRIA', 'SOLUCOES', 'TECNOLOGIA', 'ADVOGADOS', 'ASSOCIADOS', 'ENGENHARIA', 'CONSTRUCOES', 'CONSULTORIA']
-PREPOSITIONS = ['DE', 'DA', 'DO', 'DAS', 'DOS']
-MESES_PT = {1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto", 9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"}
+import analise
+import aquecimento
+import cache_painel
+import exportacao
+import graficos
+import metricas
+import municipios
+from analise import format_brazilian_currency
 
-# Caminhos dos Arquivos de Dados
-GASTOS_PESSOAL_FOLDER = 'dados_gastos'
-DADOS_ANUAIS_FOLDER = 'dados_anuais'
-VIAGENS_FILE = 'dados_viagens.xlsx'
-GASTOS_GERAIS_FILE = 'gastos_gerais.xlsx'
-FINANCEIRO_FILE = 'dados_financeiros.json'
-
-
-# ==============================================================================
-# TÍTULO E INFORMAÇÕES INICIAIS
-# ==============================================================================
-st.title("📈 Painel Analítico da Prefeitura de Lagarto-SE")
+N_CAMPEAS = 8 # Número de empresas exibidas no ranking de fornecedores
+N_ATIPICOS = 50 # Linhas exibidas por aba no ranking de valores atípicos
 
 
 # ==============================================================================
@@ -51,178 +39,45 @@ def inject_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def format_brazilian_currency(value):
-    """Formata um número para o padrão de moeda brasileiro (R$ 1.234,56)."""
-    if pd.isna(value) or not isinstance(value, (int, float)):
-        return "N/A"
-    return f"R$ {value:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-
-def clean_monetary_value(series):
-    """Limpa uma string ou série de strings monetárias para um formato numérico."""
-    series = series.astype(str)
-    series = series.str.replace(r'R\$', '', regex=True).str.strip()
-    series = series.str.replace(r'\.', '', regex=True)
-    series = series.str.replace(',', '.', regex=False)
-    return pd.to_numeric(series, errors='coerce')
-
-def get_surnames_list(full_name):
-    if pd.isna(full_name): return []
-    parts = re.sub(r'[^\w\s]', '', full_name.upper()).split()
-    surnames = parts[1:]
-    surnames = [s for s in surnames if s not in COMPANY_TERMS and s not in PREPOSITIONS]
-    return surnames
-
-def abreviar_nome_completo(nome_completo):
-    partes = str(nome_completo).split()
-    if len(partes) <= 2: return nome_completo
-    primeiro_nome = partes[0]
-    ultimo_nome = partes[-1]
-    iniciais_meio = []
-    for parte in partes[1:-1]:
-        if len(parte) <= 3 and parte.lower() in [p.lower() for p in PREPOSITIONS]:
-            iniciais_meio.append(parte)
-        else:
-            iniciais_meio.append(parte[0].upper() + '.')
-    return " ".join([primeiro_nome] + iniciais_meio + [ultimo_nome])
-
-def find_surname_links(target_person_info, source_df, source_name_column):
-    surnames_to_search = [s for s in get_surnames_list(target_person_info['Credor']) if s not in COMMON_SURNAMES]
-    if not surnames_to_search:
-        return pd.DataFrame(), []
-    search_pattern = r"\b(" + "|".join(surnames_to_search) + r")\b"
-    if 'Credor' in source_df.columns and source_name_column == 'Credor':
-        source_df_filtered = source_df[source_df['Credor'] != target_person_info['Credor']]
-    else:
-        source_df_filtered = source_df.copy()
-    linked_df = source_df_filtered[source_df_filtered[source_name_column].str.contains(search_pattern, case=False, na=False, regex=True)]
-    return linked_df, surnames_to_search
-
-# ==============================================================================
-# Funções de Leitura de Dados
-# ==============================================================================
-@st.cache_data
-def load_financial_data(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        revenue_str = data.get("previsao_arrecadacao")
-        expenses_str = data.get("previsao_gastos")
-        period_year = data.get("ano_periodo")
-        revenue = clean_monetary_value(pd.Series([revenue_str])).iloc[0] if revenue_str else None
-        expenses = clean_monetary_value(pd.Series([expenses_str])).iloc[0] if expenses_str else None
-        return revenue, expenses, period_year
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None, None, None
-
-@st.cache_data(ttl="30m")
-def load_and_process_spending_data(folder_path):
-    all_files = glob.glob(os.path.join(folder_path, "*.xlsx"))
-    if not all_files: return pd.DataFrame()
-    monthly_data = []
-    month_map = {'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6, 'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12}
-    for filepath in all_files:
-        try:
-            filename = os.path.basename(filepath)
-            match = re.match(r'([a-z]+)_(\d{4})\.xlsx', filename.lower())
-            if not match: continue
-            df = pd.read_excel(filepath)
-            df.columns = [str(col).strip() for col in df.columns]
-            required_cols = ['Nome', 'Cargo', 'Líquido']
-            if not all(col in df.columns for col in required_cols): continue
-            df_processed = df[required_cols].copy()
-            df_processed.rename(columns={'Nome': 'Credor', 'Líquido': 'Projetado'}, inplace=True)
-            df_processed['Projetado'] = clean_monetary_value(df_processed['Projetado'])
-            df_processed.dropna(subset=['Credor', 'Cargo', 'Projetado'], inplace=True)
-            if df_processed.empty: continue
-            month_name, year_str = match.groups()
-            month, year = month_map.get(month_name), int(year_str)
-            df_processed['Data'] = datetime(year, month, 1)
-            monthly_data.append(df_processed)
-        except Exception as e:
-            print(f"ALERTA: Falha ao processar o arquivo de pessoal '{filename}'. Erro: {e}")
-            continue
-    if not monthly_data: return pd.DataFrame()
-    return pd.concat(monthly_data, ignore_index=True)
-
-@st.cache_data(ttl="1h")
-def load_annual_expenses_data(folder_path):
-    if not os.path.exists(folder_path): return pd.DataFrame()
-    all_files = glob.glob(os.path.join(folder_path, "*.xlsx"))
-    if not all_files: return pd.DataFrame()
-    yearly_data = []
-    for filepath in all_files:
-        filename = os.path.basename(filepath)
-        try:
-            match = re.search(r'(\d{4})\.xlsx', filename.lower())
-            if not match: continue
-            
-            year = int(match.group(1))
-            df = pd.read_excel(filepath)
-            df.columns = [str(col).strip() for col in df.columns]
-            
-            required_cols = ['Credor', 'Pago']
-            if not all(col in df.columns for col in required_cols):
-                print(f"ALERTA: Arquivo '{filename}' ignorado. Colunas necessárias {required_cols} não encontradas.")
-                continue
-
-            df_processed = df[required_cols].copy()
-            df_processed['Ano'] = year
-            df_processed.rename(columns={'Pago': 'Valor_Pago'}, inplace=True)
-            df_processed['Valor_Pago'] = clean_monetary_value(df_processed['Valor_Pago'])
-            df_processed.dropna(subset=['Credor', 'Valor_Pago'], inplace=True)
-            yearly_data.append(df_processed)
-
-        except Exception as e:
-            print(f"ALERTA: Falha ao processar o arquivo anual '{filename}'. Erro: {e}")
-            continue
-            
-    if not yearly_data: return pd.DataFrame()
-    return pd.concat(yearly_data, ignore_index=True)
-
-@st.cache_data(ttl="30m")
-def load_travel_data(file_path):
-    if not os.path.exists(file_path): return pd.DataFrame()
-    try:
-        df = pd.read_excel(file_path)
-        df.columns = df.columns.str.strip()
-        expected_cols = ['Favorecido', 'Saída', 'Chegada', 'Destino', 'Valor']
-        if not all(col in df.columns for col in expected_cols): return pd.DataFrame()
-        df['Saída'] = pd.to_datetime(df['Saída'], errors='coerce', dayfirst=True)
-        df['Chegada'] = pd.to_datetime(df['Chegada'], errors='coerce', dayfirst=True)
-        df['Duração'] = ((df['Chegada'] - df['Saída']).dt.days + 1).fillna(0)
-        df = df[(df['Duração'] > 0) & (df['Duração'] <= 30)]
-        df['Valor'] = clean_monetary_value(df['Valor'])
-        df['Custo_Diario'] = df['Valor'] / df['Duração']
-        df['Favorecido_Abreviado'] = df['Favorecido'].apply(abreviar_nome_completo)
-        df['Saída_Formatada'] = df['Saída'].dt.strftime('%d/%m/%y')
-        df['Chegada_Formatada'] = df['Chegada'].dt.strftime('%d/%m/%y')
-        return df.dropna(subset=['Custo_Diario', 'Favorecido_Abreviado', 'Valor'])
-    except Exception: return pd.DataFrame()
-
-@st.cache_data(ttl="30m")
-def load_general_expenses(file_path):
-    if not os.path.exists(file_path): return pd.DataFrame()
-    try:
-        df = pd.read_excel(file_path)
-        df.columns = [str(col).strip() for col in df.columns]
-        expected_cols = ['Data', 'Credor', 'Empenhado', 'Pago']
-        if not all(col in df.columns for col in expected_cols): return pd.DataFrame()
-        df_processed = df[expected_cols].copy()
-        df_processed.rename(columns={'Credor': 'Fornecedor', 'Empenhado': 'Valor_Empenhado', 'Pago': 'Valor_Pago'}, inplace=True)
-        df_processed['Valor_Empenhado'] = clean_monetary_value(df_processed['Valor_Empenhado'])
-        df_processed['Valor_Pago'] = clean_monetary_value(df_processed['Valor_Pago'])
-        df_processed['Data'] = pd.to_datetime(df_processed['Data'], errors='coerce', dayfirst=True)
-        return df_processed.dropna(subset=['Fornecedor', 'Data', 'Valor_Pago'])
-    except Exception: return pd.DataFrame()
+def select_municipio():
+    """
+    Município exibido nesta sessão: o da URL (?municipio=<id>) na primeira execução e,
+    havendo mais de um cadastrado, o escolhido no seletor da barra lateral.
+    """
+    cadastrados = municipios.listar()
+    if st.session_state.get('municipio') not in cadastrados:
+        pedido = st.query_params.get('municipio', municipios.MUNICIPIO_PADRAO)
+        if pedido not in cadastrados:
+            st.sidebar.warning(f"Município '{pedido}' não cadastrado.")
+            pedido = next(iter(cadastrados))
+        st.session_state['municipio'] = pedido
+    if len(cadastrados) > 1:
+        st.sidebar.selectbox("Município:", options=list(cadastrados), format_func=lambda m: cadastrados[m].titulo, key='municipio')
+        st.query_params['municipio'] = st.session_state['municipio']
+    return cadastrados[st.session_state['municipio']]
+
+def display_download_buttons(df, base, key):
+    """Botões para baixar a seleção exibida em CSV ou Parquet; o arquivo só é gerado no clique."""
+    colunas = st.columns([1, 1, 4])
+    for coluna, (formato, (mime, rotulo)) in zip(colunas, exportacao.FORMATOS.items()):
+        coluna.download_button(
+            f"⬇️ {rotulo}",
+            data=lambda formato=formato: exportacao.export_bytes(df, formato),
+            file_name=exportacao.file_name(base, formato),
+            mime=mime,
+            key=f"download_{key}_{formato}",
+            on_click='ignore',
+        )
 
 # ==============================================================================
 # Seções de Análise e Exibição
 # ==============================================================================
-def display_about_section():
+@metricas.timed('display_about_section', kind='section')
+def display_about_section(municipio):
     with st.expander("ℹ️ Sobre Este Painel e Isenção de Responsabilidade", expanded=False):
-        st.markdown("""
+        st.markdown(f"""
         **Fonte dos Dados:**
-        Os dados exibidos neste painel são coletados de fontes públicas, primariamente do Portal da Transparência da Prefeitura de Lagarto-SE, e estão sujeitos à Lei de Acesso à Informação (Lei nº 12.527/2011).
+        Os dados exibidos neste painel são coletados de fontes públicas, primariamente do Portal da Transparência da Prefeitura de {municipio.titulo}, e estão sujeitos à Lei de Acesso à Informação (Lei nº 12.527/2011).
 
         **Sobre as Análises:**
         As análises, como as de 'Vínculos por Sobrenome', são geradas por algoritmos que buscam coincidências de nomes e não representam, de forma alguma, uma acusação ou afirmação de nepotismo ou qualquer outra irregularidade. São apenas pontos de partida para investigação e verificação por parte do cidadão.
@@ -234,6 +89,14 @@ def display_about_section():
         Este dashboard é uma iniciativa independente, oferecida gratuitamente como uma ferramenta para promover a cidadania e a transparência.
         """)
 
+def display_ingestion_warnings(avisos):
+    """Planilhas que passaram dos orçamentos de memória e não foram carregadas por inteiro."""
+    if not avisos:
+        return
+    linhas = "\n".join(f"- **{aviso['arquivo']}** ({aviso['conjunto']}): {aviso['motivo']}" for aviso in avisos)
+    st.warning(f"Alguns arquivos de dados não foram carregados por inteiro e as análises abaixo estão incompletas:\n{linhas}")
+
+@metricas.timed('display_financial_summary', kind='section')
 def display_financial_summary(revenue, expenses, period_year):
     st.divider()
     year_to_display = period_year if period_year else datetime.now().year
@@ -267,54 +130,66 @@ def display_financial_summary(revenue, expenses, period_year):
             st.markdown("<h2 style='color: grey;'>N/A</h2>", unsafe_allow_html=True)
             st.caption("Valores indisponíveis")
 
-def display_main_indicators(personal_data):
+def _display_salary_extremes(extremes):
+    st.metric("Maior Salário Líquido", format_brazilian_currency(extremes['max_valor']), delta=extremes['max_nome'], delta_color="off")
+    if extremes['min_valor'] is not None:
+        st.metric("Menor Salário Líquido", format_brazilian_currency(extremes['min_valor']), delta=extremes['min_nome'], delta_color="off")
+    else:
+        st.metric("Menor Salário Líquido", "N/A", delta=f"Nenhum acima de R${analise.PISO_SALARIAL_INDICADORES}", delta_color="off")
+
+@metricas.timed('display_main_indicators', kind='section')
+def display_main_indicators(personal_data, link_graph, salary_indicators):
     st.divider()
     st.header("💡 Indicadores de Pessoal (Base Histórica)")
     col1, col2, col3 = st.columns(3)
     with col1:
         st.subheader("Salários de Professores")
-        prof_df = personal_data[personal_data['Cargo'].str.contains('PROF', case=False, na=False)]
-        if not prof_df.empty:
-            st.metric("Maior Salário Líquido", format_brazilian_currency(prof_df['Projetado'].max()), delta=prof_df.loc[prof_df['Projetado'].idxmax()]['Credor'], delta_color="off")
-            prof_min_df = prof_df[prof_df['Projetado'] > 1400]
-            if not prof_min_df.empty:
-                st.metric("Menor Salário Líquido", format_brazilian_currency(prof_min_df['Projetado'].min()), delta=prof_min_df.loc[prof_min_df['Projetado'].idxmin()]['Credor'], delta_color="off")
-            else:
-                st.metric("Menor Salário Líquido", "N/A", delta="Nenhum acima de R$1400", delta_color="off")
+        prof_extremes = salary_indicators['professores']
+        if prof_extremes:
+            _display_salary_extremes(prof_extremes)
         else:
             st.info("Nenhum 'Professor' encontrado.")
     with col2:
         st.subheader("Salários de Secretários")
-        sec_df = personal_data[personal_data['Cargo'] == 'SECRETÁRIO(A) MUNICIPAL']
-        if not sec_df.empty:
-            st.metric("Maior Salário Líquido", format_brazilian_currency(sec_df['Projetado'].max()), delta=sec_df.loc[sec_df['Projetado'].idxmax()]['Credor'], delta_color="off")
-            sec_min_df = sec_df[sec_df['Projetado'] > 1400]
-            if not sec_min_df.empty:
-                st.metric("Menor Salário Líquido", format_brazilian_currency(sec_min_df['Projetado'].min()), delta=sec_min_df.loc[sec_min_df['Projetado'].idxmin()]['Credor'], delta_color="off")
-            else:
-                st.metric("Menor Salário Líquido", "N/A", delta="Nenhum acima de R$1400", delta_color="off")
+        sec_extremes = salary_indicators['secretarios']
+        if sec_extremes:
+            _display_salary_extremes(sec_extremes)
         else:
             st.info("Nenhum 'SECRETÁRIO(A) MUNICIPAL' encontrado.")
     with col3:
         st.subheader("Vínculos por Sobrenome")
-        servidores = personal_data[['Credor', 'Cargo']].drop_duplicates()
-        secretarios_vinculos_df = servidores[servidores['Cargo'] == 'SECRETÁRIO(A) MUNICIPAL'].copy()
-        if not secretarios_vinculos_df.empty:
-            outros_servidores_df = servidores[~servidores['Credor'].isin(secretarios_vinculos_df['Credor'])].copy()
-            link_counts = []
-            for _, secretario in secretarios_vinculos_df.iterrows():
-                matches, _ = find_surname_links(secretario, outros_servidores_df, 'Credor')
-                link_counts.append(len(matches))
-            secretarios_vinculos_df['Contagem_Vinculos'] = link_counts
-            if secretarios_vinculos_df['Contagem_Vinculos'].sum() > 0:
-                maior_vinculo = secretarios_vinculos_df.loc[secretarios_vinculos_df['Contagem_Vinculos'].idxmax()]
-                st.metric("Secretário com Mais Vínculos", f"{maior_vinculo['Contagem_Vinculos']} Vínculo(s)", delta=maior_vinculo['Credor'], delta_color="off")
+        contagem_vinculos = analise.secretary_link_counts(link_graph, analise.secretaries(personal_data)['Credor'])
+        if not contagem_vinculos.empty:
+            if contagem_vinculos.sum() > 0:
+                nome_maior = contagem_vinculos.idxmax()
+                st.metric("Secretário com Mais Vínculos", f"{contagem_vinculos[nome_maior]} Vínculo(s)", delta=nome_maior, delta_color="off")
             else:
                 st.info("Nenhum vínculo por sobrenome encontrado.")
         else:
             st.info("Nenhum 'SECRETÁRIO(A) MUNICIPAL' encontrado para análise.")
 
-def display_general_expenses_section(data):
+def select_general_expenses_period(data):
+    """Seletor de período (barra lateral) aplicado às seções de gastos gerais; devolve (inicio, fim)."""
+    if data.empty:
+        return None, None
+    primeira, ultima = data['Data'].min().date(), data['Data'].max().date()
+    periodo = st.sidebar.date_input(
+        "Período dos gastos gerais",
+        value=(primeira, ultima),
+        min_value=primeira,
+        max_value=ultima,
+        format="DD/MM/YYYY",
+    )
+    # Enquanto o usuário escolhe o intervalo, o componente devolve só a data inicial.
+    if isinstance(periodo, (tuple, list)):
+        inicio = periodo[0] if len(periodo) > 0 else primeira
+        fim = periodo[1] if len(periodo) > 1 else ultima
+    else:
+        inicio, fim = periodo, ultima
+    return inicio, fim
+
+@metricas.timed('display_general_expenses_section', kind='section')
+def display_general_expenses_section(data, municipio, inicio=None, fim=None):
     st.divider()
     st.header("🔎 Consulta Rápida de Gastos Gerais")
     if data.empty:
@@ -322,18 +197,21 @@ def display_general_expenses_section(data):
         return
     filtro_fornecedor = st.text_input("Buscar por nome do Credor/Fornecedor:", placeholder="Digite o nome para buscar em todos os gastos...")
     if filtro_fornecedor:
-        dados_filtrados = data[data['Fornecedor'].str.contains(filtro_fornecedor, case=False, na=False)]
+        dados_filtrados = cache_painel.query_general_expenses(inicio, fim, filtro_fornecedor, municipio=municipio.id)
         st.subheader("Resultados da Busca")
         if dados_filtrados.empty:
             st.warning("Nenhum resultado encontrado para o nome buscado.")
         else:
             display_cols = ['Data', 'Fornecedor', 'Valor_Empenhado', 'Valor_Pago']
-            st.dataframe(dados_filtrados[display_cols].sort_values(by="Data", ascending=False).style.format({
+            resultados = dados_filtrados[display_cols].sort_values(by="Data", ascending=False)
+            st.dataframe(resultados.style.format({
                 'Valor_Empenhado': format_brazilian_currency,
                 'Valor_Pago': format_brazilian_currency,
                 'Data': '{:%d/%m/%Y}'
             }), use_container_width=True)
+            display_download_buttons(resultados, 'gastos_gerais_busca', 'busca_gastos')
 
+@metricas.timed('display_price_distortion_placeholder', kind='section')
 def display_price_distortion_placeholder():
     st.divider()
     st.header("⚖️ Análise de Distorções entre Preços de Licitações e Mercado")
@@ -343,7 +221,8 @@ def display_price_distortion_placeholder():
         "com valores de referência do mercado."
     )
 
-def display_party_expenses_section(data):
+@metricas.timed('display_party_expenses_section', kind='section')
+def display_party_expenses_section(data, municipio):
     st.divider()
     st.header("🎉 Gastos com Festas e Eventos")
 
@@ -354,54 +233,16 @@ def display_party_expenses_section(data):
         )
         return
 
-    KEYWORDS_FESTAS = [
-        'PRODUCOES', 'PRODUÇÕES', 'ARTISTICA', 'ARTISTICAS', 'ARTÍSTICA', 'ARTÍSTICAS',
-        'EVENTOS', 'SHOW', 'ENTRETENIMENTO', 'MUSIC', 'GRAVACAO', 'GRAVACOES', 'GRAVAÇÃO', 'GRAVAÇÕES',
-        'PALCO', 'BANDA', 'TRIO', 'ILUMINACAO', 'ILUMINAÇÃO', 'SONORIZACAO', 'SONORIZAÇÃO',
-        'PIROTECNIA'
-    ]
-    FORNECEDORES_ESPECIFICOS_FESTAS = [
-        'AGROPLAY LTDA'
-    ]
-
-    def is_party_expense(creditor):
-        creditor_upper = str(creditor).upper()
-        if any(keyword in creditor_upper for keyword in KEYWORDS_FESTAS):
-            return True
-        if creditor_upper in [name.upper() for name in FORNECEDORES_ESPECIFICOS_FESTAS]:
-            return True
-        return False
-
-    data['Gasto_Festa'] = data['Credor'].apply(is_party_expense)
-    party_expenses_df = data[data['Gasto_Festa']].copy()
+    party_expenses_df = analise.party_expenses(data)
 
     if party_expenses_df.empty:
         st.warning("Nenhum gasto com festas ou eventos foi identificado nos arquivos fornecidos com base nos critérios atuais.")
         return
 
-    yearly_totals = party_expenses_df.groupby('Ano')['Valor_Pago'].sum().reset_index()
-    yearly_totals['Valor_Pago_Formatado'] = yearly_totals['Valor_Pago'].apply(format_brazilian_currency)
-    
+    yearly_totals = analise.yearly_totals(party_expenses_df)
+
     st.subheader("Total Gasto por Ano")
-    fig = px.bar(
-        yearly_totals,
-        x='Ano',
-        y='Valor_Pago',
-        text='Valor_Pago_Formatado',
-        title="Soma dos Valores Pagos em Festas e Eventos por Ano"
-    )
-    fig.update_traces(
-        texttemplate='%{text}', 
-        textposition='outside'
-    )
-    
-    max_value = yearly_totals['Valor_Pago'].max()
-    fig.update_layout(
-        yaxis_range=[0, max_value * 1.15],
-        xaxis_title='Ano',
-        yaxis_title='Total Pago'
-    )
-    
+    fig = cache_painel.chart('yearly_totals_bar', 'anuais', yearly_totals, "Soma dos Valores Pagos em Festas e Eventos por Ano", municipio=municipio.id)
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("Detalhes por Ano")
@@ -409,15 +250,15 @@ def display_party_expenses_section(data):
     selected_year = st.selectbox("Selecione um ano para ver a lista de fornecedores:", options=available_years, key="party_year_selector")
 
     if selected_year != "Selecione um ano":
-        year_details_df = party_expenses_df[party_expenses_df['Ano'] == selected_year].copy()
-        year_details_df = year_details_df.groupby('Credor')['Valor_Pago'].sum().reset_index().sort_values(by='Valor_Pago', ascending=False)
+        year_details_df = analise.totals_by_name(party_expenses_df, year=selected_year)
         
         st.write(f"**Fornecedores de festas e eventos pagos em {selected_year}:**")
         st.dataframe(year_details_df.style.format({
             'Valor_Pago': format_brazilian_currency
         }), use_container_width=True, hide_index=True)
 
-def display_fuel_expenses_section(data):
+@metricas.timed('display_fuel_expenses_section', kind='section')
+def display_fuel_expenses_section(data, municipio):
     st.divider()
     st.header("⛽ Gastos Anuais com Combustíveis")
 
@@ -428,42 +269,16 @@ def display_fuel_expenses_section(data):
         )
         return
 
-    KEYWORDS_COMBUSTIVEL = ['POSTO', 'COMBUSTIVEIS', 'COMBUSTIVEL', 'AUTO POSTO']
-
-    def is_fuel_expense(creditor):
-        creditor_upper = str(creditor).upper()
-        return any(keyword in creditor_upper for keyword in KEYWORDS_COMBUSTIVEL)
-
-    data['Gasto_Combustivel'] = data['Credor'].apply(is_fuel_expense)
-    fuel_expenses_df = data[data['Gasto_Combustivel']].copy()
+    fuel_expenses_df = analise.fuel_expenses(data)
 
     if fuel_expenses_df.empty:
         st.warning("Nenhum gasto com combustível foi identificado nos arquivos fornecidos com base nos critérios atuais.")
         return
 
-    yearly_totals = fuel_expenses_df.groupby('Ano')['Valor_Pago'].sum().reset_index()
-    yearly_totals['Valor_Pago_Formatado'] = yearly_totals['Valor_Pago'].apply(format_brazilian_currency)
-    
+    yearly_totals = analise.yearly_totals(fuel_expenses_df)
+
     st.subheader("Total Gasto por Ano")
-    fig = px.bar(
-        yearly_totals,
-        x='Ano',
-        y='Valor_Pago',
-        text='Valor_Pago_Formatado',
-        title="Soma dos Valores Pagos em Combustíveis por Ano"
-    )
-    fig.update_traces(
-        texttemplate='%{text}', 
-        textposition='outside'
-    )
-    
-    max_value = yearly_totals['Valor_Pago'].max()
-    fig.update_layout(
-        yaxis_range=[0, max_value * 1.15],
-        xaxis_title='Ano',
-        yaxis_title='Total Pago'
-    )
-    
+    fig = cache_painel.chart('yearly_totals_bar', 'anuais', yearly_totals, "Soma dos Valores Pagos em Combustíveis por Ano", municipio=municipio.id)
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("Detalhes por Ano")
@@ -471,32 +286,23 @@ def display_fuel_expenses_section(data):
     selected_year = st.selectbox("Selecione um ano para ver a lista de postos:", options=available_years, key="fuel_year_selector")
 
     if selected_year != "Selecione um ano":
-        year_details_df = fuel_expenses_df[fuel_expenses_df['Ano'] == selected_year].copy()
-        year_details_df = year_details_df.groupby('Credor')['Valor_Pago'].sum().reset_index().sort_values(by='Valor_Pago', ascending=False)
+        year_details_df = analise.totals_by_name(fuel_expenses_df, year=selected_year)
         
         st.write(f"**Fornecedores de combustível pagos em {selected_year}:**")
         st.dataframe(year_details_df.style.format({
             'Valor_Pago': format_brazilian_currency
         }), use_container_width=True, hide_index=True)
 
-def display_top_suppliers_section(data):
+@metricas.timed('display_top_suppliers_section', kind='section')
+def display_top_suppliers_section(data, municipio):
     st.divider()
-    N_CAMPEAS = 8 # Define o número de empresas a serem exibidas
-    st.header(f"🏆 As Top {N_CAMPEAS} Campeãs de Lagarto")
+    st.header(f"🏆 As Top {N_CAMPEAS} Campeãs de {municipio.nome}")
 
     if data.empty:
         st.info("Dados anuais insuficientes para gerar o ranking.")
         return
 
-    INTERNAL_KEYWORDS = ['INSTITUTO', 'PREFEITURA', 'MUNICIPAL', 'FUNDO', 'ENERGISA', 'TRIBUNAL', 'JUSTICA', 'ASSOCIACAO', 'ASSOSSIAÇÃO']
-    
-    def is_internal_or_utility(creditor):
-        creditor_upper = str(creditor).upper()
-        if "SECRETARIA" in creditor_upper:
-            return True
-        return any(keyword in creditor_upper for keyword in INTERNAL_KEYWORDS)
-
-    external_suppliers_df = data[~data['Credor'].apply(is_internal_or_utility)].copy()
+    external_suppliers_df = analise.external_suppliers(data)
 
     if external_suppliers_df.empty:
         st.warning("Nenhum fornecedor externo relevante encontrado para gerar o ranking (após filtrar internos/secretarias).")
@@ -511,39 +317,14 @@ def display_top_suppliers_section(data):
 
     st.subheader(f"As {N_CAMPEAS} Empresas que Mais Receberam em {selected_year}")
 
-    year_data = external_suppliers_df[external_suppliers_df['Ano'] == selected_year]
-
-    if year_data.empty:
-        st.warning(f"Não há dados de fornecedores externos relevantes para o ano de {selected_year}.")
-        return
-
-    top_n_suppliers = year_data.groupby('Credor')['Valor_Pago'].sum().nlargest(N_CAMPEAS).reset_index()
+    top_n_suppliers = analise.top_suppliers(external_suppliers_df, selected_year, N_CAMPEAS)
 
     if top_n_suppliers.empty:
         st.warning(f"Não foi possível identificar as Top {N_CAMPEAS} empresas para o ano de {selected_year}.")
         return
 
-    top_n_suppliers['Valor_Pago_Formatado'] = top_n_suppliers['Valor_Pago'].apply(format_brazilian_currency)
-
-    fig_pie = px.pie(
-        top_n_suppliers,
-        values='Valor_Pago',
-        names='Credor',
-        title=f'Distribuição dos Gastos entre as Top {N_CAMPEAS} Empresas em {selected_year}',
-        hole=0.3
-    )
-    fig_pie.update_traces(
-        textposition='inside',
-        texttemplate='%{percent}<br>%{customdata[0]}',
-        hovertemplate='<b>%{label}</b><br>Total Pago: %{customdata[0]}<br>Percentual: %{percent}<extra></extra>',
-        customdata=top_n_suppliers[['Valor_Pago_Formatado']].values,
-        textfont_size=14
-    )
-    fig_pie.update_layout(
-        showlegend=True,
-        legend_title_text='Fornecedores'
-    )
-    
+    fig_pie = cache_painel.chart('top_suppliers_pie', 'anuais', top_n_suppliers,
+                                 f'Distribuição dos Gastos entre as Top {N_CAMPEAS} Empresas em {selected_year}', municipio=municipio.id)
     st.plotly_chart(fig_pie, use_container_width=True)
 
     st.subheader(f"Detalhes das Top {N_CAMPEAS} de {selected_year}")
@@ -552,32 +333,16 @@ def display_top_suppliers_section(data):
         use_container_width=True,
         hide_index=True
     )
+    display_download_buttons(top_n_suppliers[['Credor', 'Valor_Pago']], f"top_{N_CAMPEAS}_fornecedores_{selected_year}", 'top_fornecedores')
 
+@metricas.timed('display_expenses_by_category', kind='section')
 def display_expenses_by_category(data):
     st.divider()
     st.header("📊 Gastos Gerais por Categoria")
     if data.empty:
         return
-    
-    categorias_map = {
-        'Postos de Combustíveis': ['posto', 'combustiveis', 'combustivel', 'auto posto'],
-        'Advocacia': ['advocacia', 'advogado', 'advogados', 'juridico'],
-        'Construção': ['construção', 'construtora', 'engenharia', 'obras', 'cimento', 'material de construcao'],
-        'Limpeza Pública': ['limpeza', 'saneamento', 'residuos', 'coleta de lixo', 'varrição', 'ramac'],
-        'Locações de Veículos': ['locação', 'locacoes', 'locadora', 'aluguel', 'veículos', 'automóveis', 'rent a car', 'unir'],
-        'Consultorias': ['consultoria', 'consultorias', 'assessoria', 'projetos', 'auditoria']
-    }
-    
-    def categorizar_fornecedor(fornecedor):
-        fornecedor_lower = str(fornecedor).lower()
-        for categoria, keywords in categorias_map.items():
-            if any(keyword in fornecedor_lower for keyword in keywords):
-                return categoria
-        return 'Outros'
-    
-    data['Categoria'] = data['Fornecedor'].apply(categorizar_fornecedor)
-    categorias_principais = list(categorias_map.keys())
-    categorias_ordenadas = ["-- Selecione uma Categoria --"] + categorias_principais + sorted([cat for cat in data['Categoria'].unique() if cat not in categorias_principais])
+    categorias = analise.classify_categories(data)
+    categorias_ordenadas = ["-- Selecione uma Categoria --"] + analise.category_options(categorias)
     
     categoria_selecionada = st.radio(
         "Selecione uma categoria para ver os detalhes:",
@@ -585,20 +350,22 @@ def display_expenses_by_category(data):
     )
 
     if categoria_selecionada != "-- Selecione uma Categoria --":
-        dados_filtrados = data[data['Categoria'] == categoria_selecionada].copy()
-        total_pago = dados_filtrados['Valor_Pago'].sum()
-        total_empenhado = dados_filtrados['Valor_Empenhado'].sum()
+        dados_filtrados = data[categorias == categoria_selecionada]
+        total_pago, total_empenhado = analise.expense_totals(dados_filtrados)
         col1, col2 = st.columns(2)
         col1.metric("Total Pago em " + categoria_selecionada, format_brazilian_currency(total_pago))
         col2.metric("Total Empenhado em " + categoria_selecionada, format_brazilian_currency(total_empenhado))
         
         display_cols = ['Data', 'Fornecedor', 'Valor_Empenhado', 'Valor_Pago']
-        st.dataframe(dados_filtrados[display_cols].sort_values(by="Data", ascending=False).style.format({
+        selecao = dados_filtrados[display_cols].sort_values(by="Data", ascending=False)
+        st.dataframe(selecao.style.format({
             'Valor_Empenhado': format_brazilian_currency,
             'Valor_Pago': format_brazilian_currency,
             'Data': '{:%d/%m/%Y}'
         }), use_container_width=True)
+        display_download_buttons(selecao, f"gastos_{analise.normalize_name(categoria_selecionada).lower().replace(' ', '_')}", 'categoria')
 
+@metricas.timed('display_expenses_by_secretariat', kind='section')
 def display_expenses_by_secretariat(data):
     """Filtra e exibe gastos por secretaria."""
     st.divider()
@@ -606,26 +373,9 @@ def display_expenses_by_secretariat(data):
     if data.empty:
         return
 
-    secretarias_map = {
-        'Saúde (SMS/FMS)': ['saude', 'sms', 'fms'], 'Educação (SEMED)': ['educacao', 'semed'], 'Assist. Social (FMAS)': ['assistencia social', 'fmas'],
-        'Obras (SEMOB)': ['obras', 'semob'], 'Adm. (SEMAD)': ['administracao', 'semad'], 'Agricultura (SEMAGRI)': ['agricultura', 'semagri'],
-        'Gabinete (SEGAB)': ['gabinete', 'segab'], 'Fazenda (SEMFAZ)': ['fazenda', 'semfaz'], 'Meio Amb. (SEMAC/FMMA)': ['meio ambiente', 'semac', 'fmma'],
-        'Des. Social (SEDEST)': ['desenvolvimento social', 'sedest'], 'Ordem Púb. (SEMOP)': ['ordem publica', 'semop'], 'Cultura (SECULT)': ['cultura', 'secult'],
-        'Esporte (SEJEL)': ['juventude', 'esporte', 'sejel'], 'Comunicação (SECOM)': ['comunicacao', 'secom'], 'Des. Urbano (SEMDU)': ['desenvolvimento urbano', 'semdu'],
-        'Governo (SEGOV)': ['governo', 'segov'], 'Controladoria (CGM)': ['controladoria', 'cgm'], 'Procuradoria (PGM)': ['procuradoria', 'pgm'],
-        'Planejamento (SEPLAN)': ['planejamento', 'seplan'], 'Outros Órgãos': ['prefeitura municipal de lagarto', 'pml']
-    }
-
-    def categorizar_por_secretaria(fornecedor):
-        fornecedor_lower = str(fornecedor).lower()
-        for nome_curto, keywords in secretarias_map.items():
-            if any(keyword in fornecedor_lower for keyword in keywords):
-                return nome_curto
-        return 'Não Identificado'
-
-    data['Secretaria'] = data['Fornecedor'].apply(categorizar_por_secretaria)
+    secretarias = analise.classify_secretariats(data)
     
-    secretarias_encontradas = sorted([sec for sec in data['Secretaria'].unique() if sec != 'Não Identificado'])
+    secretarias_encontradas = sorted([sec for sec in secretarias.unique() if sec != 'Não Identificado'])
     
     if not secretarias_encontradas:
         st.info("Nenhum gasto pôde ser associado a uma secretaria específica com base nos dados atuais.")
@@ -639,93 +389,93 @@ def display_expenses_by_secretariat(data):
     )
 
     if secretaria_selecionada != "-- Selecione uma Secretaria --":
-        dados_filtrados = data[data['Secretaria'] == secretaria_selecionada].copy()
-        total_pago = dados_filtrados['Valor_Pago'].sum()
-        total_empenhado = dados_filtrados['Valor_Empenhado'].sum()
+        dados_filtrados = data[secretarias == secretaria_selecionada]
+        total_pago, total_empenhado = analise.expense_totals(dados_filtrados)
         col1, col2 = st.columns(2)
         col1.metric(f"Total Pago em {secretaria_selecionada}", format_brazilian_currency(total_pago))
         col2.metric(f"Total Empenhado em {secretaria_selecionada}", format_brazilian_currency(total_empenhado))
         
         display_cols = ['Data', 'Fornecedor', 'Valor_Empenhado', 'Valor_Pago']
-        st.dataframe(dados_filtrados[display_cols].sort_values(by="Data", ascending=False).style.format({
+        selecao = dados_filtrados[display_cols].sort_values(by="Data", ascending=False)
+        st.dataframe(selecao.style.format({
             'Valor_Empenhado': format_brazilian_currency,
             'Valor_Pago': format_brazilian_currency,
             'Data': '{:%d/%m/%Y}'
         }), use_container_width=True)
+        display_download_buttons(selecao, f"gastos_{analise.normalize_name(secretaria_selecionada).lower().replace(' ', '_')}", 'secretaria')
 
-def display_secretary_supplier_links(personal_data, general_expenses_data):
+@metricas.timed('display_secretary_supplier_links', kind='section')
+def display_secretary_supplier_links(personal_data, general_expenses_data, link_graph):
     st.divider()
     st.header("🤝 Análise de Vínculos: Secretários vs. Fornecedores")
     st.warning("**Atenção:** A análise a seguir é baseada em coincidências de sobrenomes e não representa prova de qualquer irregularidade.")
     if personal_data.empty or general_expenses_data.empty:
         st.info("Esta análise requer dados de Pessoal e de Gastos Gerais.")
         return
-    secretarios_df = personal_data[personal_data['Cargo'] == 'SECRETÁRIO(A) MUNICIPAL'].drop_duplicates(subset=['Credor']).copy()
+    secretarios_df = analise.secretaries(personal_data)
     if secretarios_df.empty:
         st.warning("Nenhum 'SECRETÁRIO(A) MUNICIPAL' encontrado para a análise.")
         return
-    secretarios_df['Nome_Abreviado'] = secretarios_df['Credor'].apply(abreviar_nome_completo)
-    opcoes_secretarios = ["-- Selecione um Secretário --"] + sorted(secretarios_df['Nome_Abreviado'].unique().tolist())
+    nomes_abreviados = secretarios_df['Credor'].apply(analise.abreviar_nome_completo)
+    opcoes_secretarios = ["-- Selecione um Secretário --"] + sorted(nomes_abreviados.unique().tolist())
     secretario_selecionado_abrev = st.radio("Selecione um secretário para verificar possíveis vínculos com fornecedores:", options=opcoes_secretarios)
     if secretario_selecionado_abrev != "-- Selecione um Secretário --":
-        secretario_info = secretarios_df[secretarios_df['Nome_Abreviado'] == secretario_selecionado_abrev].iloc[0]
-        possiveis_vinculos, sobrenomes_buscados = find_surname_links(secretario_info, general_expenses_data, 'Fornecedor')
+        secretario_info = secretarios_df[nomes_abreviados == secretario_selecionado_abrev].iloc[0]
+        sobrenomes_buscados = analise.uncommon_surnames(secretario_info['Credor'])
         if not sobrenomes_buscados:
             st.warning(f"Não foi possível extrair um sobrenome válido para análise de {secretario_info['Credor']}.")
         else:
             st.info(f"Buscando por fornecedores que contenham em seu nome: **{', '.join(sobrenomes_buscados)}**")
-            if not possiveis_vinculos.empty:
-                vinculos_agrupados = possiveis_vinculos.groupby('Fornecedor')['Valor_Pago'].sum().reset_index().sort_values(by='Valor_Pago', ascending=False)
+            vinculos_agrupados = analise.links_for(link_graph, secretario_info['Credor'], 'fornecedor')
+            if not vinculos_agrupados.empty:
                 st.write(f"Encontrado(s) **{len(vinculos_agrupados)}** fornecedor(es) com sobrenome compatível:")
-                st.dataframe(vinculos_agrupados.rename(columns={'Fornecedor': 'Nome do Fornecedor', 'Valor_Pago': 'Total Pago'}).style.format({
+                st.dataframe(vinculos_agrupados[['Nome', 'Valor_Pago']].rename(columns={'Nome': 'Nome do Fornecedor', 'Valor_Pago': 'Total Pago'}).style.format({
                     'Total Pago': format_brazilian_currency
                 }), use_container_width=True, hide_index=True)
             else:
                 st.success(f"Nenhum possível vínculo encontrado entre fornecedores e {secretario_selecionado_abrev}.")
 
-def display_nepotism_analysis_section(personal_data):
+@metricas.timed('display_nepotism_analysis_section', kind='section')
+def display_nepotism_analysis_section(personal_data, link_graph):
     st.divider()
     st.header("🕵️ Análise de Vínculos: Secretários vs. Outros Servidores")
     st.warning("**Atenção:** A análise a seguir é baseada em coincidências de sobrenomes e não representa prova de qualquer irregularidade.")
-    secretarios_df = personal_data[personal_data['Cargo'] == 'SECRETÁRIO(A) MUNICIPAL'].drop_duplicates(subset=['Credor']).copy()
+    secretarios_df = analise.secretaries(personal_data)
     if secretarios_df.empty:
         st.warning("Nenhum cargo de 'SECRETÁRIO(A) MUNICIPAL' encontrado para a análise.")
         return
-    secretarios_df['Nome_Abreviado'] = secretarios_df['Credor'].apply(abreviar_nome_completo)
-    opcoes_secretarios = ["-- Selecione um Secretário --"] + sorted(secretarios_df['Nome_Abreviado'].unique().tolist())
+    nomes_abreviados = secretarios_df['Credor'].apply(analise.abreviar_nome_completo)
+    opcoes_secretarios = ["-- Selecione um Secretário --"] + sorted(nomes_abreviados.unique().tolist())
     secretario_selecionado_abrev = st.radio("Selecione um secretário para verificar possíveis vínculos com outros servidores:", options=opcoes_secretarios)
     if secretario_selecionado_abrev != "-- Selecione um Secretário --":
-        secretario_info = secretarios_df[secretarios_df['Nome_Abreviado'] == secretario_selecionado_abrev].iloc[0]
-        possiveis_vinculos, sobrenomes_buscados = find_surname_links(secretario_info, personal_data, 'Credor')
+        secretario_info = secretarios_df[nomes_abreviados == secretario_selecionado_abrev].iloc[0]
+        sobrenomes_buscados = analise.uncommon_surnames(secretario_info['Credor'])
         if not sobrenomes_buscados:
             st.warning(f"Não é possível buscar vínculos para {secretario_info['Credor']}, pois seus sobrenomes são considerados comuns.")
         else:
             st.info(f"Buscando por servidores que contenham em seu nome: **{', '.join(sobrenomes_buscados)}**")
+            possiveis_vinculos = analise.links_for(link_graph, secretario_info['Credor'], 'servidor')
             if not possiveis_vinculos.empty:
                 st.write(f"Encontrado(s) **{len(possiveis_vinculos)}** servidor(es) com sobrenome compatível:")
                 st.dataframe(
-                    possiveis_vinculos[['Credor', 'Cargo']].rename(columns={'Credor': 'Nome do Servidor', 'Cargo': 'Cargo do Servidor'}),
+                    possiveis_vinculos[['Nome', 'Cargo']].rename(columns={'Nome': 'Nome do Servidor', 'Cargo': 'Cargo do Servidor'}),
                     use_container_width=True, hide_index=True
                 )
             else:
                 st.success(f"Nenhum possível vínculo encontrado para {secretario_selecionado_abrev}.")
 
-def display_spending_list_section(data):
+@metricas.timed('display_spending_list_section', kind='section')
+def display_spending_list_section(data, servant_index):
     st.divider()
     st.header("Consulta de Gastos com Pessoal")
-    datas_disponiveis = sorted(data['Data'].unique())
-    if datas_disponiveis:
-        meses_formatados = [f"{MESES_PT.get(pd.to_datetime(d).month, '').upper()} DE {pd.to_datetime(d).year}" for d in datas_disponiveis]
-        if len(meses_formatados) == 1:
-            texto_aviso = meses_formatados[0]
-        else:
-            texto_aviso = ", ".join(meses_formatados[:-1]) + " E " + meses_formatados[-1]
+    texto_aviso = analise.available_months_text(data)
+    if texto_aviso:
         st.success(f"Meses disponíveis para consulta: **{texto_aviso}**")
     st.caption("Nota: Devido à coleta de dados manual, novos dados de pessoal são adicionados à base semestralmente.")
     nome_filtro = st.text_input("Filtrar por nome do servidor:", placeholder="Digite parte do nome ou sobrenome para buscar...")
     if nome_filtro:
-        dados_filtrados = data[data['Credor'].str.contains(nome_filtro, case=False, na=False)]
-        display_data = dados_filtrados.sort_values(by='Projetado', ascending=False)
+        dados_filtrados = analise.filter_by_name(data, 'Credor', nome_filtro)
+        display_data = dados_filtrados[['Credor', 'Cargo', 'Projetado', 'Data']].sort_values(by='Projetado', ascending=False)
         if display_data.empty:
             st.warning("Nenhum resultado encontrado para o nome buscado.")
         else:
@@ -734,96 +484,226 @@ def display_spending_list_section(data):
                 'Projetado': format_brazilian_currency,
                 'Data': '{:%m/%Y}'
             }), use_container_width=True)
+            display_download_buttons(display_data, 'servidores_busca', 'busca_servidores')
+            display_servant_history(display_data, servant_index)
     else:
         st.info("Digite no campo acima para pesquisar na lista de servidores.")
+    with st.expander("⬇️ Baixar a folha completa de um mês"):
+        meses = sorted(data['Data'].unique(), reverse=True)
+        mes = st.selectbox("Mês da folha:", options=meses, format_func=lambda d: f"{pd.Timestamp(d):%m/%Y}", key="folha_mes_exportacao")
+        folha_mes = data.loc[data['Data'] == mes, ['Credor', 'Cargo', 'Projetado', 'Data']]
+        display_download_buttons(folha_mes, f"folha_{pd.Timestamp(mes):%Y_%m}", 'folha_mes')
+
+def display_servant_history(search_results, servant_index):
+    """Evolução mês a mês de um servidor encontrado na busca (salário e cargo)."""
+    nomes = sorted(search_results['Credor'].astype(str).unique().tolist())
+    nome_selecionado = st.selectbox("Ver o histórico mensal do servidor:", options=["-- Selecione um Servidor --"] + nomes)
+    if nome_selecionado == "-- Selecione um Servidor --":
+        return
+    historico = analise.servant_timeline(servant_index, nome_selecionado)
+    if historico.empty:
+        st.warning("Nenhum histórico encontrado para este servidor.")
+        return
+    mudancas_cargo = historico['Cargo'].astype(str).nunique()
+    col1, col2 = st.columns(2)
+    col1.metric("Meses na base", historico['Data'].nunique())
+    col2.metric("Cargos diferentes", mudancas_cargo)
+    if mudancas_cargo > 1 or historico['Data'].duplicated().any():
+        st.caption("Nota: o histórico agrupa registros pelo nome; homônimos e mudanças de cargo aparecem como linhas separadas.")
+    fig = graficos.servant_timeline_line(historico, nome_selecionado)
+    st.plotly_chart(fig, use_container_width=True)
 
-def display_travel_chart_section(travel_data):
+@metricas.timed('display_payments_by_payee_section', kind='section')
+def display_payments_by_payee_section(payment_index):
+    st.divider()
+    st.header("💳 Pagamentos por Favorecido em Todas as Fontes")
+    st.caption("Soma a folha de pagamento, os pagamentos anuais e os gastos gerais de cada favorecido. Grafias diferentes do mesmo fornecedor são agrupadas.")
+    if payment_index['fatos'].empty:
+        st.info("Não há pagamentos carregados para esta consulta.")
+        return
+    col1, col2 = st.columns([3, 1])
+    termo = col1.text_input("Nome ou sobrenome do favorecido:", placeholder="Ex: SANTOS, POSTO, MACARIO...")
+    anos = sorted((int(a) for a in payment_index['por_ano']), reverse=True)
+    ano = col2.selectbox("Ano:", options=["Todos"] + anos)
+    if not termo:
+        st.info("Digite um nome ou sobrenome para consultar os pagamentos em todas as fontes.")
+        return
+    pagamentos = analise.payments_by_name(payment_index, termo, None if ano == "Todos" else ano)
+    if pagamentos.empty:
+        st.warning("Nenhum pagamento encontrado para o nome buscado.")
+        return
+    resumo = (pagamentos.groupby(['Nome', 'Fonte'], observed=True)['Valor_Pago'].sum()
+              .unstack('Fonte', fill_value=0.0)
+              .rename(columns={'pessoal': 'Folha', 'anuais': 'Pagamentos Anuais', 'gastos_gerais': 'Gastos Gerais'}))
+    resumo['Total'] = resumo.sum(axis=1)
+    resumo = resumo.sort_values('Total', ascending=False).reset_index().rename(columns={'Nome': 'Favorecido'})
+    st.metric("Total Pago", format_brazilian_currency(resumo['Total'].sum()), help=f"{len(resumo)} favorecido(s) encontrado(s)")
+    st.dataframe(resumo.style.format({c: format_brazilian_currency for c in resumo.columns if c != 'Favorecido'}),
+                 use_container_width=True, hide_index=True)
+    display_download_buttons(resumo, 'pagamentos_por_favorecido', 'pagamentos_favorecido')
+
+@metricas.timed('display_cargo_trend_section', kind='section')
+def display_cargo_trend_section(cargo_trends):
+    st.divider()
+    st.header("📅 Evolução Mensal por Cargo")
+    if not cargo_trends:
+        return
+    cargos = list(cargo_trends.keys())
+    professores = [cargo for cargo in cargos if 'PROF' in cargo.upper()]
+    cargo_selecionado = st.selectbox("Selecione um cargo:", options=cargos, index=cargos.index(professores[0]) if professores else 0)
+    serie = cargo_trends[cargo_selecionado]
+    if len(serie) < 2:
+        st.info("Há apenas um mês na base para este cargo; a evolução aparecerá quando novos meses forem adicionados.")
+    fig = graficos.cargo_trend_line(serie, cargo_selecionado)
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(serie.drop(columns=['Cargo']).style.format({
+        'Total': format_brazilian_currency,
+        'Media': format_brazilian_currency,
+        'Mediana': format_brazilian_currency,
+        'Data': '{:%m/%Y}'
+    }), use_container_width=True, hide_index=True)
+
+@metricas.timed('display_travel_chart_section', kind='section')
+def display_travel_chart_section(travel_data, travel_totals, municipio):
     st.divider()
     st.header("✈️ Análise de Viagens dos Servidores Públicos")
     if travel_data.empty:
         st.info("Para ativar esta análise, adicione o arquivo 'dados_viagens.xlsx' na pasta principal.")
         return
     
-    travel_data['Valor_Formatado'] = travel_data['Valor'].apply(format_brazilian_currency)
-    travel_data['Custo_Diario_Formatado'] = travel_data['Custo_Diario'].apply(format_brazilian_currency)
-
-    avg_daily_cost = travel_data['Custo_Diario'].mean()
-    min_cost_row = travel_data.loc[travel_data['Custo_Diario'].idxmin()]
-    max_cost_row = travel_data.loc[travel_data['Custo_Diario'].idxmax()]
+    resumo = analise.travel_summary(travel_data)
+    avg_daily_cost, min_cost_row, max_cost_row = resumo['media_diaria'], resumo['menor'], resumo['maior']
     
     cols_viagens = st.columns(3)
     cols_viagens[0].metric("Média de Gasto Diário", format_brazilian_currency(avg_daily_cost))
     cols_viagens[1].metric("Menor Custo Diário", format_brazilian_currency(min_cost_row['Custo_Diario']), delta=min_cost_row['Favorecido_Abreviado'], delta_color="off")
     cols_viagens[2].metric("Maior Custo Diário", format_brazilian_currency(max_cost_row['Custo_Diario']), delta=max_cost_row['Favorecido_Abreviado'], delta_color="off")
     
-    fig_viagens = px.scatter(
-        travel_data, 
-        x='Destino', 
-        y='Duração', 
-        size='Valor', 
-        color='Favorecido_Abreviado',
-        hover_name='Favorecido',
-        custom_data=['Saída_Formatada', 'Chegada_Formatada', 'Valor_Formatado', 'Custo_Diario_Formatado']
-    )
-    fig_viagens.update_traces(hovertemplate='<b>%{hovertext}</b><br>Destino: %{x}<br>Duração: %{y} dias<br>Período: %{customdata[0]}-%{customdata[1]}<br>Valor: %{customdata[2]}<br>Custo Diário: %{customdata[3]}<extra></extra>')
-    fig_viagens.update_layout(
-        title='Viagens dos Servidores (Tamanho da bolha representa o valor total)', 
-        title_x=0.5, 
-        height=600, 
-        legend_title="Favorecido",
-        xaxis_tickangle=-45,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.4,
-            xanchor="center",
-            x=0.5
-        ),
-        margin=dict(b=200)
-    )
+    # As colunas formatadas já vêm prontas do cache; só são calculadas aqui se faltarem.
+    plot_data = analise.enrich_travel_data(travel_data)
+    if len(plot_data) > graficos.MAX_PONTOS_DISPERSAO:
+        st.caption(f"Exibindo uma amostra de {graficos.MAX_PONTOS_DISPERSAO} das {len(plot_data)} viagens (as de maior valor estão sempre incluídas).")
+    fig_viagens = cache_painel.chart('travel_scatter', 'viagens', plot_data, municipio=municipio.id)
     st.plotly_chart(fig_viagens, use_container_width=True)
 
+    formato_totais = {'Total': format_brazilian_currency, 'Mediana_Custo_Diario': format_brazilian_currency}
+    aba_destinos, aba_servidores = st.tabs(["Por Destino", "Por Servidor"])
+    with aba_destinos:
+        st.dataframe(travel_totals['destino'].style.format(formato_totais), use_container_width=True, hide_index=True)
+    with aba_servidores:
+        st.dataframe(travel_totals['servidor'].style.format(formato_totais), use_container_width=True, hide_index=True)
+
+@metricas.timed('display_anomalies_section', kind='section')
+def display_anomalies_section(anomalies):
+    st.divider()
+    st.header("🚨 Valores Atípicos")
+    st.warning("**Atenção:** Valores atípicos são apenas diferenças estatísticas em relação ao grupo e não representam prova de qualquer irregularidade.")
+    ranking = anomalies['anomalias']
+    if ranking.empty:
+        st.info("Nenhum valor atípico encontrado nos dados carregados.")
+        return
+    st.caption(
+        f"Cada valor é comparado aos do seu grupo (cargo, viagens ou categoria de fornecedor) pela mediana e pelo desvio absoluto "
+        f"mediano (MAD); são listados os que ficam acima de {analise.LIMIAR_ANOMALIA:g} desvios robustos "
+        f"({analise.LIMIAR_ANOMALIA_PAGAMENTOS:g} em escala logarítmica para os pagamentos a fornecedores)."
+    )
+    formato = {'Valor': format_brazilian_currency, 'Mediana do Grupo': format_brazilian_currency,
+               'Percentil': '{:.1f}', 'Escore': '{:.1f}'}
+    tipos = ranking['Tipo'].astype(str).unique().tolist()
+    for aba, tipo in zip(st.tabs(tipos), tipos):
+        with aba:
+            tabela = ranking[ranking['Tipo'] == tipo].head(N_ATIPICOS)
+            st.dataframe(tabela.drop(columns='Tipo').rename(columns={'Periodo': 'Período', 'Mediana_Grupo': 'Mediana do Grupo'})
+                         .style.format(formato), use_container_width=True, hide_index=True)
+    with st.expander("Estatísticas por grupo"):
+        estatisticas = anomalies['estatisticas']
+        st.dataframe(estatisticas.style.format({c: format_brazilian_currency for c in ['Mediana', 'MAD', 'P05', 'P25', 'P75', 'P95']}),
+                     use_container_width=True, hide_index=True)
+
+def display_metrics_panel():
+    """Painel de depuração (PAINEL_METRICAS=1) com os tempos medidos nesta execução."""
+    if not metricas.ENABLED:
+        return
+    registros = metricas.current_run()
+    with st.sidebar.expander("⏱️ Métricas desta execução", expanded=False):
+        estado = aquecimento.status()
+        if estado['duracao_total_s'] is not None:
+            st.caption(f"Aquecimento {'concluído' if estado['pronto'] else 'com falha'} em {estado['duracao_total_s']:.2f} s")
+            st.json(estado['conjuntos'], expanded=False)
+        if not registros:
+            st.caption("Nenhuma medição registrada.")
+            return
+        df_registros = pd.DataFrame(registros)
+        memo = df_registros['kind'] == 'memo'
+        df_metricas = df_registros.loc[~memo, ['kind', 'name', 'duration_ms', 'rows', 'cache']]
+        st.metric("Tempo total medido", f"{df_metricas['duration_ms'].sum():,.0f} ms")
+        st.dataframe(df_metricas.sort_values(by='duration_ms', ascending=False), use_container_width=True, hide_index=True)
+        if memo.any():
+            st.caption("Memoização dos nomes (acumulado no processo)")
+            df_memo = df_registros.loc[memo, ['name', 'acertos', 'falhas', 'rows']].rename(columns={'rows': 'tamanho'})
+            st.dataframe(df_memo, use_container_width=True, hide_index=True)
+
 # ==============================================================================
 # Corpo Principal do Aplicativo
 # ==============================================================================
 def main():
+    st.set_page_config(layout="wide")
+    municipio = select_municipio()
+    st.title(f"📈 Painel Analítico da Prefeitura de {municipio.titulo}")
+    metricas.start_run()
     try:
         inject_custom_css()
-        
-        total_revenue, total_expenses, period_year = load_financial_data(FINANCEIRO_FILE)
-        dados_pessoal_full = load_and_process_spending_data(GASTOS_PESSOAL_FOLDER)
-        dados_viagens = load_travel_data(VIAGENS_FILE)
-        dados_gastos_gerais = load_general_expenses(GASTOS_GERAIS_FILE)
-        dados_anuais = load_annual_expenses_data(DADOS_ANUAIS_FOLDER)
 
-        display_about_section()
+        if aquecimento.status()['em_andamento']:
+            with st.spinner("Preparando os dados do painel..."):
+                aquecimento.wait()
+        dados = cache_painel.load_datasets(municipio=municipio.id)
+        total_revenue, total_expenses, period_year = dados['financeiro']
+        dados_pessoal = dados['pessoal']
+        dados_viagens = dados['viagens']
+        dados_gastos_gerais = dados['gastos_gerais']
+        dados_anuais = dados['anuais']
+        grafo_vinculos = dados['vinculos']
+
+        display_about_section(municipio)
+        display_ingestion_warnings(dados['avisos_ingestao'])
         display_financial_summary(total_revenue, total_expenses, period_year)
-        
-        dados_pessoal = dados_pessoal_full.copy()
-        
+
         if not dados_pessoal.empty:
-            display_main_indicators(dados_pessoal)
+            display_main_indicators(dados_pessoal, grafo_vinculos, dados['indicadores_pessoal'])
         else:
             st.divider()
             st.warning("Nenhum dado de gasto com pessoal encontrado na pasta 'dados_gastos/'. As análises de pessoal estão desativadas.")
 
-        display_general_expenses_section(dados_gastos_gerais)
+        inicio_gastos, fim_gastos = select_general_expenses_period(dados_gastos_gerais)
+        gastos_periodo = cache_painel.query_general_expenses(inicio_gastos, fim_gastos, municipio=municipio.id) if not dados_gastos_gerais.empty else dados_gastos_gerais
+
+        display_general_expenses_section(dados_gastos_gerais, municipio, inicio_gastos, fim_gastos)
         display_price_distortion_placeholder()
-        display_party_expenses_section(dados_anuais)
-        display_fuel_expenses_section(dados_anuais)
-        display_top_suppliers_section(dados_anuais)
-        display_expenses_by_category(dados_gastos_gerais)
-        display_expenses_by_secretariat(dados_gastos_gerais)
+        display_party_expenses_section(dados_anuais, municipio)
+        display_fuel_expenses_section(dados_anuais, municipio)
+        display_top_suppliers_section(dados_anuais, municipio)
+        display_expenses_by_category(gastos_periodo)
+        display_expenses_by_secretariat(gastos_periodo)
         
         if not dados_pessoal.empty and not dados_gastos_gerais.empty:
-            display_secretary_supplier_links(dados_pessoal, dados_gastos_gerais)
+            display_secretary_supplier_links(dados_pessoal, dados_gastos_gerais, grafo_vinculos)
 
         if not dados_pessoal.empty:
-            display_nepotism_analysis_section(dados_pessoal)
-            display_spending_list_section(dados_pessoal)
+            display_nepotism_analysis_section(dados_pessoal, grafo_vinculos)
+            display_spending_list_section(dados_pessoal, dados['indice_servidores'])
+            display_cargo_trend_section(dados['tendencia_cargos'])
+
+        display_payments_by_payee_section(dados['pagamentos'])
 
         if not dados_viagens.empty:
-            display_travel_chart_section(dados_viagens)
+            display_travel_chart_section(dados_viagens, dados['totais_viagens'], municipio)
+
+        display_anomalies_section(dados['anomalias'])
+
+        analise.assert_frames_unmodified()
+        metricas.record_cache_counters(analise.name_cache_stats())
+        display_metrics_panel()
 
     except Exception as e:
         st.title("🚨 Erro Crítico no Painel")
@@ -8,7 +8,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
-PAGE_URL = "https://lagarto.se.gov.br/portaltransparencia/?servico=cidadao/servidor"
+import municipios
+
+PAGE_URL = municipios.from_env().url_portal
 
 def fazer_diagnostico():
     print("--- Script de Diagnóstico ---")
@@ -0,0 +1,257 @@
+# entidades.py
+#
+# Resolução de entidades para os nomes de credores e fornecedores. O mesmo
+# fornecedor aparece com grafias diferentes ("POSTO J. MACÁRIO III LTDA",
+# "08.704.841/0001-91 - POSTO J MACARIO III LTDA", com ou sem "LTDA"/"EPP",
+# acentos e pontuação). Cada nome recebe um ID inteiro de entidade canônica:
+#
+#   1. mesmo CNPJ no prefixo -> mesma entidade;
+#   2. mesma chave normalizada (sem acentos, pontuação e sufixos societários),
+#      desde que os documentos não sejam diferentes;
+#   3. senão, só para nomes de empresas, compara por similaridade com os candidatos
+#      que compartilham os tokens mais raros do nome (blocagem). A comparação exige
+#      CNPJs da mesma raiz (matriz e filiais) ou, sem documento dos dois lados, o
+#      mesmo primeiro token. Nomes de pessoas (com CPF ou sem indício de empresa)
+#      nunca são juntados por similaridade: "EDSON" e "NELSON BATISTA DOS SANTOS"
+#      são pessoas diferentes, por mais parecidos que os nomes sejam.
+#
+# Os servidores da folha de pagamento (add_entity_columns(..., aproximado=False)) são
+# associados só pelo nome normalizado exato, nunca pela similaridade.
+#
+# A tabela nome -> entidade fica em SQLite (ENTIDADES_FILE) e só é estendida
+# quando aparecem nomes novos: os IDs são estáveis entre execuções. Quando as regras
+# mudam (REGRAS_VERSAO), a tabela antiga é descartada e refeita uma vez.
+#
+# O snapshot, o orquestrador e o painel são processos diferentes gravando no mesmo
+# arquivo. Cada resolvedor guarda um índice em memória, mas os nomes que ele não
+# conhece são resolvidos dentro de uma transação BEGIN IMMEDIATE (um escritor por
+# vez): antes de criar uma entidade ele relê os nomes e as entidades gravados pelos
+# outros processos, então todos chegam ao mesmo ID.
+
+import os
+import re
+import sqlite3
+import threading
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from analise import COMPANY_TERMS, normalize_name
+
+ENTIDADES_FILE = os.environ.get('PAINEL_ENTIDADES', 'entidades.sqlite')
+LIMIAR_SIMILARIDADE = 0.9
+TOKENS_DE_BLOCAGEM = 2
+REGRAS_VERSAO = 2 # incrementar quando uma mudança nas regras invalidar as entidades já gravadas
+
+SUFIXOS_SOCIETARIOS = {'LTDA', 'ME', 'EPP', 'EIRELI', 'EIRELLI', 'SA', 'MEI'}
+# Termos que indicam nome de empresa (FILHO, JUNIOR etc. também aparecem em nomes de pessoas).
+TERMOS_EMPRESA = (set(COMPANY_TERMS) - {'FILHO', 'JUNIOR', 'NETO', 'SOBRINHO'}) | SUFIXOS_SOCIETARIOS | {
+    'COMERCIAL', 'DISTRIBUIDORA', 'PRODUCOES', 'EVENTOS', 'CONSTRUTORA', 'EMPREENDIMENTOS',
+    'ASSOCIACAO', 'INSTITUTO', 'FUNDACAO', 'FUNDO', 'COOPERATIVA', 'CONSELHO', 'SINDICATO',
+    'LOCADORA', 'POSTO', 'FARMACIA', 'DROGARIA', 'LABORATORIO', 'CLINICA', 'EDITORA', 'GRAFICA',
+}
+_DOCUMENTO = re.compile(r'^\s*([\d.*/]+-\d{2})\s*-\s*(.+)$')
+_SA = re.compile(r'\bS\s*[/.]\s*A\b\.?')
+
+
+# ==============================================================================
+# Normalização
+# ==============================================================================
+def split_document(nome):
+    """Separa o prefixo de documento do nome. Devolve (documento ou None, nome sem o prefixo)."""
+    match = _DOCUMENTO.match(str(nome))
+    if not match:
+        return None, str(nome)
+    documento, resto = match.groups()
+    digitos = re.sub(r'\D', '', documento)
+    if len(digitos) == 14:
+        return f"CNPJ:{digitos}", resto
+    # CPF mascarado pelo portal (ex: 058.***.***-56): só os dígitos visíveis
+    return f"CPF:{documento[:3]}*{documento[-2:]}", resto
+
+def entity_key(nome):
+    """Chave de comparação: sem acentos, pontuação e sufixos societários no fim do nome."""
+    texto = _SA.sub(' SA ', normalize_name(nome))
+    tokens = re.sub(r'[^\w\s]', ' ', texto).split()
+    while len(tokens) > 1 and tokens[-1] in SUFIXOS_SOCIETARIOS:
+        tokens.pop()
+    return " ".join(tokens)
+
+def is_company(documento, nome):
+    """Indica se o nome é de empresa: tem CNPJ ou algum termo de TERMOS_EMPRESA."""
+    if documento is not None:
+        return documento.startswith('CNPJ:')
+    texto = _SA.sub(' SA ', normalize_name(nome))
+    return not TERMOS_EMPRESA.isdisjoint(re.sub(r'[^\w\s]', ' ', texto).split())
+
+def _cnpj_root(documento):
+    # Os 8 primeiros dígitos do CNPJ identificam a empresa; os demais, a filial.
+    return documento[len('CNPJ:'):len('CNPJ:') + 8] if documento and documento.startswith('CNPJ:') else None
+
+def _not_conflicting(documento_a, documento_b):
+    """Para a chave exata: os documentos não se contradizem (iguais ou algum ausente)."""
+    return documento_a is None or documento_b is None or documento_a == documento_b
+
+def _compatible(documento_a, documento_b):
+    """Para a similaridade: nenhum dos dois tem documento, ou são CNPJs da mesma raiz."""
+    if documento_a is None and documento_b is None:
+        return True
+    raiz = _cnpj_root(documento_a)
+    return raiz is not None and raiz == _cnpj_root(documento_b)
+
+
+# ==============================================================================
+# Tabela de Entidades
+# ==============================================================================
+class ResolvedorEntidades:
+    """Atribui IDs de entidade a nomes, persistindo a tabela em SQLite. Seguro entre threads."""
+
+    def __init__(self, path=ENTIDADES_FILE):
+        self._lock = threading.Lock()
+        # Outro processo pode estar no meio de um lote de nomes novos: espera o lock de escrita.
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        versao = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if versao != REGRAS_VERSAO:
+            if self._conn.execute("SELECT name FROM sqlite_master WHERE name = 'nomes'").fetchone():
+                print(f"INFO: Tabela de entidades '{path}' gerada com regras antigas; ela será refeita (os IDs de entidade mudam).")
+            with self._conn:
+                self._conn.executescript("DROP TABLE IF EXISTS nomes; DROP TABLE IF EXISTS entidades;")
+                self._conn.execute(f"PRAGMA user_version = {REGRAS_VERSAO}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entidades (
+                id INTEGER PRIMARY KEY,
+                nome TEXT NOT NULL,
+                documento TEXT,
+                chave TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS nomes (
+                nome TEXT PRIMARY KEY,
+                entidade INTEGER NOT NULL REFERENCES entidades(id)
+            );
+        """)
+        self._nomes = dict(self._conn.execute("SELECT nome, entidade FROM nomes"))
+        self._entidades = {}
+        self._por_documento = {}
+        self._por_chave = {}
+        self._por_token = {}
+        self._ultimo_id = 0
+        self._sync()
+
+    def _sync(self):
+        """Indexa as entidades gravadas (por este ou por outro processo) desde a última leitura."""
+        novas = self._conn.execute("SELECT id, nome, documento, chave FROM entidades WHERE id > ? ORDER BY id", (self._ultimo_id,))
+        for entidade, nome, documento, chave in novas:
+            self._index(entidade, nome, documento, chave)
+
+    def _stored_name(self, nome):
+        """Entidade já gravada para o nome (talvez por outro processo), ou None."""
+        row = self._conn.execute("SELECT entidade FROM nomes WHERE nome = ?", (nome,)).fetchone()
+        return row[0] if row else None
+
+    def _index(self, entidade, nome, documento, chave):
+        self._ultimo_id = max(self._ultimo_id, entidade)
+        self._entidades[entidade] = (nome, documento, chave)
+        if documento and documento.startswith('CNPJ:'):
+            self._por_documento.setdefault(documento, entidade)
+        self._por_chave.setdefault(chave, []).append(entidade)
+        for token in set(chave.split()):
+            self._por_token.setdefault(token, set()).add(entidade)
+
+    def _exact_match(self, documento, chave):
+        if documento and documento in self._por_documento:
+            return self._por_documento[documento]
+        for entidade in self._por_chave.get(chave, []):
+            if _not_conflicting(documento, self._entidades[entidade][1]):
+                return entidade
+        return None
+
+    def _match(self, documento, nome, chave):
+        entidade = self._exact_match(documento, chave)
+        # Pessoas só são identificadas pela chave exata.
+        if entidade is not None or not is_company(documento, nome):
+            return entidade
+        primeiro_token = chave.split()[0] if chave else ''
+        # Blocagem: só compara com entidades que têm algum dos tokens mais raros do nome.
+        tokens = sorted(set(chave.split()), key=lambda t: len(self._por_token.get(t, ())))
+        candidatas = set()
+        for token in tokens[:TOKENS_DE_BLOCAGEM]:
+            candidatas |= self._por_token.get(token, set())
+        melhor, melhor_score = None, LIMIAR_SIMILARIDADE
+        for entidade in sorted(candidatas):
+            nome_candidata, documento_candidata, chave_candidata = self._entidades[entidade]
+            if not _compatible(documento, documento_candidata):
+                continue
+            if documento is None and (chave_candidata.split()[:1] != [primeiro_token] or not is_company(None, nome_candidata)):
+                continue
+            score = SequenceMatcher(None, chave, chave_candidata).ratio()
+            if score >= melhor_score:
+                melhor, melhor_score = entidade, score
+        return melhor
+
+    def _create(self, nome, documento, chave):
+        entidade = self._conn.execute(
+            "INSERT INTO entidades (nome, documento, chave) VALUES (?, ?, ?)", (nome, documento, chave)
+        ).lastrowid
+        self._index(entidade, nome, documento, chave)
+        return entidade
+
+    def resolve(self, nomes, aproximado=True):
+        """
+        Devolve {nome: id da entidade}, criando entidades só para os nomes ainda desconhecidos.
+        Com aproximado=False (nomes de servidores da folha) cada nome é associado só pelo
+        documento ou pela chave exata, mesmo que já tenha sido juntado a outra grafia.
+        """
+        with self._lock:
+            distintos = sorted({str(n) for n in nomes if pd.notna(n)})
+            ids = {nome: self._nomes[nome] for nome in distintos if aproximado and nome in self._nomes}
+            pendentes = [nome for nome in distintos if nome not in ids]
+            if not pendentes:
+                return ids
+            with self._conn:
+                # Um escritor por vez; o que outros processos gravaram antes passa a valer aqui.
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._sync()
+                for nome in pendentes:
+                    if nome not in self._nomes:
+                        gravada = self._stored_name(nome)
+                        if gravada is not None:
+                            self._nomes[nome] = gravada
+                    if aproximado and nome in self._nomes:
+                        ids[nome] = self._nomes[nome]
+                        continue
+                    documento, resto = split_document(nome)
+                    chave = entity_key(resto)
+                    entidade = self._match(documento, resto, chave) if aproximado else self._exact_match(documento, chave)
+                    if entidade is None:
+                        entidade = self._create(nome, documento, chave)
+                    elif documento and documento.startswith('CNPJ:'):
+                        self._por_documento.setdefault(documento, entidade)
+                    if nome not in self._nomes:
+                        self._conn.execute("INSERT OR IGNORE INTO nomes (nome, entidade) VALUES (?, ?)", (nome, entidade))
+                        self._nomes[nome] = self._stored_name(nome)
+                    ids[nome] = self._nomes[nome] if aproximado else entidade
+            return ids
+
+    def canonical_names(self):
+        """{id da entidade: nome canônico (a primeira grafia registrada)}."""
+        with self._lock:
+            return {entidade: info[0] for entidade, info in self._entidades.items()}
+
+    def close(self):
+        self._conn.close()
+
+
+def add_entity_columns(df, name_column, resolvedor, aproximado=True):
+    """
+    Acrescenta `Entidade` (ID inteiro) e `Entidade_Nome` (nome canônico) a partir de `name_column`.
+    Use aproximado=False para nomes de pessoas (folha de pagamento): só a chave exata é usada.
+    """
+    if df.empty:
+        return df
+    ids = resolvedor.resolve(df[name_column].dropna().unique(), aproximado)
+    entidade = df[name_column].astype(object).map(lambda n: ids.get(str(n), -1) if pd.notna(n) else -1).astype('int32')
+    canonicos = resolvedor.canonical_names()
+    return df.assign(
+        Entidade=entidade,
+        Entidade_Nome=entidade.map(canonicos).astype('category'),
+    )
@@ -0,0 +1,67 @@
+# exportacao.py
+#
+# Exportação das seleções do painel em CSV ou Parquet, direto dos DataFrames em
+# cache (sem tabela estilizada nem planilha xlsx em memória). As linhas são
+# escritas em blocos de EXPORT_CHUNK_ROWS num arquivo temporário que só vai para
+# o disco acima de EXPORT_SPOOL_BYTES, de modo que a conversão não cria cópias
+# da tabela inteira mesmo ao exportar o histórico completo. No painel o arquivo só
+# é gerado quando o botão de download é clicado.
+#
+# O CSV segue o padrão do Excel em português: separador ';', vírgula decimal e
+# UTF-8 com BOM.
+
+import os
+import tempfile
+from datetime import datetime
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('PAINEL_EXPORTACAO_BLOCO', '50000'))
+EXPORT_SPOOL_BYTES = 32 * 1024 * 1024
+FORMATOS = {
+    'csv': ('text/csv', 'CSV'),
+    'parquet': ('application/vnd.apache.parquet', 'Parquet'),
+}
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_csv(df, destino, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Escreve `df` em CSV (';' e vírgula decimal) no arquivo binário `destino`, bloco a bloco."""
+    destino.write('﻿'.encode('utf-8'))
+    if df.empty:
+        destino.write(df.to_csv(index=False, sep=';', decimal=',').encode('utf-8'))
+        return
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        destino.write(chunk.to_csv(index=False, header=i == 0, sep=';', decimal=',', date_format='%d/%m/%Y').encode('utf-8'))
+
+def write_parquet(df, destino, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Escreve `df` em Parquet no arquivo binário `destino`, um row group por bloco."""
+    # Importado só na primeira exportação em Parquet, para não pesar na abertura do painel.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(destino, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def export_file(df, formato):
+    """Arquivo temporário (posicionado no início) com `df` no formato pedido ('csv' ou 'parquet')."""
+    destino = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    if formato == 'csv':
+        write_csv(df, destino)
+    elif formato == 'parquet':
+        write_parquet(df, destino)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    destino.seek(0)
+    return destino
+
+def export_bytes(df, formato):
+    """Conteúdo do arquivo exportado, para st.download_button (que guarda o arquivo pronto em memória)."""
+    with export_file(df, formato) as arquivo:
+        return arquivo.read()
+
+def file_name(base, formato):
+    """Nome do arquivo exportado, com a data da exportação: <base>_AAAAMMDD.<formato>."""
+    return f"{base}_{datetime.now():%Y%m%d}.{formato}"
@@ -0,0 +1,148 @@
+# graficos.py
+#
+# Construção das figuras Plotly do painel com um "orçamento" de tamanho: acima de
+# certos limites os pontos são amostrados, as cores ficam restritas às N categorias
+# de maior valor (o resto vira "Outros"), a dispersão passa a usar WebGL e os
+# valores enviados ao navegador são arredondados. As figuras são guardadas em cache
+# por versão dos dados em cache_painel.chart(), e não refeitas a cada execução.
+#
+# O plotly.express só é importado no primeiro gráfico desenhado (_plotly_express):
+# ele é a maior parte do tempo de importação do painel e a primeira tela (sobre o
+# painel e resumo financeiro) não tem gráficos.
+
+import os
+
+from analise import format_brazilian_currency
+
+MAX_PONTOS_DISPERSAO = int(os.environ.get('PAINEL_GRAFICO_MAX_PONTOS', '5000'))
+LIMITE_WEBGL = int(os.environ.get('PAINEL_GRAFICO_LIMITE_WEBGL', '1000'))
+MAX_CATEGORIAS_COR = 12
+ROTULO_OUTROS = 'Outros'
+
+
+# ==============================================================================
+# Funções de Apoio
+# ==============================================================================
+def top_n_labels(labels, weights, n=MAX_CATEGORIAS_COR, other=ROTULO_OUTROS):
+    """Mantém os `n` rótulos de maior peso total e troca os demais por `other`."""
+    labels = labels.astype(str)
+    if labels.nunique() <= n:
+        return labels
+    top = weights.groupby(labels).sum().nlargest(n).index
+    return labels.where(labels.isin(top), other)
+
+def downsample_points(df, max_points, value_column):
+    """
+    Reduz um DataFrame a no máximo `max_points` linhas: mantém sempre as de maior
+    `value_column` (os destaques do gráfico) e uma amostra regular das demais.
+    """
+    if len(df) <= max_points:
+        return df
+    n_top = max_points // 10
+    top = df.nlargest(n_top, value_column)
+    rest = df.drop(index=top.index)
+    step = -(-len(rest) // (max_points - n_top)) # divisão arredondada para cima
+    return df.loc[top.index.append(rest.index[::step])]
+
+
+def _plotly_express():
+    import plotly.express as px
+    return px
+
+
+# ==============================================================================
+# Figuras
+# ==============================================================================
+def travel_scatter(travel_data):
+    """Dispersão das viagens (destino x duração, bolha proporcional ao valor)."""
+    plot_data = downsample_points(travel_data, MAX_PONTOS_DISPERSAO, 'Valor')
+    plot_data = plot_data.assign(
+        Valor=plot_data['Valor'].round(2),
+        Servidor=top_n_labels(plot_data['Favorecido_Abreviado'], plot_data['Valor']),
+    )
+    fig = _plotly_express().scatter(
+        plot_data,
+        x='Destino',
+        y='Duração',
+        size='Valor',
+        color='Servidor',
+        hover_name='Favorecido',
+        custom_data=['Saída_Formatada', 'Chegada_Formatada', 'Valor_Formatado', 'Custo_Diario_Formatado'],
+        render_mode='webgl' if len(plot_data) > LIMITE_WEBGL else 'auto',
+    )
+    fig.update_traces(hovertemplate='<b>%{hovertext}</b><br>Destino: %{x}<br>Duração: %{y} dias<br>Período: %{customdata[0]}-%{customdata[1]}<br>Valor: %{customdata[2]}<br>Custo Diário: %{customdata[3]}<extra></extra>')
+    fig.update_layout(
+        title='Viagens dos Servidores (Tamanho da bolha representa o valor total)',
+        title_x=0.5,
+        height=600,
+        legend_title="Favorecido",
+        xaxis_tickangle=-45,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.4,
+            xanchor="center",
+            x=0.5
+        ),
+        margin=dict(b=200)
+    )
+    return fig
+
+def yearly_totals_bar(yearly_totals, title):
+    """Barras com o total pago por ano e o valor formatado acima de cada barra."""
+    plot_data = yearly_totals.assign(
+        Valor_Pago=yearly_totals['Valor_Pago'].round(2),
+        Valor_Pago_Formatado=yearly_totals['Valor_Pago'].map(format_brazilian_currency),
+    )
+    fig = _plotly_express().bar(
+        plot_data,
+        x='Ano',
+        y='Valor_Pago',
+        text='Valor_Pago_Formatado',
+        title=title
+    )
+    fig.update_traces(
+        texttemplate='%{text}',
+        textposition='outside'
+    )
+    fig.update_layout(
+        yaxis_range=[0, plot_data['Valor_Pago'].max() * 1.15],
+        xaxis_title='Ano',
+        yaxis_title='Total Pago'
+    )
+    return fig
+
+def top_suppliers_pie(top_suppliers, title):
+    """Rosca com a participação de cada fornecedor do ranking."""
+    plot_data = top_suppliers.assign(Valor_Pago=top_suppliers['Valor_Pago'].round(2))
+    fig = _plotly_express().pie(
+        plot_data,
+        values='Valor_Pago',
+        names='Credor',
+        title=title,
+        hole=0.3
+    )
+    fig.update_traces(
+        textposition='inside',
+        texttemplate='%{percent}<br>%{customdata[0]}',
+        hovertemplate='<b>%{label}</b><br>Total Pago: %{customdata[0]}<br>Percentual: %{percent}<extra></extra>',
+        customdata=plot_data['Valor_Pago'].map(format_brazilian_currency).to_frame().values,
+        textfont_size=14
+    )
+    fig.update_layout(
+        showlegend=True,
+        legend_title_text='Fornecedores'
+    )
+    return fig
+
+def servant_timeline_line(historico, nome):
+    """Linha do salário líquido de um servidor mês a mês (uma cor por cargo)."""
+    fig = _plotly_express().line(historico, x='Data', y='Projetado', color='Cargo', markers=True, title=f"Salário Líquido de {nome} por Mês")
+    fig.update_layout(title_x=0.5, yaxis_title="Salário Líquido (R$)", xaxis_title="Mês", legend_title="Cargo")
+    return fig
+
+def cargo_trend_line(serie, cargo):
+    """Linhas da média e da mediana mensais do salário líquido de um cargo."""
+    fig = _plotly_express().line(serie, x='Data', y=['Media', 'Mediana'], markers=True, title=f"Salário Líquido Médio e Mediano - {cargo}")
+    fig.update_layout(title_x=0.5, yaxis_title="Salário Líquido (R$)", xaxis_title="Mês", legend_title="")
+    return fig
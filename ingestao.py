@@ -0,0 +1,201 @@
+# ingestao.py
+#
+# Orçamentos de memória da leitura das planilhas brutas. O serviço roda no plano
+# gratuito do Render, com pouca memória, e uma planilha grande demais não pode
+# derrubar o painel inteiro:
+#
+#   - As planilhas são lidas em blocos de BLOCO_LINHAS linhas (analise.iter_xlsx_columns)
+#     e cada bloco é limpo antes do próximo ser lido.
+#   - Os blocos já limpos ficam num AcumuladorBlocos; quando passam de ORCAMENTO_MEMORIA_MB
+#     eles são gravados em arquivos Arrow (colunares) num diretório temporário e só
+#     voltam para a memória, já no tipo final, no fim da leitura do conjunto.
+#   - Os blocos de cada planilha só são confirmados quando a leitura dela termina sem
+#     erro (AcumuladorBlocos.arquivo); uma planilha que falha no meio é descartada
+#     inteira, sem deixar linhas pela metade no conjunto.
+#   - Um arquivo acima de LIMITE_ARQUIVO_MB é ignorado e um com mais de
+#     LIMITE_LINHAS_ARQUIVO linhas é truncado. Nos dois casos o painel continua com o
+#     restante dos dados e o arquivo fica registrado em avisos(), exibidos no painel.
+#     Os avisos ficam associados ao caminho do arquivo, então cada município
+#     (municipios.py) vê só os das suas planilhas.
+#
+# Configuração (variáveis de ambiente):
+#   PAINEL_ORCAMENTO_MEMORIA_MB   blocos limpos mantidos em memória por conjunto (padrão 128)
+#   PAINEL_LIMITE_ARQUIVO_MB      tamanho máximo de uma planilha em disco (padrão 64)
+#   PAINEL_LIMITE_LINHAS_ARQUIVO  linhas máximas lidas de uma planilha (padrão 2000000)
+#   PAINEL_INGESTAO_BLOCO         linhas por bloco de leitura (padrão 50000)
+#   PAINEL_INGESTAO_TMP           diretório dos arquivos temporários (padrão: o do sistema)
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+ORCAMENTO_MEMORIA_MB = float(os.environ.get('PAINEL_ORCAMENTO_MEMORIA_MB', '128'))
+LIMITE_ARQUIVO_MB = float(os.environ.get('PAINEL_LIMITE_ARQUIVO_MB', '64'))
+LIMITE_LINHAS_ARQUIVO = int(os.environ.get('PAINEL_LIMITE_LINHAS_ARQUIVO', '2000000'))
+BLOCO_LINHAS = int(os.environ.get('PAINEL_INGESTAO_BLOCO', '50000'))
+INGESTAO_TMP = os.environ.get('PAINEL_INGESTAO_TMP') or None
+
+_lock = threading.Lock()
+_avisos = [] # (caminho absoluto do arquivo, {'conjunto', 'arquivo', 'motivo'}) das últimas leituras
+
+
+# ==============================================================================
+# Avisos
+# ==============================================================================
+def _under(path, origens):
+    return any(path == origem or path.startswith(origem + os.sep) for origem in origens)
+
+def start(origem):
+    """Começa uma nova leitura da pasta ou planilha `origem`, descartando os avisos da leitura anterior."""
+    origem = os.path.abspath(origem)
+    with _lock:
+        _avisos[:] = [(path, aviso) for path, aviso in _avisos if not _under(path, [origem])]
+
+def warn(conjunto, arquivo, motivo):
+    """Registra (e imprime) um arquivo que não foi carregado por inteiro."""
+    print(f"ALERTA: '{os.path.basename(arquivo)}' ({conjunto}) {motivo}")
+    with _lock:
+        _avisos.append((os.path.abspath(arquivo), {'conjunto': conjunto, 'arquivo': os.path.basename(arquivo), 'motivo': motivo}))
+
+def avisos(origens=None):
+    """Avisos das últimas leituras (opcionalmente só dos arquivos dentro das pastas/planilhas `origens`)."""
+    origens = None if origens is None else [os.path.abspath(origem) for origem in origens]
+    with _lock:
+        return [dict(aviso) for path, aviso in _avisos if origens is None or _under(path, origens)]
+
+
+# ==============================================================================
+# Orçamentos por Arquivo
+# ==============================================================================
+def within_file_budget(conjunto, path):
+    """False (com aviso) se a planilha passa de LIMITE_ARQUIVO_MB e não deve ser lida."""
+    tamanho_mb = os.path.getsize(path) / (1024 * 1024)
+    if tamanho_mb > LIMITE_ARQUIVO_MB:
+        warn(conjunto, path, f"tem {tamanho_mb:.2f} MB, acima do limite de {LIMITE_ARQUIVO_MB:g} MB (PAINEL_LIMITE_ARQUIVO_MB), e foi ignorado.")
+        return False
+    return True
+
+def limit_rows(conjunto, path, chunks):
+    """Repassa os blocos de `path` até LIMITE_LINHAS_ARQUIVO linhas; acima disso trunca, com aviso."""
+    linhas = 0
+    for chunk in chunks:
+        if linhas + len(chunk) > LIMITE_LINHAS_ARQUIVO:
+            yield chunk.iloc[:LIMITE_LINHAS_ARQUIVO - linhas]
+            warn(conjunto, path, f"tem mais de {LIMITE_LINHAS_ARQUIVO} linhas (PAINEL_LIMITE_LINHAS_ARQUIVO); só as primeiras foram carregadas.")
+            return
+        linhas += len(chunk)
+        yield chunk
+
+
+# ==============================================================================
+# Acumulador com Transbordo para o Disco
+# ==============================================================================
+class AcumuladorBlocos:
+    """
+    Junta os blocos limpos de um conjunto. Acima de `orcamento_mb` em memória os blocos
+    pendentes são gravados em arquivos Arrow temporários; result() devolve o DataFrame
+    final e apaga os temporários. Com ignore_index=False o índice dos blocos é mantido.
+
+    Os blocos de cada planilha são lidos dentro de `with acumulador.arquivo():` e só entram
+    no resultado se a leitura dela terminar sem erro; senão são descartados (inclusive os
+    que já foram gravados em disco), como se a planilha tivesse sido ignorada inteira.
+    """
+
+    def __init__(self, conjunto, orcamento_mb=ORCAMENTO_MEMORIA_MB, ignore_index=True):
+        self.conjunto = conjunto
+        self.orcamento_bytes = orcamento_mb * 1024 * 1024
+        self.ignore_index = ignore_index
+        self._pendentes = [] # blocos confirmados, ainda em memória
+        self._abertos = [] # blocos da planilha em leitura, ainda não confirmados
+        self._bytes_pendentes = 0
+        self._dir = None
+        self._partes = [] # arquivos temporários com blocos confirmados
+        self._partes_abertas = [] # arquivos temporários com blocos da planilha em leitura
+        self._transbordo = True
+
+    @contextmanager
+    def arquivo(self):
+        """Leitura de uma planilha: confirma os blocos no fim, ou os descarta se houver erro."""
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def append(self, df):
+        if df.empty:
+            return
+        self._abertos.append(df)
+        self._bytes_pendentes += int(df.memory_usage(index=True, deep=True).sum())
+        if self._transbordo and self._bytes_pendentes > self.orcamento_bytes:
+            self._spill()
+
+    def commit(self):
+        """Confirma os blocos acrescentados desde a última confirmação."""
+        self._pendentes += self._abertos
+        self._partes += self._partes_abertas
+        self._abertos, self._partes_abertas = [], []
+
+    def rollback(self):
+        """Descarta os blocos acrescentados desde a última confirmação."""
+        self._bytes_pendentes -= sum(int(df.memory_usage(index=True, deep=True).sum()) for df in self._abertos)
+        for path in self._partes_abertas:
+            os.remove(path)
+        self._abertos, self._partes_abertas = [], []
+
+    def _concat(self, blocos):
+        return pd.concat(blocos, ignore_index=self.ignore_index)
+
+    def _spill(self):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        try:
+            # Confirmados e abertos em arquivos separados, para que um rollback apague só os abertos.
+            tabelas = [(pa.Table.from_pandas(self._concat(blocos), preserve_index=not self.ignore_index), destino)
+                       for blocos, destino in ((self._pendentes, self._partes), (self._abertos, self._partes_abertas)) if blocos]
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # Colunas com tipos misturados não viram Arrow: segue em memória, sem novos transbordos.
+            print(f"AVISO: Não foi possível gravar em disco os blocos de '{self.conjunto}' ({e}); a leitura continua em memória.")
+            self._transbordo = False
+            return
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix=f"painel_{self.conjunto}_", dir=INGESTAO_TMP)
+            print(f"AVISO: '{self.conjunto}' passou do orçamento de {self.orcamento_bytes / (1024 * 1024):g} MB em memória; os blocos lidos serão gravados em '{self._dir}'.")
+        for table, destino in tabelas:
+            path = os.path.join(self._dir, f"parte-{uuid.uuid4().hex[:12]}.arrow")
+            # Sem compressão, para a releitura mapear o arquivo em memória em vez de copiá-lo.
+            feather.write_feather(table, path, compression='uncompressed')
+            destino.append(path)
+        self._pendentes, self._abertos, self._bytes_pendentes = [], [], 0
+
+    def result(self):
+        """DataFrame com todos os blocos (vazio se nenhum foi acumulado)."""
+        self.commit()
+        try:
+            if not self._partes:
+                return self._concat(self._pendentes) if self._pendentes else pd.DataFrame()
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            if self._pendentes:
+                self._transbordo = True
+                self._spill()
+            tabelas = [feather.read_table(p, memory_map=True) for p in self._partes]
+            df = pa.concat_tables(tabelas, promote_options='permissive').to_pandas()
+            if self._pendentes:
+                # A gravação dos últimos blocos falhou: eles são juntados em memória.
+                df = pd.concat([df, self._concat(self._pendentes)], ignore_index=self.ignore_index)
+            return df
+        finally:
+            self.close()
+
+    def close(self):
+        self._pendentes, self._abertos, self._bytes_pendentes = [], [], 0
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir, self._partes, self._partes_abertas = None, [], []
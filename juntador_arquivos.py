@@ -3,37 +3,27 @@
 import pandas as pd
 import os
 import glob
-from datetime import datetime
 
-# Pasta onde o arquivo final será salvo, para uso do dashboard
-DESTINATION_FOLDER = "dados_gastos"
-
-def juntar_arquivos():
-    print("--- Assistente Juntador de Planilhas da Folha de Pagamento ---")
-
-    # 1. Pergunta ao usuário onde estão os arquivos baixados
-    source_folder = input("\nPor favor, cole aqui o caminho completo da pasta onde você salvou os arquivos exportados do portal: \n> ")
-
-    if not os.path.isdir(source_folder):
-        print("\nERRO: O caminho informado não é uma pasta válida. Por favor, tente novamente.")
-        return
+from coletor_dados import DESTINATION_FOLDER, MESES_PT, salvar_planilha_mes
 
+def ler_arquivos_exportados(source_folder, log=print):
+    """Lê e concatena todos os .xlsx/.csv exportados do portal em uma pasta (DataFrame vazio se nada for lido)."""
     # Procura por todos os arquivos Excel ou CSV na pasta
     search_path_xlsx = os.path.join(source_folder, "*.xlsx")
     search_path_csv = os.path.join(source_folder, "*.csv")
     all_files = glob.glob(search_path_xlsx) + glob.glob(search_path_csv)
 
     if not all_files:
-        print(f"\nERRO: Nenhum arquivo .xlsx ou .csv encontrado na pasta '{source_folder}'.")
-        return
+        log(f"ERRO: Nenhum arquivo .xlsx ou .csv encontrado na pasta '{source_folder}'.")
+        return pd.DataFrame()
 
-    print(f"\nEncontrados {len(all_files)} arquivos para processar. Iniciando a combinação...")
+    log(f"Encontrados {len(all_files)} arquivos para processar. Iniciando a combinação...")
 
-    # 2. Lê cada arquivo e junta todos em uma única lista
+    # Lê cada arquivo e junta todos em uma única lista
     lista_de_dataframes = []
     for f in all_files:
         try:
-            print(f"Lendo arquivo: {os.path.basename(f)}...")
+            log(f"Lendo arquivo: {os.path.basename(f)}...")
             if f.endswith('.csv'):
                 # Tenta ler como CSV com diferentes separadores comuns
                 try:
@@ -46,19 +36,19 @@ def juntar_arquivos():
             
             lista_de_dataframes.append(df)
         except Exception as e:
-            print(f"  AVISO: Não foi possível ler o arquivo {os.path.basename(f)}. Erro: {e}. Pulando...")
+            log(f"  AVISO: Não foi possível ler o arquivo {os.path.basename(f)}. Erro: {e}. Pulando...")
 
     if not lista_de_dataframes:
-        print("\nERRO: Nenhum arquivo pôde ser lido com sucesso.")
-        return
+        log("ERRO: Nenhum arquivo pôde ser lido com sucesso.")
+        return pd.DataFrame()
 
-    # 3. Combina todos os dataframes da lista em um só
+    # Combina todos os dataframes da lista em um só
     df_completo = pd.concat(lista_de_dataframes, ignore_index=True)
-    print(f"\nCombinação concluída. Total de {len(df_completo)} registros juntados.")
+    log(f"Combinação concluída. Total de {len(df_completo)} registros juntados.")
+    return df_completo
 
-    # 4. Limpeza e formatação final
-    print("Formatando os dados para o padrão do painel...")
-    
+def formatar_para_painel(df_completo, log=print):
+    """Remove colunas 'Unnamed' e padroniza os nomes das colunas usadas pelo painel."""
     # Remove colunas "Unnamed" que às vezes são criadas
     df_completo = df_completo.loc[:, ~df_completo.columns.str.contains('^Unnamed')]
     
@@ -68,11 +58,44 @@ def juntar_arquivos():
     colunas_para_renomear = {col_antigo: col_novo for col_novo, col_antigo in mapa_colunas.items() if col_antigo in df_completo.columns}
     
     if colunas_para_renomear:
-        df_completo.rename(columns=colunas_para_renomear, inplace=True)
-        print(f"Colunas renomeadas para o padrão: {list(colunas_para_renomear.values())}")
+        df_completo = df_completo.rename(columns=colunas_para_renomear)
+        log(f"Colunas renomeadas para o padrão: {list(colunas_para_renomear.values())}")
     else:
-        print("AVISO: Nenhuma coluna com os nomes 'Nome', 'Cargo' ou 'Líquido' foi encontrada para renomear.")
+        log("AVISO: Nenhuma coluna com os nomes 'Nome', 'Cargo' ou 'Líquido' foi encontrada para renomear.")
+    return df_completo
+
+def juntar_pasta(source_folder, mes, ano, log=print):
+    """Junta os arquivos exportados de um mês e salva a planilha no padrão do painel. Devolve o caminho salvo."""
+    df_completo = ler_arquivos_exportados(source_folder, log=log)
+    if df_completo.empty:
+        raise ValueError(f"Nenhum arquivo exportado pôde ser lido em '{source_folder}'.")
+    return salvar_planilha_mes(formatar_para_painel(df_completo, log=log), mes, ano, DESTINATION_FOLDER)
+
+def pasta_do_mes(nome_pasta):
+    """Interpreta o nome de uma pasta no padrão '<mes>_<ano>' (ex: junho_2025) e devolve (mes, ano) ou None."""
+    nome_mes, _, ano = nome_pasta.lower().rpartition('_')
+    if nome_mes not in MESES_PT or not ano.isdigit():
+        return None
+    return MESES_PT.index(nome_mes) + 1, int(ano)
+
+def juntar_arquivos():
+    print("--- Assistente Juntador de Planilhas da Folha de Pagamento ---")
+
+    # 1. Pergunta ao usuário onde estão os arquivos baixados
+    source_folder = input("\nPor favor, cole aqui o caminho completo da pasta onde você salvou os arquivos exportados do portal: \n> ")
+
+    if not os.path.isdir(source_folder):
+        print("\nERRO: O caminho informado não é uma pasta válida. Por favor, tente novamente.")
+        return
+
+    # 2. e 3. Lê cada arquivo e combina todos em um só
+    df_completo = ler_arquivos_exportados(source_folder)
+    if df_completo.empty:
+        return
 
+    # 4. Limpeza e formatação final
+    print("Formatando os dados para o padrão do painel...")
+    df_completo = formatar_para_painel(df_completo)
 
     # 5. Pede o mês/ano para nomear o arquivo de saída corretamente
     try:
@@ -83,21 +106,13 @@ def juntar_arquivos():
         return
 
     # 6. Salva o arquivo final na pasta de destino
-    if not os.path.exists(DESTINATION_FOLDER):
-        os.makedirs(DESTINATION_FOLDER)
-
-    meses_pt = ["janeiro", "fevereiro", "marco", "abril", "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
-    nome_mes = meses_pt[mes - 1]
-    
-    output_filename = f"{nome_mes}_{ano}.xlsx"
-    output_path = os.path.join(DESTINATION_FOLDER, output_filename)
-    
-    df_completo.to_excel(output_path, index=False)
+    output_path = salvar_planilha_mes(df_completo, mes, ano, DESTINATION_FOLDER)
 
     print("\n----------------------------------------------------")
-    print(f"✅ SUCESSO! O arquivo final '{output_filename}' foi salvo em '{DESTINATION_FOLDER}/'")
+    print(f"✅ SUCESSO! O arquivo final '{os.path.basename(output_path)}' foi salvo em '{DESTINATION_FOLDER}/'")
+    print("Para atualizar o painel, execute: python snapshot.py")
     print("----------------------------------------------------")
 
 
 if __name__ == "__main__":
-    juntar_arquivos()
\ No newline at end of file
+    juntar_arquivos()
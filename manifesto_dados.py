@@ -0,0 +1,223 @@
+# manifesto_dados.py
+#
+# Escrita atômica das planilhas geradas pelos coletores e manifesto das versões
+# completas de cada pasta de dados.
+#
+#   - write_atomic() grava num arquivo temporário oculto da mesma pasta e só então
+#     o renomeia para o nome final (os.replace): quem lê a pasta vê o arquivo antigo
+#     ou o novo, nunca uma planilha pela metade.
+#   - Cada pasta escrita pelos coletores tem um MANIFEST_FILE com a versão publicada
+#     e os arquivos que fazem parte dela (tamanho, SHA-256 do conteúdo, data de
+#     modificação e linhas). Os loaders (complete_files) e o monitor de arquivos só
+#     enxergam os arquivos listados, então uma coleta em andamento não provoca
+#     recargas nem aparece pela metade no painel. Um arquivo só é rejeitado se o
+#     conteúdo mudou: um checkout do git, uma cópia no deploy ou uma restauração de
+#     backup mudam a data de modificação, e aí o hash confirma que ele é o mesmo.
+#   - A publicação (ler o manifesto, juntar os novos arquivos e substituí-lo) é feita
+#     com um lock de arquivo na pasta (MANIFEST_LOCK), para que dois coletores
+#     publicando ao mesmo tempo não percam os registros um do outro.
+#   - Numa coleta de vários meses (orquestrador.py) os registros são acumulados com
+#     start_batch() e publicados de uma vez, numa única nova versão, por publish().
+#
+# Arquivos colocados manualmente numa pasta que já tem manifesto são ignorados até
+# serem registrados:  python manifesto_dados.py dados_gastos
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST_FILE = '_manifesto.json'
+MANIFEST_LOCK = '.manifesto.lock'
+
+_lock = threading.Lock()
+_batches = {} # pasta -> {arquivo: linhas} registrados e ainda não publicados
+_warned = set() # avisos já impressos (o monitor de arquivos consulta a pasta a cada poucos segundos)
+_hashes = {} # (caminho, tamanho, data de modificação) -> SHA-256 já calculado
+
+
+# ==============================================================================
+# Escrita Atômica
+# ==============================================================================
+def write_atomic(path, write):
+    """
+    Chama `write(caminho_temporario)` e renomeia o resultado para `path`. O temporário
+    começa com '.' (ignorado pelos loaders) e mantém a extensão, para o pandas/openpyxl
+    escolherem o formato certo.
+    """
+    folder, name = os.path.split(path)
+    _, extension = os.path.splitext(name)
+    tmp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.tmp{extension}")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def _write_json_atomic(path, data):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+    write_atomic(path, write)
+
+
+# ==============================================================================
+# Manifesto
+# ==============================================================================
+def read_manifest(folder):
+    """Manifesto da pasta (ou None se ela ainda não tiver um)."""
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _content_hash(path, stat):
+    """SHA-256 do arquivo, calculado uma vez por (tamanho, data de modificação)."""
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+def _file_entry(path, rows=None):
+    stat = os.stat(path)
+    return {'tamanho': stat.st_size, 'modificado_ns': stat.st_mtime_ns, 'sha256': _content_hash(path, stat), 'linhas': rows}
+
+def _unchanged(path, stat, entry):
+    """Indica se o arquivo ainda tem o conteúdo registrado: mesmo tamanho e (mesma data ou mesmo hash)."""
+    if stat.st_size != entry['tamanho']:
+        return False
+    if stat.st_mtime_ns == entry['modificado_ns']:
+        return True
+    # Data de modificação diferente (checkout, cópia, restauração): confere o conteúdo.
+    return entry.get('sha256') is not None and _content_hash(path, stat) == entry['sha256']
+
+def complete_files(folder, pattern='*.xlsx'):
+    """
+    Arquivos da versão publicada da pasta. Sem manifesto, todos os que casam com `pattern`
+    (exceto temporários); com manifesto, só os listados e ainda iguais ao registrado.
+    """
+    manifest = read_manifest(folder)
+    if manifest is None:
+        return [p for p in sorted(glob.glob(os.path.join(folder, pattern)))
+                if not os.path.basename(p).startswith(('~$', '.'))]
+    files = []
+    for name, entry in sorted(manifest['arquivos'].items()):
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _warn_once(path, None, f"AVISO: '{name}' consta do manifesto de '{folder}' mas não existe mais.")
+            continue
+        if not _unchanged(path, stat, entry):
+            _warn_once(path, stat.st_mtime_ns, f"AVISO: '{name}' foi alterado fora dos coletores e será ignorado; registre-o com: python manifesto_dados.py {folder}")
+            continue
+        files.append(path)
+    return files
+
+def _warn_once(path, state, message):
+    if (path, state) not in _warned:
+        _warned.add((path, state))
+        print(message)
+
+@contextmanager
+def _folder_lock(folder):
+    """Lock exclusivo entre processos sobre o manifesto da pasta (bloqueia até ser obtido)."""
+    with open(os.path.join(folder, MANIFEST_LOCK), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _publish(folder, registered):
+    # O manifesto é relido dentro do lock: outro coletor pode ter publicado nesse meio-tempo.
+    with _folder_lock(folder):
+        manifest = read_manifest(folder)
+        if manifest is None:
+            # Primeira publicação: adota as planilhas que já estavam na pasta.
+            manifest = {'versao': 0, 'arquivos': {os.path.basename(p): _file_entry(p) for p in complete_files(folder)}}
+        for name, rows in registered.items():
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                entry = _file_entry(path, rows)
+                previous = manifest['arquivos'].get(name)
+                if rows is None and previous and previous.get('sha256') == entry['sha256']:
+                    entry['linhas'] = previous['linhas']
+                manifest['arquivos'][name] = entry
+        manifest['versao'] += 1
+        manifest['publicado_em'] = datetime.now().isoformat(timespec='seconds')
+        _write_json_atomic(os.path.join(folder, MANIFEST_FILE), manifest)
+        return manifest['versao']
+
+def register(path, rows=None):
+    """Registra um arquivo recém-gravado: publica uma nova versão, ou acumula no lote aberto da pasta."""
+    folder, name = os.path.split(os.path.abspath(path))
+    with _lock:
+        if folder in _batches:
+            _batches[folder][name] = rows
+            return None
+        return _publish(folder, {name: rows})
+
+def start_batch(folder):
+    """Passa a acumular os registros da pasta até publish(); o painel continua vendo a versão anterior."""
+    folder = os.path.abspath(folder)
+    with _lock:
+        if read_manifest(folder) is None and os.path.isdir(folder):
+            # Sem manifesto a pasta inteira estaria visível: publica a versão atual antes de começar.
+            _publish(folder, {})
+        _batches.setdefault(folder, {})
+
+def publish(folder):
+    """Publica numa única nova versão os arquivos registrados no lote. Devolve a versão (ou None se vazio)."""
+    with _lock:
+        registered = _batches.pop(os.path.abspath(folder), None)
+        if not registered:
+            return None
+        return _publish(os.path.abspath(folder), registered)
+
+def register_all(folder, pattern='*.xlsx'):
+    """Registra todos os arquivos atuais da pasta (ex: planilhas copiadas manualmente)."""
+    names = [os.path.basename(p) for p in sorted(glob.glob(os.path.join(folder, pattern)))
+             if not os.path.basename(p).startswith(('~$', '.'))]
+    with _lock:
+        return _publish(os.path.abspath(folder), dict.fromkeys(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registra no manifesto as planilhas atuais de uma pasta de dados.")
+    parser.add_argument('pasta', help="Pasta de dados (ex: dados_gastos).")
+    args = parser.parse_args()
+    versao = register_all(args.pasta)
+    print(f"Manifesto de '{args.pasta}' publicado na versão {versao}.")
+
+if __name__ == "__main__":
+    main()
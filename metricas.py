@@ -0,0 +1,138 @@
+# metricas.py
+#
+# Instrumentação leve do painel: mede o tempo de cada loader (`load_*`) e de cada
+# seção de exibição (`display_*`) a cada execução, registrando acerto/falha de cache
+# e o número de linhas processadas, além dos acertos/falhas das memoizações em memória.
+#
+# Ative com PAINEL_METRICAS=1. Opcionalmente, PAINEL_METRICAS_ARQUIVO=caminho.jsonl
+# grava uma linha JSON por medição. Desativada, os decoradores devolvem a própria
+# função original, sem nenhum custo extra.
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import wraps
+
+ENABLED = os.environ.get('PAINEL_METRICAS') == '1'
+METRICS_FILE = os.environ.get('PAINEL_METRICAS_ARQUIVO')
+
+logger = logging.getLogger('painel.metricas')
+
+# Cada sessão do Streamlit roda o script em sua própria thread; os registros
+# da execução corrente ficam isolados por thread.
+_state = threading.local()
+_file_lock = threading.Lock()
+
+
+def _records():
+    if not hasattr(_state, 'records'):
+        _state.records = []
+        _state.run_id = None
+    return _state.records
+
+
+def _count_rows(value):
+    """Conta as linhas de um DataFrame/Series (ou coleção); devolve None para outros tipos."""
+    if hasattr(value, 'shape') and getattr(value, 'ndim', 0) >= 1:
+        return int(value.shape[0])
+    return None
+
+
+def start_run():
+    """Inicia uma nova execução do painel, descartando as medições anteriores desta sessão."""
+    if not ENABLED:
+        return
+    _records().clear()
+    _state.run_id = uuid.uuid4().hex[:12]
+
+
+def record(name, kind, duration_s, rows=None, cache=None, **extra):
+    """Registra uma medição na execução corrente e a publica no log/arquivo."""
+    if not ENABLED:
+        return
+    entry = {
+        'run_id': getattr(_state, 'run_id', None),
+        'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        'kind': kind,
+        'name': name,
+        'duration_ms': round(duration_s * 1000, 2),
+        'rows': rows,
+        'cache': cache,
+    }
+    entry.update(extra)
+    _records().append(entry)
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    logger.info(line)
+    if METRICS_FILE:
+        with _file_lock, open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def record_cache_counters(stats):
+    """Registra os contadores {nome: {'hits', 'misses', 'currsize', ...}} de caches em memória (lru_cache)."""
+    if not ENABLED:
+        return
+    for name, info in stats.items():
+        record(name, 'memo', 0.0, rows=info.get('currsize'), acertos=info.get('hits'), falhas=info.get('misses'))
+
+
+def mark_cache_miss(func):
+    """Decorador para o corpo de uma função em cache: sinaliza que ela foi de fato executada."""
+    if not ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _state.cache_miss = True
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def timed(name, kind='loader'):
+    """Decorador que mede a duração e as linhas devolvidas (loaders) ou recebidas (seções)."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            _state.cache_miss = False
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            duration = time.perf_counter() - start
+            if kind == 'loader':
+                rows = _count_rows(result)
+                cache = 'miss' if _state.cache_miss else 'hit'
+            else:
+                frames = (a for a in args if getattr(a, 'ndim', 0) == 2)
+                rows = next(map(_count_rows, frames), None)
+                cache = None
+            record(name, kind, duration, rows=rows, cache=cache)
+            return result
+        return wrapper
+    return decorator
+
+
+class section:
+    """Gerenciador de contexto para medir trechos que não são funções inteiras."""
+
+    def __init__(self, name, kind='section', rows=None):
+        self.name, self.kind, self.rows = name, kind, rows
+
+    def __enter__(self):
+        self.start = time.perf_counter() if ENABLED else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            record(self.name, self.kind, time.perf_counter() - self.start, rows=self.rows)
+        return False
+
+
+def current_run():
+    """Devolve uma cópia das medições registradas na execução corrente desta sessão."""
+    return list(_records())
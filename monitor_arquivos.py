@@ -0,0 +1,117 @@
+# monitor_arquivos.py
+#
+# Monitor dos arquivos de dados do painel. Uma thread em segundo plano confere
+# periodicamente (stat de cada arquivo, sem ler o conteúdo) as pastas e planilhas
+# de cada conjunto de dados e incrementa a versão apenas do conjunto que mudou.
+# O dashboard usa essas versões como parte da chave dos caches, de modo que só os
+# caches dependentes do arquivo alterado são refeitos, e um arquivo novo aparece
+# no painel em poucos segundos, sem recargas periódicas de tudo.
+
+import os
+import threading
+
+import analise
+import manifesto_dados
+
+POLL_INTERVAL = float(os.environ.get('PAINEL_MONITOR_INTERVALO', '2'))
+
+# Conjunto de dados -> (arquivo ou pasta, padrão dos arquivos quando for pasta)
+DATASET_SOURCES = {
+    'pessoal': (analise.GASTOS_PESSOAL_FOLDER, '*.xlsx'),
+    'anuais': (analise.DADOS_ANUAIS_FOLDER, '*.xlsx'),
+    'gastos_gerais': (analise.GASTOS_GERAIS_FILE, None),
+    'viagens': (analise.VIAGENS_FILE, None),
+    'financeiro': (analise.FINANCEIRO_FILE, None),
+}
+
+
+def dataset_files(name, base_dir='.'):
+    """Arquivos atuais de um conjunto de dados (caminho relativo -> caminho absoluto)."""
+    source, pattern = DATASET_SOURCES[name]
+    path = os.path.join(base_dir, source)
+    if pattern is None:
+        return {source: path} if os.path.exists(path) else {}
+    # Só a versão publicada no manifesto (ou, sem manifesto, os arquivos que não são
+    # temporários do Excel nem escritas em andamento): coletas em curso não mudam a versão.
+    files = {f"{source}/{os.path.basename(p)}": p for p in manifesto_dados.complete_files(path, pattern)}
+    manifest_path = os.path.join(path, manifesto_dados.MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        files[f"{source}/{manifesto_dados.MANIFEST_FILE}"] = manifest_path
+    return files
+
+def dataset_fingerprint(name, base_dir='.'):
+    """Tamanho e data de modificação (ns) de cada arquivo de um conjunto de dados."""
+    fingerprint = {}
+    for rel_path, path in dataset_files(name, base_dir).items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue # Removido entre a listagem e o stat
+        fingerprint[rel_path] = {'tamanho': stat.st_size, 'modificado_ns': stat.st_mtime_ns}
+    return fingerprint
+
+def all_fingerprints(base_dir='.'):
+    return {name: dataset_fingerprint(name, base_dir) for name in DATASET_SOURCES}
+
+
+class DatasetWatcher:
+    """Acompanha as mudanças nos arquivos de dados e mantém um número de versão por conjunto."""
+
+    def __init__(self, base_dir='.', interval=POLL_INTERVAL):
+        self.base_dir = base_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fingerprints = all_fingerprints(base_dir)
+        self._versions = {name: 0 for name in DATASET_SOURCES}
+        self._listeners = []
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='monitor-arquivos', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def add_listener(self, callback):
+        """Registra `callback(nome_do_conjunto, nova_versao)`, chamado a cada mudança detectada."""
+        self._listeners.append(callback)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"ALERTA: Falha ao verificar os arquivos de dados. Erro: {e}")
+
+    def poll_once(self):
+        """Confere todos os conjuntos uma vez e devolve os nomes dos que mudaram."""
+        changed = []
+        for name in DATASET_SOURCES:
+            fingerprint = dataset_fingerprint(name, self.base_dir)
+            with self._lock:
+                if fingerprint == self._fingerprints[name]:
+                    continue
+                self._fingerprints[name] = fingerprint
+                self._versions[name] += 1
+                version = self._versions[name]
+            changed.append(name)
+            print(f"INFO: Conjunto de dados '{name}' alterado (versão {version}).")
+            for callback in self._listeners:
+                callback(name, version)
+        return changed
+
+    def version(self, name):
+        with self._lock:
+            return self._versions[name]
+
+    def versions(self):
+        with self._lock:
+            return dict(self._versions)
+
+    def fingerprint(self, name):
+        with self._lock:
+            return self._fingerprints[name]
@@ -0,0 +1,107 @@
+# municipios.py
+#
+# Cadastro dos municípios atendidos pelo painel. Um mesmo processo pode servir
+# vários municípios; cada um tem a sua própria pasta de dados, com a mesma
+# estrutura da raiz do repositório:
+#
+#   municipios/<id>/municipio.json      nome, UF e endereços do portal da transparência
+#   municipios/<id>/dados_gastos/ ...   planilhas e JSON com os nomes de analise.py
+#   municipios/<id>/snapshots/          snapshot pré-processado (python snapshot.py --municipio <id>)
+#   municipios/<id>/entidades.sqlite    tabela de entidades
+#
+# Exemplo de municipio.json:
+#   {"nome": "Itabaiana", "uf": "SE",
+#    "url_api": "https://itabaiana.se.gov.br/api/pessoal",
+#    "url_portal": "https://itabaiana.se.gov.br/portaltransparencia/?servico=cidadao/servidor"}
+#
+# Lagarto, o município original, continua usando a raiz do repositório (a menos
+# que exista municipios/lagarto/). O painel escolhe o município pela URL
+# (?municipio=<id>) ou pelo seletor da barra lateral; os coletores usam
+# PAINEL_MUNICIPIO. Os caches de cada município ficam separados e só os
+# MAX_MUNICIPIOS_ATIVOS usados mais recentemente ficam em memória (cache_painel.py).
+
+import json
+import os
+
+MUNICIPIOS_DIR = os.environ.get('PAINEL_MUNICIPIOS_DIR', 'municipios')
+MUNICIPIO_PADRAO = os.environ.get('PAINEL_MUNICIPIO_PADRAO', 'lagarto')
+MAX_MUNICIPIOS_ATIVOS = max(1, int(os.environ.get('PAINEL_MAX_MUNICIPIOS_ATIVOS', '2')))
+MUNICIPIO_FILE = 'municipio.json'
+
+_avisados = set() # configurações inválidas já avisadas (listar() é chamado a cada execução do painel)
+
+# Configuração de Lagarto quando ele não tem pasta própria em MUNICIPIOS_DIR.
+LAGARTO = {
+    'nome': 'Lagarto',
+    'uf': 'SE',
+    'url_api': "https://lagarto.se.gov.br/api/pessoal",
+    'url_portal': "https://lagarto.se.gov.br/portaltransparencia/?servico=cidadao/servidor",
+}
+
+
+class MunicipioDesconhecido(ValueError):
+    """Nenhum município cadastrado com o id pedido."""
+
+
+class Municipio:
+    """Um município atendido pelo painel e a pasta onde ficam os seus dados."""
+
+    def __init__(self, municipio_id, base_dir, nome, uf, url_api=None, url_portal=None):
+        self.id = municipio_id
+        self.base_dir = base_dir
+        self.nome = nome
+        self.uf = uf
+        self.url_api = url_api
+        self.url_portal = url_portal
+
+    def path(self, relative_path):
+        """Caminho de um arquivo ou pasta de dados (ex: analise.GASTOS_PESSOAL_FOLDER) deste município."""
+        return os.path.normpath(os.path.join(self.base_dir, relative_path))
+
+    @property
+    def titulo(self):
+        return f"{self.nome}-{self.uf}"
+
+    def __repr__(self):
+        return f"Municipio({self.id!r}, {self.base_dir!r})"
+
+
+# ==============================================================================
+# Cadastro
+# ==============================================================================
+def _read_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def listar():
+    """{id: Municipio} de todos os municípios cadastrados, com o padrão primeiro."""
+    municipios = {}
+    if os.path.isdir(MUNICIPIOS_DIR):
+        for municipio_id in sorted(os.listdir(MUNICIPIOS_DIR)):
+            config_path = os.path.join(MUNICIPIOS_DIR, municipio_id, MUNICIPIO_FILE)
+            if municipio_id.startswith('.') or not os.path.isfile(config_path):
+                continue
+            try:
+                config = _read_config(config_path)
+                municipios[municipio_id] = Municipio(municipio_id, os.path.join(MUNICIPIOS_DIR, municipio_id), config['nome'], config['uf'],
+                                                     config.get('url_api'), config.get('url_portal'))
+            except (OSError, ValueError, KeyError) as e:
+                if config_path not in _avisados:
+                    _avisados.add(config_path)
+                    print(f"ALERTA: Configuração inválida em '{config_path}'; município ignorado. Erro: {e}")
+    if 'lagarto' not in municipios:
+        municipios['lagarto'] = Municipio('lagarto', '.', **LAGARTO)
+    padrao = municipios.pop(MUNICIPIO_PADRAO, None)
+    return {MUNICIPIO_PADRAO: padrao, **municipios} if padrao else municipios
+
+def get(municipio_id=None):
+    """Município pelo id (o padrão, se None). Levanta MunicipioDesconhecido se não estiver cadastrado."""
+    municipio_id = municipio_id or MUNICIPIO_PADRAO
+    municipio = listar().get(municipio_id)
+    if municipio is None:
+        raise MunicipioDesconhecido(f"Município desconhecido: '{municipio_id}'")
+    return municipio
+
+def from_env():
+    """Município dos scripts de coleta: PAINEL_MUNICIPIO, ou o padrão."""
+    return get(os.environ.get('PAINEL_MUNICIPIO'))
@@ -0,0 +1,282 @@
+# orquestrador.py
+#
+# Atualização mensal dos dados em um único comando, sem perguntas no terminal:
+#
+#   python orquestrador.py --meses 01/2025-06/2025 --exportados exportados/
+#
+# Monta um grafo de tarefas e executa em paralelo as que são independentes
+# (no máximo --paralelo ao mesmo tempo):
+#   1. api:MM/AAAA        baixa a folha do mês pela API (coletor_dados.py);
+#   2. navegador:MM/AAAA  só se a API falhar, coleta pelo portal (coletor_final.py),
+#                         uma janela por vez, pois a escolha do período é manual;
+#   3. juntar:<pasta>     junta os arquivos exportados em <exportados>/<mes>_<ano>/
+#                         (juntador_arquivos.py); esses meses não são buscados na API;
+#   4. publicar           publica de uma vez, numa nova versão do manifesto da pasta
+#                         (manifesto_dados.py), todos os meses gravados: o painel não
+#                         vê uma atualização pela metade nem recarrega a cada mês;
+#   5. snapshot           depois de tudo, regera o snapshot lido pelo painel, que
+#                         também recarrega sozinho os arquivos alterados.
+# Ao final imprime um relatório por tarefa e por mês (opcionalmente em JSON).
+#
+# Para outro município (municipios.py):  PAINEL_MUNICIPIO=<id> python orquestrador.py ...
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+
+import coletor_dados
+import juntador_arquivos
+import manifesto_dados
+import snapshot
+
+OK, FALHOU, PULADA = 'ok', 'falhou', 'pulada'
+
+# Uma única janela do navegador por vez: a seleção do período no portal é feita por uma pessoa.
+_navegador_lock = threading.Lock()
+
+
+class Tarefa:
+    """Nó do grafo: uma função sem argumentos, suas dependências e a condição para executar."""
+
+    def __init__(self, nome, funcao, dependencias=(), executar_se=None, exclusiva=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = list(dependencias)
+        self.executar_se = executar_se # recebe {nome: Tarefa} das dependências já concluídas
+        self.exclusiva = exclusiva # lock opcional para tarefas que não podem rodar juntas
+        self.status = None
+        self.resultado = None
+        self.erro = None
+        self.duracao_s = None
+
+    def _rodar(self):
+        start = time.perf_counter()
+        try:
+            if self.exclusiva is not None:
+                with self.exclusiva:
+                    self.resultado = self.funcao()
+            else:
+                self.resultado = self.funcao()
+            self.status = OK
+        except Exception as e:
+            self.status, self.erro = FALHOU, str(e) or e.__class__.__name__
+        finally:
+            self.duracao_s = round(time.perf_counter() - start, 2)
+
+
+def executar_grafo(tarefas, paralelo=4):
+    """Executa as tarefas respeitando as dependências, com no máximo `paralelo` simultâneas."""
+    por_nome = {t.nome: t for t in tarefas}
+    pendentes = dict(por_nome)
+    em_execucao = {}
+    with ThreadPoolExecutor(max_workers=paralelo) as pool:
+        while pendentes or em_execucao:
+            prontas = [t for t in pendentes.values()
+                       if all(d in por_nome and por_nome[d].status is not None for d in t.dependencias)]
+            for tarefa in prontas:
+                del pendentes[tarefa.nome]
+                dependencias = {d: por_nome[d] for d in tarefa.dependencias}
+                if tarefa.executar_se is not None and not tarefa.executar_se(dependencias):
+                    tarefa.status = PULADA
+                    continue
+                em_execucao[pool.submit(tarefa._rodar)] = tarefa
+            if em_execucao:
+                concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                for future in concluidas:
+                    em_execucao.pop(future)
+            elif not prontas:
+                # Nada rodando e nada liberado: dependência inexistente ou ciclo.
+                for tarefa in pendentes.values():
+                    tarefa.status, tarefa.erro = FALHOU, "dependência não resolvida"
+                break
+    return tarefas
+
+
+# ==============================================================================
+# Montagem do Grafo
+# ==============================================================================
+def _log(prefixo):
+    return lambda mensagem: print(f"[{prefixo}] {mensagem}")
+
+def _parse_mes(texto):
+    mes, ano = texto.strip().split('/')
+    mes, ano = int(mes), int(ano)
+    if not 1 <= mes <= 12:
+        raise ValueError(texto)
+    return mes, ano
+
+def parse_meses(especificacoes):
+    """Converte 'MM/AAAA' e intervalos 'MM/AAAA-MM/AAAA' em uma lista ordenada de (mes, ano)."""
+    meses = set()
+    for especificacao in especificacoes:
+        inicio, _, fim = especificacao.partition('-')
+        (mes, ano), (mes_fim, ano_fim) = _parse_mes(inicio), _parse_mes(fim or inicio)
+        while (ano, mes) <= (ano_fim, mes_fim):
+            meses.add((mes, ano))
+            mes, ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+    return sorted(meses, key=lambda m: (m[1], m[0]))
+
+def mes_anterior(hoje=None):
+    hoje = hoje or date.today()
+    return (12, hoje.year - 1) if hoje.month == 1 else (hoje.month - 1, hoje.year)
+
+def _coletar_pelo_navegador(mes, ano):
+    # Importado só quando necessário: selenium e webdriver_manager são dependências opcionais.
+    import coletor_final
+    return coletor_final.coletar_mes_navegador(mes, ano)
+
+def montar_tarefas(meses, pasta_exportados=None, usar_navegador=True, atualizar_snapshot=True):
+    """Cria as tarefas de coleta, junção e atualização do snapshot. Devolve (tarefas, fontes por mês)."""
+    tarefas, fontes = [], {}
+
+    exportados = {}
+    if pasta_exportados and os.path.isdir(pasta_exportados):
+        for nome in sorted(os.listdir(pasta_exportados)):
+            caminho = os.path.join(pasta_exportados, nome)
+            mes_ano = juntador_arquivos.pasta_do_mes(nome)
+            if os.path.isdir(caminho) and mes_ano:
+                exportados[mes_ano] = caminho
+
+    for (mes, ano), caminho in exportados.items():
+        nome = f"juntar:{os.path.basename(caminho)}"
+        tarefas.append(Tarefa(nome, lambda c=caminho, m=mes, a=ano, n=nome: juntador_arquivos.juntar_pasta(c, m, a, log=_log(n))))
+        fontes[(mes, ano)] = [nome]
+
+    for mes, ano in meses:
+        if (mes, ano) in exportados:
+            continue # Os arquivos exportados do mês têm prioridade sobre a API
+        api = f"api:{mes:02d}/{ano}"
+        tarefas.append(Tarefa(api, lambda m=mes, a=ano, n=api: coletor_dados.coletar_mes(m, a, log=_log(n))))
+        fontes[(mes, ano)] = [api]
+        if usar_navegador:
+            navegador = f"navegador:{mes:02d}/{ano}"
+            tarefas.append(Tarefa(
+                navegador,
+                lambda m=mes, a=ano: _coletar_pelo_navegador(m, a),
+                dependencias=[api],
+                executar_se=lambda deps, api=api: deps[api].status == FALHOU,
+                exclusiva=_navegador_lock,
+            ))
+            fontes[(mes, ano)].append(navegador)
+
+    coletas = [t.nome for t in tarefas]
+    tarefas.append(Tarefa(
+        'publicar',
+        lambda: _publicar_lote(),
+        dependencias=coletas,
+        executar_se=lambda deps: any(t.status == OK for t in deps.values()),
+    ))
+
+    if atualizar_snapshot:
+        tarefas.append(Tarefa(
+            'snapshot',
+            lambda: snapshot.build_snapshot(coletor_dados.MUNICIPIO.base_dir, _snapshot_root()),
+            dependencias=['publicar'],
+            # Sem nenhum arquivo novo não há o que atualizar (a menos que ainda não exista snapshot).
+            executar_se=lambda deps: deps['publicar'].status == OK or snapshot.current_version(_snapshot_root()) is None,
+        ))
+    return tarefas, fontes
+
+def _snapshot_root():
+    return coletor_dados.MUNICIPIO.path(snapshot.SNAPSHOT_ROOT)
+
+def _publicar_lote():
+    versao = manifesto_dados.publish(coletor_dados.DESTINATION_FOLDER)
+    return f"versão {versao} de {coletor_dados.DESTINATION_FOLDER}/" if versao else None
+
+
+# ==============================================================================
+# Relatório
+# ==============================================================================
+def montar_relatorio(tarefas, fontes, inicio, duracao_s):
+    por_nome = {t.nome: t for t in tarefas}
+    meses = {}
+    for (mes, ano), nomes in fontes.items():
+        concluida = next((por_nome[n] for n in nomes if por_nome[n].status == OK), None)
+        meses[f"{mes:02d}/{ano}"] = {
+            'status': OK if concluida else FALHOU,
+            'fonte': concluida.nome.split(':')[0] if concluida else None,
+            'arquivo': concluida.resultado if concluida else None,
+        }
+    return {
+        'inicio': inicio.isoformat(timespec='seconds'),
+        'duracao_s': round(duracao_s, 2),
+        'meses': meses,
+        'tarefas': [
+            {'tarefa': t.nome, 'status': t.status, 'duracao_s': t.duracao_s,
+             'resultado': t.resultado if isinstance(t.resultado, str) else None, 'erro': t.erro}
+            for t in tarefas
+        ],
+    }
+
+def imprimir_relatorio(relatorio):
+    print("\n----------------------------------------------------")
+    print(f"Relatório da atualização ({relatorio['duracao_s']} s)")
+    print("----------------------------------------------------")
+    for tarefa in relatorio['tarefas']:
+        duracao = f"{tarefa['duracao_s']:>7.1f} s" if tarefa['duracao_s'] is not None else " " * 9
+        detalhe = tarefa['erro'] or tarefa['resultado'] or ''
+        print(f"  {tarefa['tarefa']:<28} {tarefa['status']:<7} {duracao}  {detalhe}")
+    print("\nMeses:")
+    for mes, info in relatorio['meses'].items():
+        simbolo = "✅" if info['status'] == OK else "❌"
+        print(f"  {simbolo} {mes}: {info['fonte'] or 'sem dados'}")
+    if 'cache_http' in relatorio:
+        cache = relatorio['cache_http']
+        print(f"\nCache HTTP: {cache['cache']} do cache, {cache['revalidado']} revalidadas (304), {cache['rede']} baixadas")
+    print("----------------------------------------------------")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleta, junta e publica os dados do painel em uma única execução.")
+    parser.add_argument('--meses', nargs='+', help="Meses 'MM/AAAA' ou intervalos 'MM/AAAA-MM/AAAA' (padrão: mês anterior).")
+    parser.add_argument('--exportados', help="Pasta com subpastas '<mes>_<ano>' de arquivos exportados do portal para juntar.")
+    parser.add_argument('--paralelo', type=int, default=4, help="Máximo de tarefas simultâneas.")
+    parser.add_argument('--sem-navegador', action='store_true', help="Não recorrer ao portal (Selenium) quando a API falhar.")
+    parser.add_argument('--sem-snapshot', action='store_true', help="Não regerar o snapshot do painel ao final.")
+    parser.add_argument('--sem-cache-http', action='store_true', help="Baixa todas as páginas da API de novo, ignorando o cache local.")
+    parser.add_argument('--relatorio', help="Arquivo JSON onde salvar o relatório da execução.")
+    args = parser.parse_args()
+
+    try:
+        meses = parse_meses(args.meses) if args.meses else [mes_anterior()]
+    except ValueError:
+        parser.error("Use meses no formato MM/AAAA ou MM/AAAA-MM/AAAA.")
+
+    # Sem terminal interativo ninguém pode escolher o período no portal.
+    usar_navegador = not args.sem_navegador and sys.stdin.isatty()
+    if not args.sem_navegador and not usar_navegador:
+        print("AVISO: Execução sem terminal interativo; a coleta pelo navegador foi desativada.")
+
+    if args.sem_cache_http:
+        coletor_dados.USAR_CACHE_HTTP = False
+
+    print(f"--- Orquestrador de Coleta do Painel ({coletor_dados.MUNICIPIO.titulo}) ---")
+    inicio, start = datetime.now(), time.perf_counter()
+    tarefas, fontes = montar_tarefas(meses, args.exportados, usar_navegador, not args.sem_snapshot)
+    manifesto_dados.start_batch(coletor_dados.DESTINATION_FOLDER)
+    try:
+        executar_grafo(tarefas, paralelo=max(1, args.paralelo))
+    finally:
+        # Se a execução for interrompida, o que já foi gravado ainda é publicado.
+        manifesto_dados.publish(coletor_dados.DESTINATION_FOLDER)
+    relatorio = montar_relatorio(tarefas, fontes, inicio, time.perf_counter() - start)
+    if coletor_dados.USAR_CACHE_HTTP and coletor_dados._sessao is not None:
+        relatorio['cache_http'] = dict(coletor_dados.sessao_http().stats)
+    imprimir_relatorio(relatorio)
+
+    if args.relatorio:
+        with open(args.relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"Relatório salvo em '{args.relatorio}'")
+
+    if any(info['status'] != OK for info in relatorio['meses'].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# servidor.py
+#
+# Ponto de entrada de produção (chamado por start.sh). Aquece os caches do painel
+# no próprio processo e só então inicia o Streamlit, que reaproveita os módulos
+# já importados (cache_painel.py) e, portanto, os mesmos caches.
+#
+#   python servidor.py
+#
+# PORT define a porta (padrão 8501). Com PAINEL_AQUECIMENTO=segundo_plano o
+# servidor abre a porta imediatamente e o aquecimento corre numa thread; as
+# sessões que chegarem antes do fim aguardam com um aviso de carregamento.
+# Com PAINEL_API_PORTA a API JSON (api_dados.py) também é servida, nessa porta,
+# pelo mesmo processo e com os mesmos caches.
+
+import os
+import sys
+
+import aquecimento
+
+
+def main():
+    if os.environ.get('PAINEL_AQUECIMENTO') == 'segundo_plano':
+        aquecimento.start_background()
+    else:
+        aquecimento.warm_up()
+
+    if os.environ.get('PAINEL_API_PORTA'):
+        import api_dados
+        api_dados.start_background(int(os.environ['PAINEL_API_PORTA']))
+
+    from streamlit.web import cli as stcli
+    sys.argv = [
+        'streamlit', 'run', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py'),
+        '--server.port', os.environ.get('PORT', '8501'),
+        '--server.address', '0.0.0.0',
+        '--server.headless', 'true',
+    ]
+    sys.exit(stcli.main())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# snapshot.py
+#
+# Pré-processamento offline do painel. Depois de rodar os coletores
+# (coletor_dados.py / coletor_final.py / juntador_arquivos.py), execute:
+#
+#   python snapshot.py
+#
+# para ler as planilhas brutas uma única vez e publicar um "snapshot" versionado
+# em snapshots/<versão>/ com as tabelas limpas, as colunas de classificação, os
+# totais anuais, o grafo de vínculos por sobrenome e os nomes em formato
+# categórico (índice de busca); os gastos gerais ficam particionados por ano/mês.
+# O dashboard apenas mapeia esses arquivos Arrow em memória, sem repetir a
+# ingestão a cada inicialização: as colunas numéricas e de data do DataFrame
+# apontam direto para as páginas do arquivo (somente-leitura, sem cópia), e só os
+# textos, as categorias e os booleanos são convertidos para a memória do processo.
+#
+# Com vários municípios (municipios.py), cada um tem o seu snapshot em
+# <pasta do município>/snapshots/:  python snapshot.py --municipio <id>  (ou --todos).
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import analise
+import entidades
+import ingestao
+import monitor_arquivos
+import municipios
+
+SNAPSHOT_ROOT = 'snapshots'
+CURRENT_POINTER = 'ATUAL'
+FORMAT_VERSION = 10
+
+# Colunas de nome gravadas como categóricas: a busca textual percorre só os nomes distintos.
+CATEGORICAL_COLUMNS = {
+    'pessoal': ['Credor', 'Cargo', 'Entidade_Nome'],
+    'anuais': ['Credor', 'Entidade_Nome'],
+    'gastos_gerais': ['Fornecedor', 'Categoria', 'Secretaria', 'Entidade_Nome'],
+    'viagens': ['Favorecido', 'Favorecido_Abreviado', 'Destino'],
+    'vinculos': ['Secretario', 'Origem', 'Nome', 'Cargo'],
+    'anomalias': ['Tipo', 'Grupo', 'Nome'],
+}
+
+# Tabelas gravadas particionadas por ano/mês de uma coluna de data, em
+# <tabela>/ano=AAAA/mes=MM.arrow: consultas por período leem só as partições do intervalo.
+# A tabela inteira também é gravada em <tabela>.arrow, num único bloco e em ordem de
+# data: o painel a mapeia sem cópia (juntar as partições copiaria tudo) e recorta um
+# período numa fatia contígua dela (analise.period_slice), sem outra cópia.
+PARTITIONED_TABLES = {
+    'gastos_gerais': 'Data',
+}
+
+
+# ==============================================================================
+# Funções de Apoio
+# ==============================================================================
+def source_fingerprint(base_dir='.'):
+    """Tamanho e data de modificação dos arquivos brutos, agrupados por conjunto de dados."""
+    return monitor_arquivos.all_fingerprints(base_dir)
+
+def _fingerprint_hash(fingerprint):
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+def _version_name(fingerprint):
+    # Microssegundos e um sufixo aleatório: duas gerações no mesmo segundo não colidem no rename,
+    # e a ordem alfabética continua sendo a cronológica (prune_snapshots).
+    return f"{datetime.now():%Y%m%d-%H%M%S-%f}-{_fingerprint_hash(fingerprint)}-{uuid.uuid4().hex[:4]}"
+
+def _write_table(directory, name, df):
+    """Grava uma tabela em Arrow/Feather sem compressão, para que possa ser mapeada em memória."""
+    columns = [c for c in CATEGORICAL_COLUMNS.get(name, []) if c in df.columns]
+    if columns:
+        # Categorias definidas uma vez na tabela inteira: todas as partições têm o mesmo esquema.
+        df = df.astype({c: 'category' for c in columns})
+    if name in PARTITIONED_TABLES:
+        df = df.sort_values(PARTITIONED_TABLES[name], kind='stable')
+        _write_partitions(os.path.join(directory, name), df, PARTITIONED_TABLES[name])
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    feather.write_feather(table, os.path.join(directory, f"{name}.arrow"), compression='uncompressed')
+    return len(df)
+
+def _write_partitions(table_dir, df, date_column):
+    os.makedirs(table_dir)
+    if df.empty:
+        return
+    dates = df[date_column] # já em ordem de data (_write_table)
+    for (year, month), part in df.groupby([dates.dt.year, dates.dt.month], sort=True):
+        year_dir = os.path.join(table_dir, f"ano={year:04d}")
+        os.makedirs(year_dir, exist_ok=True)
+        table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+        feather.write_feather(table, os.path.join(year_dir, f"mes={month:02d}.arrow"), compression='uncompressed')
+
+
+# ==============================================================================
+# Construção e Leitura do Snapshot
+# ==============================================================================
+def build_snapshot(base_dir='.', root=SNAPSHOT_ROOT, keep=3):
+    """Lê as planilhas brutas, processa tudo e publica uma nova versão do snapshot. Devolve o diretório criado."""
+    start = time.perf_counter()
+    fingerprint = source_fingerprint(base_dir)
+
+    fontes = {name: os.path.join(base_dir, path) for name, path in (
+        ('pessoal', analise.GASTOS_PESSOAL_FOLDER), ('anuais', analise.DADOS_ANUAIS_FOLDER),
+        ('gastos_gerais', analise.GASTOS_GERAIS_FILE), ('viagens', analise.VIAGENS_FILE))}
+    pessoal = analise.load_and_process_spending_data(fontes['pessoal'])
+    anuais = analise.enrich_annual_expenses(analise.load_annual_expenses_data(fontes['anuais']))
+    gerais = analise.enrich_general_expenses(analise.load_general_expenses(fontes['gastos_gerais']))
+    resolvedor = entidades.ResolvedorEntidades(os.path.join(base_dir, entidades.ENTIDADES_FILE))
+    try:
+        pessoal = entidades.add_entity_columns(pessoal, 'Credor', resolvedor, aproximado=False)
+        anuais = entidades.add_entity_columns(anuais, 'Credor', resolvedor)
+        gerais = entidades.add_entity_columns(gerais, 'Fornecedor', resolvedor)
+        tabela_entidades = pd.DataFrame(list(resolvedor.canonical_names().items()), columns=['Entidade', 'Nome']).astype({'Entidade': 'int32'})
+    finally:
+        resolvedor.close()
+    viagens = analise.enrich_travel_data(analise.load_travel_data(fontes['viagens']))
+    vinculos = analise.surname_link_graph(pessoal, gerais)
+
+    anomalias, estatisticas = analise.anomaly_tables(pessoal, viagens, gerais)
+
+    tables = {
+        'pessoal': pessoal,
+        'anuais': anuais,
+        'gastos_gerais': gerais,
+        'viagens': viagens,
+        'vinculos': vinculos,
+        'entidades': tabela_entidades,
+        'pagamentos': analise.payment_facts(pessoal, anuais, gerais),
+        'pessoal_mensal_cargo': analise.monthly_cargo_aggregates(pessoal),
+        'viagens_por_destino': analise.travel_aggregates(viagens, 'Destino'),
+        'viagens_por_servidor': analise.travel_aggregates(viagens, 'Favorecido'),
+        'anomalias': anomalias,
+        'estatisticas_robustas': estatisticas,
+    }
+    if not anuais.empty:
+        tables['totais_festas_ano'] = analise.yearly_totals(analise.party_expenses(anuais))
+        tables['totais_combustivel_ano'] = analise.yearly_totals(analise.fuel_expenses(anuais))
+
+    version = _version_name(fingerprint)
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = os.path.join(root, f".tmp-{uuid.uuid4().hex[:8]}")
+    os.makedirs(tmp_dir)
+    try:
+        row_counts = {name: _write_table(tmp_dir, name, df) for name, df in tables.items()}
+        revenue, expenses, period_year = analise.load_financial_data(os.path.join(base_dir, analise.FINANCEIRO_FILE))
+        manifest = {
+            'versao': version,
+            'formato': FORMAT_VERSION,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'duracao_s': round(time.perf_counter() - start, 2),
+            'tabelas': row_counts,
+            'financeiro': {
+                'previsao_arrecadacao': None if revenue is None else float(revenue),
+                'previsao_gastos': None if expenses is None else float(expenses),
+                'ano_periodo': period_year,
+            },
+            'fontes': fingerprint,
+            # Só os avisos das planilhas deste município (com --todos os de outros ainda estão registrados).
+            'avisos_ingestao': ingestao.avisos(fontes.values()),
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        final_dir = os.path.join(root, version)
+        os.rename(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # O ponteiro é trocado atomicamente: leitores veem a versão antiga ou a nova, nunca uma parcial.
+    pointer_tmp = os.path.join(root, f".{CURRENT_POINTER}.tmp")
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_POINTER))
+    prune_snapshots(root, keep=keep)
+    return final_dir
+
+def prune_snapshots(root=SNAPSHOT_ROOT, keep=3):
+    """Remove as versões mais antigas, mantendo as `keep` mais recentes (e sempre a atual)."""
+    current = current_version(root)
+    versions = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and not d.startswith('.'))
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+def current_version(root=SNAPSHOT_ROOT):
+    """Nome da versão publicada (ou None se ainda não houver snapshot)."""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if version and os.path.isdir(os.path.join(root, version)) else None
+
+def current_snapshot_dir(root=SNAPSHOT_ROOT):
+    version = current_version(root)
+    return os.path.join(root, version) if version else None
+
+def read_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _to_pandas(table):
+    # Um bloco por coluna: as colunas numéricas sem nulos viram visões dos buffers mapeados
+    # em vez de serem copiadas para um bloco único; os buffers convertidos são liberados já.
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def read_table(snapshot_dir, name):
+    """Lê uma tabela do snapshot com mapeamento em memória (DataFrame vazio se ela não existir)."""
+    path = os.path.join(snapshot_dir, f"{name}.arrow")
+    if not os.path.exists(path):
+        return query_partitions(snapshot_dir, name) if name in PARTITIONED_TABLES else pd.DataFrame()
+    return _to_pandas(feather.read_table(path, memory_map=True))
+
+def list_partitions(snapshot_dir, name):
+    """Partições de uma tabela particionada: lista ordenada de ((ano, mês), caminho)."""
+    table_dir = os.path.join(snapshot_dir, name)
+    partitions = []
+    for path in glob.glob(os.path.join(table_dir, 'ano=*', 'mes=*.arrow')):
+        year = int(os.path.basename(os.path.dirname(path))[len('ano='):])
+        month = int(os.path.basename(path)[len('mes='):-len('.arrow')])
+        partitions.append(((year, month), path))
+    return sorted(partitions)
+
+def query_partitions(snapshot_dir, name, inicio=None, fim=None):
+    """
+    Lê de uma tabela particionada apenas as partições (ano/mês) que cruzam o período
+    [inicio, fim]; o recorte exato por dia fica com analise.filter_general_expenses.
+    """
+    first = (inicio.year, inicio.month) if inicio is not None else None
+    last = (fim.year, fim.month) if fim is not None else None
+    tables = [
+        feather.read_table(path, memory_map=True)
+        for key, path in list_partitions(snapshot_dir, name)
+        if (first is None or key >= first) and (last is None or key <= last)
+    ]
+    if not tables:
+        return pd.DataFrame()
+    return _to_pandas(pa.concat_tables(tables))
+
+def is_stale(snapshot_dir, base_dir='.'):
+    """Indica se algum arquivo bruto mudou (ou o formato do snapshot) desde que ele foi gerado."""
+    manifest = read_manifest(snapshot_dir)
+    return manifest.get('formato') != FORMAT_VERSION or manifest.get('fontes') != source_fingerprint(base_dir)
+
+def fresh_datasets(manifest, fingerprints):
+    """Conjuntos de dados cujos arquivos brutos ainda são exatamente os usados para gerar o snapshot."""
+    if manifest.get('formato') != FORMAT_VERSION:
+        return set()
+    sources = manifest.get('fontes', {})
+    return {name for name, fingerprint in fingerprints.items() if sources.get(name) == fingerprint}
+
+
+def _publish_one(base_dir, root, keep, se_desatualizado):
+    current = current_snapshot_dir(root)
+    if se_desatualizado and current and not is_stale(current, base_dir):
+        print(f"Snapshot '{os.path.basename(current)}' já está atualizado. Nada a fazer.")
+        return
+
+    snapshot_dir = build_snapshot(base_dir, root, keep=keep)
+    manifest = read_manifest(snapshot_dir)
+    print("\n----------------------------------------------------")
+    print(f"✅ SUCESSO! Snapshot '{manifest['versao']}' publicado em {manifest['duracao_s']} s")
+    for name, rows in manifest['tabelas'].items():
+        print(f"   - {name}: {rows} linhas")
+    for aviso in manifest['avisos_ingestao']:
+        print(f"⚠️ {aviso['arquivo']} ({aviso['conjunto']}): {aviso['motivo']}")
+    print("----------------------------------------------------")
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o snapshot pré-processado consumido pelo painel.")
+    parser.add_argument('--municipio', help="Município (municipios.py) cujos dados serão processados; padrão: o município padrão.")
+    parser.add_argument('--todos', action='store_true', help="Processa todos os municípios cadastrados.")
+    parser.add_argument('--dados', help="Pasta base com dados_gastos/, dados_anuais/ e as planilhas (substitui a do município).")
+    parser.add_argument('--saida', help="Pasta onde as versões do snapshot são publicadas (padrão: <pasta do município>/snapshots).")
+    parser.add_argument('--manter', type=int, default=3, help="Quantas versões antigas manter.")
+    parser.add_argument('--se-desatualizado', action='store_true', help="Só gera uma nova versão se algum arquivo bruto mudou.")
+    args = parser.parse_args()
+
+    print("--- Gerador de Snapshot do Painel ---")
+    if args.todos:
+        cidades = list(municipios.listar().values())
+    else:
+        try:
+            cidades = [municipios.get(args.municipio)]
+        except municipios.MunicipioDesconhecido as e:
+            parser.error(str(e))
+    for cidade in cidades:
+        if len(cidades) > 1:
+            print(f"\n=== {cidade.titulo} ===")
+        base_dir = args.dados or cidade.base_dir
+        _publish_one(base_dir, args.saida or os.path.join(base_dir, SNAPSHOT_ROOT), args.manter, args.se_desatualizado)
+
+if __name__ == "__main__":
+    main()
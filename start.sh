@@ -0,0 +1,8 @@
+#!/usr/bin/env bash
+# start.sh — inicialização do painel em produção (Render: startCommand).
+# Atualiza o snapshot se alguma planilha mudou e inicia o servidor com os caches aquecidos.
+set -euo pipefail
+cd "$(dirname "$0")"
+
+python snapshot.py --todos --se-desatualizado || echo "AVISO: não foi possível atualizar o snapshot; o painel lerá as planilhas brutas."
+exec python servidor.py
@@ -0,0 +1,85 @@
+# tests/test_analise.py
+#
+# Funções de análise (analise.py): valores atípicos por grupo e o índice do histórico
+# mensal de cada servidor.
+
+import pandas as pd
+
+import analise
+
+
+def _grupo(valores, grupo='Professor'):
+    return pd.DataFrame({'Grupo': grupo, 'Nome': [f"SERVIDOR {i}" for i in range(len(valores))],
+                         'Periodo': '01/2025', 'Valor': [float(v) for v in valores]})
+
+
+def test_grupo_constante_nao_sinaliza_ninguem():
+    stats, atipicos = analise.robust_outliers('Salário', _grupo([5000] * 10))
+    assert atipicos.empty
+    assert stats.loc[0, 'MAD'] == 0
+
+def test_grupo_constante_tolera_pequena_diferenca():
+    # MAD zero: sem o piso, R$ 100 a mais já seria um escore infinito.
+    _, atipicos = analise.robust_outliers('Salário', _grupo([5000] * 9 + [5100]))
+    assert atipicos.empty
+
+def test_grupo_de_uma_linha_fica_de_fora():
+    stats, atipicos = analise.robust_outliers('Salário', _grupo([1_000_000], grupo='Prefeito'))
+    assert atipicos.empty
+    assert stats.loc[0, 'N'] == 1
+
+def test_pico_obvio_e_sinalizado():
+    valores = [3000, 3100, 3200, 2900, 3050, 2950, 3150, 60000]
+    _, atipicos = analise.robust_outliers('Salário', _grupo(valores))
+    assert atipicos['Nome'].tolist() == ['SERVIDOR 7']
+    assert atipicos.loc[atipicos.index[0], 'Mediana_Grupo'] == 3075
+
+def test_pico_em_escala_logaritmica_e_sinalizado():
+    valores = [800, 1200, 950, 1100, 1000, 1050, 900, 250000]
+    _, atipicos = analise.robust_outliers('Pagamento', _grupo(valores), threshold=analise.LIMIAR_ANOMALIA_PAGAMENTOS, log_scale=True)
+    assert atipicos['Nome'].tolist() == ['SERVIDOR 7']
+
+def test_piso_do_mad_em_escala_logaritmica_e_relativo_a_mediana_em_reais():
+    # Pagamentos mensais constantes de R$ 10.000 e um mês com o dobro: o piso de 5% da
+    # mediana (em reais) não pode esconder o pico, nem sinalizar uma variação de 2%.
+    _, atipicos = analise.robust_outliers('Pagamento', _grupo([10000] * 9 + [20000]), threshold=analise.LIMIAR_ANOMALIA_PAGAMENTOS, log_scale=True)
+    assert atipicos['Nome'].tolist() == ['SERVIDOR 9']
+    _, atipicos = analise.robust_outliers('Pagamento', _grupo([10000] * 9 + [10200]), threshold=analise.LIMIAR_ANOMALIA_PAGAMENTOS, log_scale=True)
+    assert atipicos.empty
+
+
+def _folha(linhas):
+    return pd.DataFrame([{'Credor': credor, 'Cargo': cargo, 'Projetado': float(valor), 'Data': pd.Timestamp(data)}
+                         for credor, cargo, valor, data in linhas])
+
+def test_historico_em_ordem_de_mes_com_meses_ausentes():
+    folha = _folha([
+        ('MARIA SOUZA', 'PROFESSOR', 3200, '2025-03-01'),
+        ('ANA LIMA', 'VIGIA', 1800, '2025-01-01'),
+        ('MARIA SOUZA', 'PROFESSOR', 3000, '2025-01-01'),
+    ])
+    historico = analise.servant_timeline(analise.build_servant_index(folha), 'MARIA SOUZA')
+    # Fevereiro não existe na folha dela: não aparece nem é preenchido.
+    assert historico['Data'].dt.month.tolist() == [1, 3]
+    assert historico['Projetado'].tolist() == [3000, 3200]
+
+def test_homonimos_e_grafias_diferentes_ficam_no_mesmo_historico():
+    folha = _folha([
+        ('JOSÉ DA SILVA', 'VIGIA', 1500, '2025-02-01'),
+        ('JOSE DA SILVA', 'MOTORISTA', 2500, '2025-01-01'),
+        ('jose da silva ', 'VIGIA', 1500, '2025-01-01'),
+        ('JOSE DA SILVA SANTOS', 'VIGIA', 1600, '2025-01-01'),
+    ])
+    indice = analise.build_servant_index(folha)
+    historico = analise.servant_timeline(indice, 'José da Silva')
+    assert len(historico) == 3
+    assert historico['Data'].is_monotonic_increasing
+    # Dois vínculos no mesmo mês (homônimos ou acúmulo de cargos) continuam separados.
+    assert sorted(historico.loc[historico['Data'] == '2025-01-01', 'Cargo']) == ['MOTORISTA', 'VIGIA']
+    assert analise.servant_timeline(indice, 'JOSE DA SILVA SANTOS')['Projetado'].tolist() == [1600]
+
+def test_historico_de_nome_desconhecido_ou_folha_vazia_e_vazio():
+    folha = _folha([('ANA LIMA', 'VIGIA', 1800, '2025-01-01')])
+    assert analise.servant_timeline(analise.build_servant_index(folha), 'MARIA SOUZA').empty
+    vazio = analise.build_servant_index(folha.iloc[0:0])
+    assert analise.servant_timeline(vazio, 'ANA LIMA').empty
@@ -0,0 +1,27 @@
+# tests/test_api_dados.py
+#
+# ETag das respostas da API (api_dados.py): muda com os dados e também com as
+# versões do código que calcula as respostas.
+
+import pytest
+
+import api_dados
+import entidades
+import snapshot
+
+DIGITAIS = {'pessoal': 'abc', 'gastos_gerais': 'def'}
+
+
+def test_etag_estavel_para_os_mesmos_dados_e_consulta():
+    assert api_dados.make_etag(DIGITAIS, '/api/festas', {'ano': ['2025']}) == api_dados.make_etag(dict(DIGITAIS), '/api/festas', {'ano': ['2025']})
+    assert api_dados.make_etag(DIGITAIS, '/api/festas', {}) != api_dados.make_etag({**DIGITAIS, 'pessoal': 'xyz'}, '/api/festas', {})
+
+def test_etag_inclui_as_versoes_do_codigo():
+    assert api_dados.VERSAO_CODIGO['snapshot'] == snapshot.FORMAT_VERSION
+    assert api_dados.VERSAO_CODIGO['entidades'] == entidades.REGRAS_VERSAO
+
+@pytest.mark.parametrize('chave, valor', [('api', -1), ('snapshot', -1), ('entidades', -1), ('fontes', 'outro')])
+def test_deploy_com_nova_versao_muda_o_etag(monkeypatch, chave, valor):
+    antes = api_dados.make_etag(DIGITAIS, '/api/festas', {})
+    monkeypatch.setitem(api_dados.VERSAO_CODIGO, chave, valor)
+    assert api_dados.make_etag(DIGITAIS, '/api/festas', {}) != antes
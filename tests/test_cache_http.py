@@ -0,0 +1,183 @@
+# tests/test_cache_http.py
+#
+# Cache HTTP dos coletores (cache_http.py) contra um servidor local que conta as
+# requisições e responde 304 aos GETs condicionais com o ETag atual.
+
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import cache_http
+import coletor_dados
+import orquestrador
+
+
+class PortalFalso(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requisicoes = []
+
+    def do_GET(self):
+        PortalFalso.requisicoes.append((self.path, self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == PortalFalso.etag:
+            self.send_response(304)
+            self.send_header('ETag', PortalFalso.etag)
+            self.end_headers()
+            return
+        corpo = f'{{"pagina": "{self.path}", "versao": {PortalFalso.etag}}}'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.send_header('ETag', PortalFalso.etag)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FolhaFalsa(BaseHTTPRequestHandler):
+    """API paginada da folha: `paginas` são os registros já publicados, uma lista por página."""
+    paginas = []
+    requisicoes = []
+
+    def do_GET(self):
+        pagina = int(parse_qs(urlparse(self.path).query)['page'][0])
+        FolhaFalsa.requisicoes.append(pagina)
+        registros = FolhaFalsa.paginas[pagina - 1] if pagina <= len(FolhaFalsa.paginas) else []
+        corpo = json.dumps({'data': registros}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.send_header('ETag', f'"{pagina}-{len(registros)}"')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _servidor(handler):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+@pytest.fixture
+def portal():
+    PortalFalso.etag, PortalFalso.requisicoes = '"v1"', []
+    httpd = _servidor(PortalFalso)
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def folha():
+    FolhaFalsa.paginas, FolhaFalsa.requisicoes = [], []
+    httpd = _servidor(FolhaFalsa)
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/api/pessoal"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(cache_http.time, 'time', lambda: agora[0])
+    return agora
+
+@pytest.fixture
+def sessao(tmp_path):
+    return cache_http.CachedSession(str(tmp_path / 'cache.sqlite'))
+
+
+def test_baixa_guarda_revalida_e_usa_o_cache(portal, relogio, sessao):
+    url = f"{portal}/api/pessoal"
+
+    primeira = sessao.get(url, ttl=60)
+    assert primeira.status_code == 200 and primeira.from_cache is None
+    assert len(PortalFalso.requisicoes) == 1
+
+    # Dentro do prazo: nenhuma requisição ao servidor.
+    relogio[0] += 30
+    segunda = sessao.get(url, ttl=60)
+    assert segunda.from_cache == 'cache' and segunda.json() == primeira.json()
+    assert len(PortalFalso.requisicoes) == 1
+
+    # Prazo vencido: GET condicional com o ETag guardado; o 304 devolve o corpo local.
+    relogio[0] += 60
+    terceira = sessao.get(url, ttl=60)
+    assert PortalFalso.requisicoes[-1] == ('/api/pessoal', '"v1"')
+    assert terceira.status_code == 200 and terceira.from_cache == 'revalidado'
+    assert terceira.json() == primeira.json()
+
+    # O 304 renovou o prazo.
+    relogio[0] += 30
+    assert sessao.get(url, ttl=60).from_cache == 'cache'
+    assert len(PortalFalso.requisicoes) == 2
+    assert sessao.stats == {'rede': 1, 'cache': 2, 'revalidado': 1}
+
+def test_pagina_alterada_e_baixada_de_novo(portal, relogio, sessao):
+    url = f"{portal}/api/pessoal"
+    sessao.get(url, ttl=60)
+    PortalFalso.etag = '"v2"'
+    relogio[0] += 120
+    nova = sessao.get(url, ttl=60)
+    assert nova.from_cache is None and nova.json()['versao'] == 'v2'
+    relogio[0] += 1
+    assert sessao.get(url, ttl=60).json()['versao'] == 'v2'
+
+def test_parametros_fazem_parte_da_chave(portal, relogio, sessao):
+    url = f"{portal}/api/pessoal"
+    marco = sessao.get(url, ttl=60, params={'mes': 3, 'ano': 2024})
+    abril = sessao.get(url, ttl=60, params={'mes': 4, 'ano': 2024})
+    assert abril.from_cache is None
+    assert marco.json()['pagina'] != abril.json()['pagina']
+    assert sessao.get(url, ttl=60, params={'mes': 3, 'ano': 2024}).json() == marco.json()
+    # Os mesmos parâmetros já na URL usam a mesma entrada.
+    assert sessao.get(f"{url}?mes=3&ano=2024", ttl=60).from_cache == 'cache'
+    assert len(PortalFalso.requisicoes) == 2
+
+def test_cache_persiste_entre_sessoes(portal, relogio, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache_http.CachedSession(path).get(f"{portal}/api/pessoal", ttl=60)
+    assert cache_http.CachedSession(path).get(f"{portal}/api/pessoal", ttl=60).from_cache == 'cache'
+    assert len(PortalFalso.requisicoes) == 1
+
+@pytest.mark.parametrize('hoje, mes, ano, ttl', [
+    (date(2026, 10, 19), 10, 2026, cache_http.TTL_MES_ABERTO),
+    (date(2026, 10, 19), 9, 2026, cache_http.TTL_MES_ABERTO), # mês anterior: ainda sendo publicado
+    (date(2026, 10, 19), 8, 2026, cache_http.TTL_MES_FECHADO),
+    (date(2027, 1, 5), 12, 2026, cache_http.TTL_MES_ABERTO),
+    (date(2027, 1, 5), 11, 2026, cache_http.TTL_MES_FECHADO),
+])
+def test_mes_so_fecha_depois_da_carencia(hoje, mes, ano, ttl):
+    assert cache_http.ttl_para_mes(mes, ano, hoje) == ttl
+
+def test_pagina_recusada_nao_e_guardada_e_apaga_a_anterior(portal, relogio, sessao):
+    url = f"{portal}/api/pessoal"
+    sessao.get(url, ttl=60)
+    relogio[0] += 120
+    PortalFalso.etag = '"v2"'
+    assert sessao.get(url, ttl=60, cacheavel=lambda r: False).from_cache is None
+    assert sessao.get(url, ttl=60).from_cache is None
+    assert PortalFalso.requisicoes[-1] == ('/api/pessoal', None)
+
+def test_mes_anterior_incompleto_e_completado_na_reexecucao(folha, relogio, tmp_path, monkeypatch):
+    # O orquestrador coleta o mês anterior; na primeira execução só parte da folha saiu.
+    monkeypatch.setattr(coletor_dados, 'API_BASE_URL', folha)
+    monkeypatch.setattr(coletor_dados, '_sessao', cache_http.CachedSession(str(tmp_path / 'cache.sqlite')))
+    mes, ano = orquestrador.mes_anterior()
+    FolhaFalsa.paginas = [[{'nome': 'ANA'}]]
+    assert len(coletor_dados.buscar_mes_api(mes, ano, log=lambda *_: None)) == 1
+
+    # A folha é completada; a reexecução (depois do prazo curto) enxerga as páginas novas.
+    FolhaFalsa.paginas = [[{'nome': 'ANA'}], [{'nome': 'BRUNO'}]]
+    relogio[0] += cache_http.TTL_MES_ABERTO + 1
+    assert len(coletor_dados.buscar_mes_api(mes, ano, log=lambda *_: None)) == 2
+
+    # Já dentro do prazo: as páginas com registros vêm do cache, a vazia do fim vem do portal.
+    FolhaFalsa.requisicoes = []
+    assert len(coletor_dados.buscar_mes_api(mes, ano, log=lambda *_: None)) == 2
+    assert FolhaFalsa.requisicoes == [3]
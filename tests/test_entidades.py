@@ -0,0 +1,150 @@
+# tests/test_entidades.py
+#
+# Regras de resolução de entidades (entidades.py). Os pares de nomes são grafias
+# reais dos dados de Lagarto que NÃO podem ser juntadas.
+
+import pandas as pd
+import pytest
+
+import entidades
+
+
+@pytest.fixture
+def resolvedor(tmp_path):
+    resolvedor = entidades.ResolvedorEntidades(str(tmp_path / 'entidades.sqlite'))
+    yield resolvedor
+    resolvedor.close()
+
+
+@pytest.mark.parametrize('nome_a, nome_b', [
+    ('EDSON BATISTA DOS SANTOS', 'NELSON BATISTA DOS SANTOS'),
+    ('116.***.***-86 - RIAN DOS SANTOS FARIAS', 'JUAN DOS SANTOS FARIAS'),
+    ('VALDENICE DE JESUS SANTOS', 'VALDILENE DE JESUS SANTOS'),
+    ('037.***.***-54 - CLAUDIA DA COSTA SANTOS', 'GLAUCIA DA COSTA SANTOS'),
+    ('066.***.***-81 - NAIANE PEREIRA SANTOS', 'ELIANE PEREIRA SANTOS'),
+    ('19.588.728/0001-04 - BM PRODUCOES ARTISTICAS - EIRELI', 'MJM PRODUCOES ARTISTICAS LTDA'),
+])
+def test_nomes_parecidos_de_entidades_diferentes_nao_sao_juntados(resolvedor, nome_a, nome_b):
+    ids = resolvedor.resolve([nome_a, nome_b])
+    assert ids[nome_a] != ids[nome_b]
+
+@pytest.mark.parametrize('nome_a, nome_b', [
+    ('NELSON BATISTA DOS SANTOS', 'EDSON BATISTA DOS SANTOS'),
+    ('JUAN DOS SANTOS FARIAS', '116.***.***-86 - RIAN DOS SANTOS FARIAS'),
+    ('MJM PRODUCOES ARTISTICAS LTDA', '19.588.728/0001-04 - BM PRODUCOES ARTISTICAS - EIRELI'),
+])
+def test_ordem_de_chegada_nao_muda_o_resultado(resolvedor, nome_a, nome_b):
+    resolvedor.resolve([nome_a])
+    assert resolvedor.resolve([nome_b])[nome_b] != resolvedor.resolve([nome_a])[nome_a]
+
+@pytest.mark.parametrize('nome_a, nome_b', [
+    # Mesmo CNPJ, nomes diferentes
+    ('01.411.301/0001-70 - ARAUJO & FILHA LTDA', '01.411.301/0001-70 - ARAUJO E FILHA LTDA -EPP'),
+    # Mesma chave normalizada, com e sem documento
+    ('08.704.841/0001-91 - POSTO J MACARIO III LTDA', 'POSTO J. MACÁRIO III LTDA'),
+    ('013.***.***-05 - ADILIO PEREIRA DE ARAUJO', 'ADILIO PEREIRA DE ARAUJO'),
+    # Empresas sem documento, mesmo primeiro token
+    ('ACOPLAST INDUSTRIA E COMERCIO LTDA', 'ACOPLAST INDUSTRIA COMERCIO LTDA'),
+    # Filiais da mesma empresa (mesma raiz do CNPJ)
+    ('07.766.048/0001-54 - 3D PROJETOS E ASSESSORIA EM INFORMATICA LTDA', '07.766.048/0002-35 - 3D PROJETOS E ASSESSORIA EM INFORMATICA LTDA - ME'),
+])
+def test_variantes_da_mesma_entidade_sao_juntadas(resolvedor, nome_a, nome_b):
+    ids = resolvedor.resolve([nome_a, nome_b])
+    assert ids[nome_a] == ids[nome_b]
+
+def test_pessoas_nao_sao_juntadas_por_similaridade(resolvedor):
+    ids = resolvedor.resolve(['033.***.***-15 - JOSÉ ELISEU DE OLIVEIRA SOUZA', '033.***.***-15 - JOSÉ ELIZEU DE OLIVEIRA SOUZA'])
+    assert len(set(ids.values())) == 2
+
+def test_compatible_exige_documentos_da_mesma_empresa():
+    assert entidades._compatible(None, None)
+    assert not entidades._compatible(None, 'CNPJ:19588728000104')
+    assert not entidades._compatible('CNPJ:19588728000104', None)
+    assert entidades._compatible('CNPJ:07766048000154', 'CNPJ:07766048000235')
+    assert not entidades._compatible('CNPJ:07766048000154', 'CNPJ:07766049000154')
+    assert not entidades._compatible('CPF:033*15', 'CPF:033*15')
+
+def test_ids_sao_estaveis_entre_execucoes(tmp_path):
+    path = str(tmp_path / 'entidades.sqlite')
+    primeiro = entidades.ResolvedorEntidades(path)
+    ids = primeiro.resolve(['FOGO PRODUCOES ARTISTICAS LTDA', 'EDSON BATISTA DOS SANTOS'])
+    primeiro.close()
+    segundo = entidades.ResolvedorEntidades(path)
+    assert segundo.resolve(['EDSON BATISTA DOS SANTOS', 'FOGO PRODUCOES ARTISTICAS LTDA']) == ids
+    segundo.close()
+
+def test_tabela_com_regras_antigas_e_refeita(tmp_path):
+    path = str(tmp_path / 'entidades.sqlite')
+    antigo = entidades.ResolvedorEntidades(path)
+    antigo.resolve(['EDSON BATISTA DOS SANTOS'])
+    # Simula a associação feita pelas regras antigas.
+    with antigo._conn:
+        antigo._conn.execute("INSERT INTO nomes (nome, entidade) VALUES ('NELSON BATISTA DOS SANTOS', 1)")
+        antigo._conn.execute("PRAGMA user_version = 1")
+    antigo.close()
+    novo = entidades.ResolvedorEntidades(path)
+    ids = novo.resolve(['EDSON BATISTA DOS SANTOS', 'NELSON BATISTA DOS SANTOS'])
+    assert ids['EDSON BATISTA DOS SANTOS'] != ids['NELSON BATISTA DOS SANTOS']
+    novo.close()
+
+def test_folha_usa_so_a_chave_exata(resolvedor):
+    # Uma empresa sem documento juntada por similaridade a outra grafia...
+    ids = resolvedor.resolve(['ACOPLAST INDUSTRIA E COMERCIO LTDA', 'ACOPLAST INDUSTRIA COMERCIO LTDA'])
+    assert ids['ACOPLAST INDUSTRIA E COMERCIO LTDA'] == ids['ACOPLAST INDUSTRIA COMERCIO LTDA']
+    # ...continua separada quando o mesmo nome vem da folha, que não usa similaridade.
+    exatos = resolvedor.resolve(['ACOPLAST INDUSTRIA COMERCIO LTDA', 'ACOPLAST INDUSTRIA E COMERCIO LTDA'], aproximado=False)
+    assert exatos['ACOPLAST INDUSTRIA COMERCIO LTDA'] != exatos['ACOPLAST INDUSTRIA E COMERCIO LTDA']
+    assert exatos['ACOPLAST INDUSTRIA COMERCIO LTDA'] == ids['ACOPLAST INDUSTRIA COMERCIO LTDA']
+    # A associação aproximada já gravada não muda.
+    assert resolvedor.resolve(['ACOPLAST INDUSTRIA COMERCIO LTDA']) == {'ACOPLAST INDUSTRIA COMERCIO LTDA': ids['ACOPLAST INDUSTRIA COMERCIO LTDA']}
+
+def test_folha_liga_servidor_aos_pagamentos_com_o_mesmo_nome(resolvedor):
+    anuais = resolvedor.resolve(['013.***.***-05 - ADILIO PEREIRA DE ARAUJO'])
+    folha = resolvedor.resolve(['ADILIO PEREIRA DE ARAUJO', 'ADÍLIO PEREIRA DE ARAÚJO', 'ADILSON PEREIRA DE ARAUJO'], aproximado=False)
+    assert folha['ADILIO PEREIRA DE ARAUJO'] == folha['ADÍLIO PEREIRA DE ARAÚJO'] == anuais['013.***.***-05 - ADILIO PEREIRA DE ARAUJO']
+    assert folha['ADILSON PEREIRA DE ARAUJO'] != folha['ADILIO PEREIRA DE ARAUJO']
+
+def test_add_entity_columns_da_folha(resolvedor):
+    folha = pd.DataFrame({'Credor': ['EDSON BATISTA DOS SANTOS', 'NELSON BATISTA DOS SANTOS', 'EDSON BATISTA DOS SANTOS', None]})
+    resultado = entidades.add_entity_columns(folha, 'Credor', resolvedor, aproximado=False)
+    assert resultado['Entidade'].iloc[0] == resultado['Entidade'].iloc[2] != resultado['Entidade'].iloc[1]
+    assert resultado['Entidade'].iloc[3] == -1
+    assert list(resultado['Entidade_Nome'].astype(str)[:3]) == ['EDSON BATISTA DOS SANTOS', 'NELSON BATISTA DOS SANTOS', 'EDSON BATISTA DOS SANTOS']
+
+def test_dois_resolvedores_no_mesmo_arquivo_concordam(tmp_path):
+    # Como o painel e o snapshot: cada processo tem seu resolvedor aberto no mesmo arquivo.
+    path = str(tmp_path / 'entidades.sqlite')
+    painel = entidades.ResolvedorEntidades(path)
+    snapshot = entidades.ResolvedorEntidades(path)
+    acme = painel.resolve(['ACME LTDA'])['ACME LTDA']
+    assert snapshot.resolve(['ACME LTDA']) == {'ACME LTDA': acme}
+    # Outra grafia gravada pelo primeiro é juntada à entidade que o segundo criou.
+    posto = snapshot.resolve(['POSTO J MACARIO III LTDA'])['POSTO J MACARIO III LTDA']
+    assert painel.resolve(['POSTO J. MACÁRIO III LTDA'])['POSTO J. MACÁRIO III LTDA'] == posto
+    assert painel.canonical_names()[posto] == 'POSTO J MACARIO III LTDA'
+    painel.close()
+    snapshot.close()
+
+
+def _resolve_em_processo(path, nomes, fila):
+    resolvedor = entidades.ResolvedorEntidades(path)
+    fila.put(resolvedor.resolve(nomes))
+    resolvedor.close()
+
+def test_processos_concorrentes_atribuem_o_mesmo_id(tmp_path):
+    import multiprocessing
+    path = str(tmp_path / 'entidades.sqlite')
+    entidades.ResolvedorEntidades(path).close()
+    nomes = [f"FORNECEDOR {i:03d} LTDA" for i in range(200)]
+    fila = multiprocessing.Queue()
+    processos = [multiprocessing.Process(target=_resolve_em_processo, args=(path, ordem, fila)) for ordem in (nomes, nomes[::-1])]
+    for p in processos:
+        p.start()
+    resultados = [fila.get(timeout=60) for _ in processos]
+    for p in processos:
+        p.join()
+    assert resultados[0] == resultados[1]
+    # O que ficou gravado é o mesmo que os dois processos devolveram.
+    relido = entidades.ResolvedorEntidades(path)
+    assert relido.resolve(nomes) == resultados[0]
+    relido.close()
@@ -0,0 +1,84 @@
+# tests/test_ingestao.py
+#
+# Acumulador de blocos com transbordo para o disco (ingestao.py) e o descarte de
+# planilhas que falham no meio da leitura.
+
+import os
+
+import pandas as pd
+import pytest
+
+import analise
+import ingestao
+
+
+def _bloco(inicio, n, ano=2024):
+    return pd.DataFrame({'Credor': [f"CREDOR {i}" for i in range(inicio, inicio + n)],
+                         'Valor_Pago': [float(i) for i in range(inicio, inicio + n)], 'Ano': ano})
+
+def _arquivos_temporarios(acumulador):
+    return [] if acumulador._dir is None else os.listdir(acumulador._dir)
+
+
+@pytest.mark.parametrize('orcamento_mb', [128, 0])
+def test_planilha_com_erro_e_descartada_inteira(orcamento_mb):
+    # orcamento_mb=0 grava cada bloco em disco: o descarte também apaga esses arquivos.
+    acumulador = ingestao.AcumuladorBlocos('teste', orcamento_mb=orcamento_mb)
+    with acumulador.arquivo():
+        acumulador.append(_bloco(0, 3))
+    with pytest.raises(ValueError):
+        with acumulador.arquivo():
+            acumulador.append(_bloco(100, 5))
+            acumulador.append(_bloco(105, 5))
+            raise ValueError("planilha corrompida")
+    with acumulador.arquivo():
+        acumulador.append(_bloco(200, 2))
+    result = acumulador.result()
+    assert list(result['Credor']) == ['CREDOR 0', 'CREDOR 1', 'CREDOR 2', 'CREDOR 200', 'CREDOR 201']
+    assert list(result.index) == list(range(5))
+
+def test_descarte_apaga_os_temporarios_da_planilha():
+    acumulador = ingestao.AcumuladorBlocos('teste', orcamento_mb=0)
+    with acumulador.arquivo():
+        acumulador.append(_bloco(0, 3))
+    confirmados = _arquivos_temporarios(acumulador)
+    acumulador.append(_bloco(10, 3))
+    acumulador.append(_bloco(20, 3))
+    assert len(_arquivos_temporarios(acumulador)) == len(confirmados) + 2
+    acumulador.rollback()
+    assert _arquivos_temporarios(acumulador) == confirmados
+    diretorio = acumulador._dir
+    assert len(acumulador.result()) == 3
+    assert not os.path.exists(diretorio)
+
+def test_transbordo_mantem_ordem_e_indice():
+    blocos = [_bloco(i * 10, 10) for i in range(6)]
+    em_memoria = ingestao.AcumuladorBlocos('teste')
+    em_disco = ingestao.AcumuladorBlocos('teste', orcamento_mb=0.0005)
+    for i, bloco in enumerate(blocos):
+        for acumulador in (em_memoria, em_disco):
+            with acumulador.arquivo():
+                acumulador.append(bloco)
+                if i % 2:
+                    acumulador.append(_bloco(1000 + i, 1))
+    pd.testing.assert_frame_equal(em_disco.result(), em_memoria.result())
+
+def test_blocos_sem_arquivo_aberto_sao_confirmados_no_resultado():
+    acumulador = ingestao.AcumuladorBlocos('teste')
+    acumulador.append(_bloco(0, 2))
+    assert len(acumulador.result()) == 2
+
+def test_loader_anual_ignora_planilha_que_falha_no_meio(tmp_path, monkeypatch):
+    for ano in (2023, 2024):
+        (tmp_path / f"pagamentos_{ano}.xlsx").touch()
+
+    def iter_xlsx_columns(file_path, columns, chunk_rows=None):
+        yield pd.DataFrame({'Credor': ['FORNECEDOR A', 'FORNECEDOR B'], 'Pago': ['R$ 1.000,00', 'R$ 2,50']})
+        if '2024' in file_path:
+            raise OSError("arquivo truncado")
+        yield pd.DataFrame({'Credor': ['FORNECEDOR C'], 'Pago': ['R$ 3,00']}, index=[2])
+
+    monkeypatch.setattr(analise, 'iter_xlsx_columns', iter_xlsx_columns)
+    result = analise.load_annual_expenses_data(str(tmp_path))
+    assert list(result['Ano']) == [2023, 2023, 2023]
+    assert list(result['Valor_Pago']) == [1000.0, 2.5, 3.0]
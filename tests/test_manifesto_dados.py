@@ -0,0 +1,81 @@
+# tests/test_manifesto_dados.py
+#
+# Manifesto das pastas de dados (manifesto_dados.py): quais planilhas o painel enxerga
+# com manifestos parciais, arquivos alterados e publicações concorrentes.
+
+import json
+import multiprocessing
+import os
+
+import manifesto_dados
+
+
+def _grava(pasta, nome, conteudo=b'planilha'):
+    caminho = os.path.join(pasta, nome)
+    with open(caminho, 'wb') as f:
+        f.write(conteudo)
+    return caminho
+
+def _nomes(arquivos):
+    return [os.path.basename(p) for p in arquivos]
+
+
+def test_sem_manifesto_enxerga_tudo_menos_temporarios(tmp_path):
+    _grava(tmp_path, 'a.xlsx')
+    _grava(tmp_path, '~$a.xlsx')
+    _grava(tmp_path, '.a.1234.tmp.xlsx')
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['a.xlsx']
+
+def test_manifesto_parcial_so_lista_os_registrados(tmp_path):
+    manifesto_dados.register(_grava(tmp_path, 'a.xlsx'))
+    _grava(tmp_path, 'b.xlsx') # ainda sendo escrito por um coletor
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['a.xlsx']
+
+def test_arquivo_registrado_e_removido_some(tmp_path):
+    caminho = _grava(tmp_path, 'a.xlsx')
+    manifesto_dados.register(_grava(tmp_path, 'b.xlsx'))
+    manifesto_dados.register(caminho)
+    os.remove(caminho)
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['b.xlsx']
+
+def test_data_de_modificacao_nova_com_mesmo_conteudo_continua_valida(tmp_path):
+    caminho = _grava(tmp_path, 'a.xlsx')
+    manifesto_dados.register(caminho)
+    # Como num checkout ou numa cópia do deploy: mesmo conteúdo, outra data.
+    stat = os.stat(caminho)
+    os.utime(caminho, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['a.xlsx']
+
+def test_conteudo_alterado_com_mesmo_tamanho_e_ignorado(tmp_path):
+    caminho = _grava(tmp_path, 'a.xlsx', b'versao 1')
+    manifesto_dados.register(caminho)
+    stat = os.stat(caminho)
+    _grava(tmp_path, 'a.xlsx', b'versao 2')
+    os.utime(caminho, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert manifesto_dados.complete_files(str(tmp_path)) == []
+
+def test_lote_so_aparece_depois_de_publicado(tmp_path):
+    manifesto_dados.register(_grava(tmp_path, 'a.xlsx'))
+    manifesto_dados.start_batch(str(tmp_path))
+    manifesto_dados.register(_grava(tmp_path, 'b.xlsx'), rows=3)
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['a.xlsx']
+    manifesto_dados.publish(str(tmp_path))
+    assert _nomes(manifesto_dados.complete_files(str(tmp_path))) == ['a.xlsx', 'b.xlsx']
+    assert manifesto_dados.read_manifest(str(tmp_path))['arquivos']['b.xlsx']['linhas'] == 3
+
+
+def _coletor(pasta, prefixo, n):
+    for i in range(n):
+        manifesto_dados.register(_grava(pasta, f'{prefixo}_{i}.xlsx'))
+
+def test_publicacoes_concorrentes_nao_perdem_registros(tmp_path):
+    manifesto_dados.register(_grava(tmp_path, 'inicial.xlsx'))
+    processos = [multiprocessing.Process(target=_coletor, args=(str(tmp_path), prefixo, 30)) for prefixo in ('x', 'y')]
+    for p in processos:
+        p.start()
+    for p in processos:
+        p.join()
+    with open(os.path.join(tmp_path, manifesto_dados.MANIFEST_FILE), encoding='utf-8') as f:
+        manifesto = json.load(f)
+    assert len(manifesto['arquivos']) == 61
+    assert manifesto['versao'] == 61
@@ -0,0 +1,92 @@
+# tests/test_snapshot.py
+#
+# Partições mensais dos gastos gerais (snapshot.py), a leitura mapeada em memória
+# e o recorte por período usado pelo painel sobre a tabela já carregada
+# (analise.period_slice).
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import analise
+import snapshot
+from pyarrow import feather
+
+
+def _gastos(datas):
+    return pd.DataFrame({
+        'Data': pd.to_datetime(datas),
+        'Fornecedor': [f"FORNECEDOR {i}" for i in range(len(datas))],
+        'Valor_Empenhado': 10.0,
+        'Valor_Pago': [float(i) for i in range(len(datas))],
+    })
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    # Fora de ordem de propósito: o snapshot grava as partições ordenadas por data.
+    gastos = _gastos(['2024-03-01', '2024-01-31', '2024-02-01', '2023-12-31', '2024-01-01', '2024-02-29', '2024-03-31'])
+    snapshot._write_table(str(tmp_path), 'gastos_gerais', gastos)
+    return str(tmp_path)
+
+
+def test_list_partitions_em_ordem(snapshot_dir):
+    chaves = [key for key, _ in snapshot.list_partitions(snapshot_dir, 'gastos_gerais')]
+    assert chaves == [(2023, 12), (2024, 1), (2024, 2), (2024, 3)]
+
+def test_query_partitions_le_os_meses_de_borda_inteiros(snapshot_dir):
+    # O período começa no meio de janeiro e termina no meio de fevereiro: os dois meses entram inteiros.
+    result = snapshot.query_partitions(snapshot_dir, 'gastos_gerais', date(2024, 1, 15), date(2024, 2, 10))
+    assert list(result['Data'].dt.strftime('%Y-%m-%d')) == ['2024-01-01', '2024-01-31', '2024-02-01', '2024-02-29']
+
+@pytest.mark.parametrize('inicio, fim, meses', [
+    (None, None, ['2023-12', '2024-01', '2024-02', '2024-03']),
+    (date(2024, 2, 1), None, ['2024-02', '2024-03']),
+    (None, date(2023, 12, 31), ['2023-12']),
+    (date(2024, 3, 31), date(2024, 3, 31), ['2024-03']),
+])
+def test_query_partitions_por_intervalo(snapshot_dir, inicio, fim, meses):
+    result = snapshot.query_partitions(snapshot_dir, 'gastos_gerais', inicio, fim)
+    assert sorted(result['Data'].dt.strftime('%Y-%m').unique()) == meses
+
+def test_query_partitions_fora_do_intervalo_dos_dados(snapshot_dir):
+    assert snapshot.query_partitions(snapshot_dir, 'gastos_gerais', date(2030, 1, 1)).empty
+    assert snapshot.query_partitions(snapshot_dir, 'gastos_gerais', None, date(2000, 1, 1)).empty
+
+def test_tabela_vazia_nao_tem_particoes(tmp_path):
+    snapshot._write_table(str(tmp_path), 'gastos_gerais', _gastos([]))
+    assert snapshot.list_partitions(str(tmp_path), 'gastos_gerais') == []
+    assert snapshot.read_table(str(tmp_path), 'gastos_gerais').empty
+
+def test_period_slice_periodo_completo_devolve_o_mesmo_dataframe(snapshot_dir):
+    tabela = snapshot.read_table(snapshot_dir, 'gastos_gerais')
+    assert analise.period_slice(tabela) is tabela
+    assert analise.period_slice(tabela, date(2023, 12, 31), date(2024, 3, 31)) is tabela
+    assert analise.period_slice(tabela, date(2020, 1, 1), date(2030, 1, 1)) is tabela
+
+@pytest.mark.parametrize('inicio, fim', [
+    (date(2024, 1, 1), date(2024, 1, 31)),
+    (date(2024, 1, 31), date(2024, 2, 1)),
+    (date(2024, 2, 29), None),
+    (None, date(2024, 1, 1)),
+    (date(2024, 2, 2), date(2024, 2, 28)),
+    (date(2030, 1, 1), None),
+    (date(2024, 3, 1), date(2024, 2, 1)),
+])
+def test_period_slice_igual_ao_filtro_por_mascara(snapshot_dir, inicio, fim):
+    tabela = snapshot.read_table(snapshot_dir, 'gastos_gerais')
+    esperado = analise.filter_general_expenses(tabela, inicio, fim)
+    pd.testing.assert_frame_equal(analise.period_slice(tabela, inicio, fim), esperado)
+
+def test_tabela_inteira_e_mapeada_sem_copia(snapshot_dir):
+    tabela = snapshot.read_table(snapshot_dir, 'gastos_gerais')
+    pd.testing.assert_frame_equal(tabela, snapshot.query_partitions(snapshot_dir, 'gastos_gerais'))
+    assert feather.read_table(f"{snapshot_dir}/gastos_gerais.arrow").column('Valor_Pago').num_chunks == 1
+    # Colunas numéricas e de data são visões somente-leitura do arquivo, não cópias.
+    for coluna in ('Data', 'Valor_Pago', 'Valor_Empenhado'):
+        valores = tabela[coluna].to_numpy()
+        assert not valores.flags.owndata and not valores.flags.writeable
+
+def test_nomes_de_versao_nao_colidem_no_mesmo_segundo():
+    nomes = [snapshot._version_name({'pessoal': 'abc'}) for _ in range(50)]
+    assert len(set(nomes)) == len(nomes)